@@ -2,7 +2,7 @@ from django.contrib import admin
 
 from .models import (Course, CourseComment, CourseRating, CourseReply,
                      CourseTaughtByTeacher, CourseVideo, Student, Teacher,
-                     UserSessionMapping)
+                     UserSessionMapping, VideoProcessingJob, VideoUpload)
 
 admin.site.register(UserSessionMapping)
 admin.site.register(Course)
@@ -13,3 +13,5 @@ admin.site.register(CourseVideo)
 admin.site.register(CourseTaughtByTeacher)
 admin.site.register(Student)
 admin.site.register(Teacher)
+admin.site.register(VideoProcessingJob)
+admin.site.register(VideoUpload)
@@ -5,3 +5,10 @@ from django.utils.translation import gettext_lazy
 class APIConfig(AppConfig):
     name = 'api'
     verbose_name = gettext_lazy("API")
+
+    def ready(self):
+        # Register the signal receivers.
+        from . import signals  # noqa: F401
+        from .sessions import checkSessionEngine
+
+        checkSessionEngine()
@@ -0,0 +1,112 @@
+import json
+from typing import Any, Optional, Tuple, Union
+
+from django.contrib.auth.models import User
+from django.http import HttpRequest
+from rest_framework.authentication import BaseAuthentication
+from rest_framework.exceptions import (AuthenticationFailed, ParseError,
+                                       UnsupportedMediaType)
+from rest_framework.request import Request
+
+from .sessions import ResolvedSession, aresolveSession, resolveSession
+
+AuthenticationResult = Optional[Tuple[User, ResolvedSession]]
+
+
+def getSessionID(request: Union[Request, HttpRequest]) -> Optional[str]:
+    """Obtains the session ID of a request.
+
+    The session ID is searched for in the cookies first and then in the
+    request body. Plain Django requests, from the async views, only have
+    their JSON and form bodies parsed.
+
+    :returns: The session ID, or None if the request does not have one.
+    :rtype: str or None
+    """
+    sessionID: Optional[str] = request.COOKIES.get('sessionID')
+
+    if sessionID is None:
+        # Requests with a body that cannot be parsed, like raw uploads,
+        # cannot carry the session ID in the body.
+        try:
+            data = request.data if isinstance(request, Request) \
+                else _parseBody(request)
+        except (ParseError, UnsupportedMediaType):
+            return None
+
+        if hasattr(data, 'get'):
+            sessionID = data.get('sessionID')
+
+    return sessionID
+
+
+def _parseBody(request: HttpRequest) -> Any:
+    """Parses the body of a plain Django request.
+
+    :raises ParseError: If the body is not valid JSON.
+    """
+    if request.content_type == 'application/json':
+        try:
+            return json.loads(request.body or b'null')
+        except ValueError:
+            raise ParseError()
+
+    return request.POST
+
+
+async def aauthenticate(request: HttpRequest) -> AuthenticationResult:
+    """Asynchronous version of `SessionIDAuthentication.authenticate`,
+    for the async views which do not go through DRF.
+
+    :raises AuthenticationFailed: If the session is not valid.
+    """
+    sessionID: Optional[str] = getSessionID(request)
+
+    if sessionID is None:
+        return None
+
+    resolved: Optional[ResolvedSession] = await aresolveSession(sessionID)
+    if resolved is None:
+        raise AuthenticationFailed('The session is not valid.')
+
+    return resolved.user, resolved
+
+
+class SessionIDAuthentication(BaseAuthentication):
+    """Authenticates the requests that carry the `sessionID` issued by
+    the login and signup views.
+
+    The session is resolved to its user and role once per request. The
+    user is exposed as `request.user`, the `ResolvedSession` as
+    `request.auth` and the role as `request.isTeacher`.
+    """
+
+    def authenticate(self, request: Request) -> AuthenticationResult:
+        # The underlying `HttpRequest` is shared by every `Request` that
+        # wraps it, so the result is memoised on it.
+        httpRequest = request._request
+
+        if not hasattr(httpRequest, 'resolvedSession'):
+            sessionID: Optional[str] = getSessionID(request)
+            resolved: Optional[ResolvedSession] = (
+                resolveSession(sessionID) if sessionID is not None else None
+            )
+
+            httpRequest.sessionID = sessionID
+            httpRequest.resolvedSession = resolved
+            httpRequest.isTeacher = (
+                resolved is not None and resolved.isTeacher
+            )
+
+        if httpRequest.sessionID is None:
+            # Let the views decide what to do with anonymous requests.
+            return None
+
+        if httpRequest.resolvedSession is None:
+            raise AuthenticationFailed('The session is not valid.')
+
+        return httpRequest.resolvedSession.user, httpRequest.resolvedSession
+
+    def authenticate_header(self, request: Request) -> str:
+        # Makes failed authentications return 401 instead of 403.
+        return 'Session'
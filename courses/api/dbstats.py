@@ -0,0 +1,74 @@
+from collections import Counter
+from threading import Lock
+from typing import Any, Dict, Optional
+
+from django.db import connections
+
+# Number of connections opened by this process, by database alias. With
+# persistent connections or a pool it should stay close to the number of
+# threads.
+_connectionsCreated: Counter = Counter()
+_lock: Lock = Lock()
+
+# Names of the counters of a `psycopg_pool` pool, by their name in the
+# statistics.
+POOL_STATS = {
+    'min': 'pool_min',
+    'max': 'pool_max',
+    'size': 'pool_size',
+    'available': 'pool_available',
+    # Connections handed out to the requests.
+    'checkouts': 'requests_num',
+    # Checkouts that had to wait for a connection, and for how long.
+    'waits': 'requests_queued',
+    'waitTimeMs': 'requests_wait_ms',
+    'waiting': 'requests_waiting',
+    # Checkouts that gave up after the pool `timeout`.
+    'timeouts': 'requests_errors',
+    'connectionsOpened': 'connections_num',
+    'connectionsLost': 'connections_lost',
+}
+
+
+def countConnection(sender, connection, **kwargs):
+    """Receiver of `connection_created`."""
+    with _lock:
+        _connectionsCreated[connection.alias] += 1
+
+
+def getPoolStats(alias: str) -> Optional[Dict[str, int]]:
+    """Returns the counters of the connection pool of a database, or None
+    if it does not use a pool.
+    """
+    # Only the PostgreSQL backend has a pool, and only when the 'pool'
+    # option is set.
+    pool = getattr(connections[alias], 'pool', None)
+    if pool is None:
+        return None
+
+    stats: Dict[str, int] = pool.get_stats()
+
+    return {name: stats.get(key, 0) for name, key in POOL_STATS.items()}
+
+
+def getDatabaseStats() -> Dict[str, Dict[str, Any]]:
+    """Returns the connection settings and counters of every database,
+    for this process.
+    """
+    databases: Dict[str, Dict[str, Any]] = {}
+
+    for alias in connections:
+        settings: Dict[str, Any] = connections[alias].settings_dict
+
+        with _lock:
+            connectionsCreated: int = _connectionsCreated[alias]
+
+        databases[alias] = {
+            'vendor': connections[alias].vendor,
+            'connMaxAge': settings['CONN_MAX_AGE'],
+            'healthChecks': settings['CONN_HEALTH_CHECKS'],
+            'connectionsCreated': connectionsCreated,
+            'pool': getPoolStats(alias),
+        }
+
+    return databases
@@ -0,0 +1,242 @@
+import hashlib
+import os
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import Storage
+from django.http import HttpRequest
+from django.urls import reverse
+from PIL import Image, ImageOps
+
+from courses.metrics import recordCacheLookup
+
+# Pillow format and file extension of each derivative format.
+FORMATS: Dict[str, Tuple[str, str]] = {
+    'webp': ('WEBP', 'webp'),
+    'jpeg': ('JPEG', 'jpg'),
+}
+
+# Number of bytes hashed at a time.
+BLOCK_SIZE = 64 * 1024
+
+# A hit only refreshes the access time of a derivative once this many
+# seconds have passed, so that serving an image rarely writes to disk.
+TOUCH_INTERVAL = 60 * 60
+
+# The directories of the media storage that derivatives are served for,
+# the uploaded course images and the default images.
+SOURCE_DIRECTORIES = ('course/image/', 'defaults/images/')
+
+
+def getWidths() -> List[int]:
+    """Returns the widths the derivatives are generated at."""
+    return list(settings.IMAGE_DERIVATIVE_WIDTHS)
+
+
+def getFormats() -> List[str]:
+    """Returns the formats the derivatives are generated in."""
+    return list(settings.IMAGE_DERIVATIVE_FORMATS)
+
+
+def hasDerivatives(name: str) -> bool:
+    """Returns True if derivatives are served for the image with the
+    given name in the media storage.
+    """
+    return name.startswith(SOURCE_DIRECTORIES)
+
+
+def getContentHash(path: str) -> str:
+    """Returns the SHA-256 hash of the content of an image.
+
+    The hash is cached for as long as the size and the modification time
+    of the file stay the same, so the image is only read once.
+    """
+    stat: os.stat_result = os.stat(path)
+    key: str = 'api:image-hash:{}:{:x}-{:x}'.format(
+        hashlib.sha256(path.encode()).hexdigest(), stat.st_mtime_ns,
+        stat.st_size
+    )
+
+    contentHash: Optional[str] = cache.get(key)
+    recordCacheLookup(contentHash is not None)
+    if contentHash is None:
+        sha256 = hashlib.sha256()
+        with open(path, 'rb') as file:
+            for block in iter(lambda: file.read(BLOCK_SIZE), b''):
+                sha256.update(block)
+
+        contentHash = sha256.hexdigest()
+        cache.set(key, contentHash, None)
+
+    return contentHash
+
+
+def getDerivativePath(contentHash: str, width: int, imageFormat: str) -> str:
+    """Returns the path of a derivative in the cache directory."""
+    return os.path.join(
+        settings.IMAGE_CACHE_DIR, contentHash[:2], '{}-{}.{}'.format(
+            contentHash, width, FORMATS[imageFormat][1]
+        )
+    )
+
+
+def getDerivative(storage: Storage, name: str, width: int,
+                  imageFormat: str) -> str:
+    """Returns the path of an image resized to a width and encoded in a
+    format, generating it if it is not in the cache yet.
+
+    The derivatives are keyed by the content hash of the original, so an
+    image that is replaced gets new derivatives and identical images
+    share theirs.
+
+    :param storage: The storage of the original image.
+    :param name: The name of the original image in its storage.
+    :param width: One of the `IMAGE_DERIVATIVE_WIDTHS`.
+    :param imageFormat: One of the `IMAGE_DERIVATIVE_FORMATS`.
+
+    :raises FileNotFoundError: If the original image does not exist.
+    :raises OSError: If the original image cannot be decoded.
+    :raises DecompressionBombError: If the original image is too large
+        to be decoded safely.
+    """
+    path: str = getDerivativePath(
+        getContentHash(storage.path(name)), width, imageFormat
+    )
+
+    try:
+        stat: os.stat_result = os.stat(path)
+    except FileNotFoundError:
+        # Evict first, so that the new derivative is never removed
+        # before it is served.
+        _scheduleEviction()
+        _generateDerivative(storage.path(name), path, width, imageFormat)
+    else:
+        # The access time orders the derivatives for the eviction. It is
+        # set explicitly since file systems are often mounted with
+        # `noatime`, and the modification time is left alone since it
+        # is part of the `ETag`.
+        now: float = time.time()
+        if now - stat.st_atime > TOUCH_INTERVAL:
+            os.utime(path, ns=(int(now * 1e9), stat.st_mtime_ns))
+
+    return path
+
+
+def _generateDerivative(source: str, path: str, width: int,
+                        imageFormat: str):
+    """Resizes an image and writes it to the cache. Images are never
+    enlarged.
+    """
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+
+        if image.width > width:
+            image = image.resize(
+                (width, max(round(image.height * width / image.width), 1)),
+                Image.Resampling.LANCZOS
+            )
+
+        if imageFormat == 'jpeg' and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write to a temporary file first so that a concurrent request
+        # never serves a partially written derivative.
+        descriptor, temporaryPath = tempfile.mkstemp(
+            dir=os.path.dirname(path), suffix='.tmp'
+        )
+        try:
+            with os.fdopen(descriptor, 'wb') as file:
+                image.save(
+                    file, FORMATS[imageFormat][0],
+                    quality=settings.IMAGE_DERIVATIVE_QUALITY
+                )
+            os.replace(temporaryPath, path)
+        except BaseException:
+            os.remove(temporaryPath)
+            raise
+
+
+def _scheduleEviction():
+    """Evicts the derivatives at most once every
+    `IMAGE_CACHE_EVICTION_INTERVAL` seconds across the processes, since
+    it walks the whole cache directory. With no interval, the eviction is
+    left to the `evictimages` management command.
+    """
+    interval: Optional[int] = settings.IMAGE_CACHE_EVICTION_INTERVAL
+
+    if interval is not None and cache.add('api:image-eviction', 1, interval):
+        evictDerivatives(settings.IMAGE_CACHE_MAX_SIZE)
+
+
+def evictDerivatives(maxSize: int) -> int:
+    """Removes the least recently used derivatives until the cache takes
+    at most `maxSize` bytes.
+
+    :returns: The number of derivatives removed.
+    :rtype: int
+    """
+    files: List[Tuple[float, int, str]] = []
+    totalSize: int = 0
+
+    for directory, _, fileNames in os.walk(settings.IMAGE_CACHE_DIR):
+        for fileName in fileNames:
+            if fileName.endswith('.tmp'):
+                # Being written by another request.
+                continue
+
+            path: str = os.path.join(directory, fileName)
+            try:
+                stat: os.stat_result = os.stat(path)
+            except FileNotFoundError:
+                continue
+
+            files.append((stat.st_atime, stat.st_size, path))
+            totalSize += stat.st_size
+
+    removed: int = 0
+    if totalSize <= maxSize:
+        return removed
+
+    files.sort()
+    for _, size, path in files:
+        try:
+            os.remove(path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+
+        totalSize -= size
+        if totalSize <= maxSize:
+            break
+
+    return removed
+
+
+def getSrcset(request: HttpRequest,
+              name: str) -> Dict[str, Dict[str, str]]:
+    """Returns the URLs of the derivatives of an image, by format and
+    then by width descriptor, e.g. `{'webp': {'320w': ...}}`. It is
+    empty for the images that have no derivatives.
+    """
+    host: str = 'http://' + request.get_host()
+    srcset: Dict[str, Dict[str, str]] = {}
+
+    if not hasDerivatives(name):
+        return srcset
+
+    for imageFormat in getFormats():
+        srcset[imageFormat] = {
+            '{}w'.format(width): host + reverse(
+                'courseImageDerivative', kwargs={
+                    'width': width, 'imageFormat': imageFormat, 'path': name
+                }
+            )
+            for width in getWidths()
+        }
+
+    return srcset
@@ -0,0 +1,202 @@
+import json
+import statistics
+import subprocess
+import time
+from itertools import cycle
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.http import HttpResponse
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+
+from api.dbstats import getDatabaseStats
+from api.models import Course
+from shortener.models import URLShortener
+
+SCENARIOS = ('login', 'validate', 'courseDetail', 'teacherCourses', 'short')
+
+
+def summarise(durations: List[float], elapsed: float,
+              errors: int) -> Dict[str, Any]:
+    """Computes the latency percentiles, in milliseconds, and the
+    throughput of a run.
+
+    :param durations: The duration of every request in seconds.
+    :param elapsed: The duration of the whole run in seconds.
+    :param errors: The number of failed requests.
+    """
+    # The 1st to 99th percentiles.
+    percentiles: List[float] = statistics.quantiles(
+        [duration * 1000 for duration in durations], n=100,
+        method='inclusive'
+    ) if len(durations) > 1 else [durations[0] * 1000] * 99
+
+    return {
+        'p50': round(percentiles[49], 3),
+        'p95': round(percentiles[94], 3),
+        'p99': round(percentiles[98], 3),
+        'mean': round(statistics.fmean(durations) * 1000, 3),
+        'throughput': round(len(durations) / elapsed, 1),
+        'errors': errors,
+    }
+
+
+def getCommit() -> Optional[str]:
+    """Returns the current git commit, to tell the reports apart."""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+            check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = ('Benchmarks the main API endpoints through the test client '
+            'against the current database. Seed it with `seeddata` '
+            'first.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=200,
+            help='Number of measured requests per scenario.'
+        )
+        parser.add_argument(
+            '--warmup', type=int, default=20,
+            help='Number of unmeasured requests per scenario.'
+        )
+        parser.add_argument(
+            '--scenario', action='append', choices=SCENARIOS,
+            help='Scenario to run, can be repeated. Defaults to all.'
+        )
+        parser.add_argument(
+            '--username', default='seed-teacher-0',
+            help='Teacher used to log in.'
+        )
+        parser.add_argument('--password', default='password')
+        parser.add_argument(
+            '--output', help='Path of the JSON report, \'-\' for stdout.'
+        )
+
+    def handle(self, *args, **options):
+        self.client: Client = Client()
+        self.options: Dict[str, Any] = options
+
+        session: Dict[str, Any] = self._login()
+        courseIDs: List[int] = list(
+            Course.objects.values_list('id', flat=True).order_by('id')[:1000]
+        )
+        if not courseIDs:
+            raise CommandError('There are no courses, run `seeddata` first.')
+
+        requests: Dict[str, Callable[[], Iterator[Callable]]] = {
+            'login': lambda: cycle([lambda: self.client.post(
+                '/api/login/', {
+                    'username': options['username'],
+                    'password': options['password'],
+                }, content_type='application/json'
+            )]),
+            'validate': lambda: cycle([lambda: self.client.post(
+                '/api/validate/', {
+                    'sessionID': session['sessionID'],
+                    'sessionExpireDate': session['sessionExpireDate'],
+                }, content_type='application/json'
+            )]),
+            'courseDetail': lambda: cycle([
+                (lambda courseID: lambda: self.client.get(
+                    '/api/course/detail/{}/'.format(courseID)
+                ))(courseID)
+                for courseID in courseIDs
+            ]),
+            'teacherCourses': lambda: cycle([lambda: self.client.get(
+                '/api/teacher/course/all/'
+            )]),
+            # The short URLs are created by the other scenarios, so they
+            # are read when the scenario starts.
+            'short': lambda: cycle([
+                (lambda shortHash: lambda: self.client.get(
+                    '/short/{}/'.format(shortHash)
+                ))(shortHash)
+                for shortHash in URLShortener.objects
+                .values_list('shortHash', flat=True).order_by('id')[:1000]
+            ] or [lambda: self.client.get('/short/missing/')]),
+        }
+
+        results: Dict[str, Dict[str, Any]] = {}
+        with override_settings(ALLOWED_HOSTS=['testserver'], DEBUG=False):
+            for scenario in options['scenario'] or SCENARIOS:
+                results[scenario] = self._run(requests[scenario]())
+                self._print(scenario, results[scenario])
+
+        report: Dict[str, Any] = {
+            'date': timezone.now().isoformat(),
+            'commit': getCommit(),
+            'database': connection.vendor,
+            'requests': options['requests'],
+            'scenarios': results,
+            # Connections opened and pool counters during the run.
+            'databases': getDatabaseStats(),
+        }
+
+        if options['output'] == '-':
+            self.stdout.write(json.dumps(report, indent=2))
+        elif options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, indent=2)
+
+    def _login(self) -> Dict[str, Any]:
+        """Logs the teacher in. The session cookie is kept by the client
+        for the authenticated scenarios.
+        """
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            response: HttpResponse = self.client.post('/api/login/', {
+                'username': self.options['username'],
+                'password': self.options['password'],
+            }, content_type='application/json')
+
+        if response.status_code != 200:
+            raise CommandError('Could not log in as {}.'.format(
+                self.options['username']
+            ))
+
+        return response.json()
+
+    def _run(self, requests: Iterator[Callable]) -> Dict[str, Any]:
+        for _ in range(self.options['warmup']):
+            next(requests)()
+
+        durations: List[float] = []
+        queries: List[int] = []
+        errors: int = 0
+
+        start: float = time.perf_counter()
+        for _ in range(self.options['requests']):
+            request: Callable = next(requests)
+
+            with CaptureQueriesContext(connection) as context:
+                requestStart: float = time.perf_counter()
+                response: HttpResponse = request()
+                durations.append(time.perf_counter() - requestStart)
+
+            queries.append(len(context.captured_queries))
+            if response.status_code >= 400:
+                errors += 1
+        elapsed: float = time.perf_counter() - start
+
+        return dict(
+            summarise(durations, elapsed, errors),
+            queriesPerRequest=round(statistics.fmean(queries), 2)
+        )
+
+    def _print(self, scenario: str, result: Dict[str, Any]):
+        self.stdout.write(
+            '{:<15} p50 {p50:>8.2f} ms  p95 {p95:>8.2f} ms  '
+            'p99 {p99:>8.2f} ms  {queriesPerRequest:>5.1f} queries  '
+            '{throughput:>8.1f} req/s  {errors} errors'.format(
+                scenario, **result
+            )
+        )
@@ -0,0 +1,223 @@
+import asyncio
+import importlib
+import json
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.http import HttpResponse
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+from django.urls import clear_url_caches
+from django.utils import timezone
+
+from api.management.commands.benchmark import getCommit, summarise
+from api.models import Course
+from shortener.cache import shortURLCache
+from shortener.models import URLShortener
+
+# The routes that have an asynchronous version, by scenario.
+ROUTES = {
+    'courseDetail': 'api:courseDetail',
+    'teacherCourses': 'api:courseAll',
+    'validate': 'api:validate',
+    'short': 'shortener:shortenAPI',
+}
+
+# The URL configurations that read `ASYNC_VIEWS`.
+URLCONFS = ('api.urls', 'shortener.urls', 'courses.urls')
+
+
+@contextmanager
+def _asyncViews(routes: Tuple[str, ...]) -> Iterator[None]:
+    """Serves the given routes with their asynchronous views. The URL
+    configurations read the setting when they are imported, so they are
+    reloaded.
+    """
+    def reload():
+        for urlconf in URLCONFS:
+            importlib.reload(importlib.import_module(urlconf))
+        clear_url_caches()
+
+    try:
+        with override_settings(ASYNC_VIEWS=routes):
+            reload()
+            yield
+    finally:
+        reload()
+
+
+class Command(BaseCommand):
+    help = ('Compares the synchronous and the asynchronous views under '
+            'concurrent requests, through the ASGI request handler. Seed '
+            'the database with `seeddata` first.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=1000,
+            help='Number of requests per scenario and version.'
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=100,
+            help='Number of requests in flight at once.'
+        )
+        parser.add_argument(
+            '--scenario', action='append', choices=tuple(ROUTES),
+            help='Scenario to run, can be repeated. Defaults to all.'
+        )
+        parser.add_argument(
+            '--username', default='seed-teacher-0',
+            help='Teacher used to log in.'
+        )
+        parser.add_argument('--password', default='password')
+        parser.add_argument(
+            '--output', help='Path of the JSON report, \'-\' for stdout.'
+        )
+        parser.add_argument(
+            '--clear-caches', action='store_true',
+            help='Allow clearing every configured cache, including the '
+                 'sessions, when DEBUG is off.'
+        )
+
+    def handle(self, *args, **options):
+        # Every scenario starts from cold caches, which would log out
+        # the users of a deployed site.
+        if not settings.DEBUG and not options['clear_caches']:
+            raise CommandError(
+                'The benchmark clears every configured cache. Run it with '
+                'DEBUG on, or pass --clear-caches.'
+            )
+
+        sessionID: str = self._login(options)
+        courseIDs: List[int] = list(
+            Course.objects.values_list('id', flat=True).order_by('id')[:1000]
+        )
+        if not courseIDs:
+            raise CommandError('There are no courses, run `seeddata` first.')
+
+        # Make sure that there are short URLs to follow.
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            Client().get('/api/course/detail/{}/'.format(courseIDs[0]))
+        shortHashes: List[str] = list(
+            URLShortener.objects.values_list('shortHash', flat=True)
+            .order_by('id')[:1000]
+        )
+
+        def getRequest(scenario: str, index: int) -> Tuple[str, str, Dict]:
+            """Returns the method, the path and the body of a request."""
+            if scenario == 'courseDetail':
+                return 'get', '/api/course/detail/{}/'.format(
+                    courseIDs[index % len(courseIDs)]
+                ), {}
+            if scenario == 'teacherCourses':
+                return 'get', '/api/teacher/course/all/', {}
+            if scenario == 'validate':
+                return 'post', '/api/validate/', {'sessionID': sessionID}
+
+            return 'get', '/short/{}/'.format(
+                shortHashes[index % len(shortHashes)]
+            ), {}
+
+        results: Dict[str, Dict[str, Any]] = {}
+        with override_settings(ALLOWED_HOSTS=['testserver'], DEBUG=False):
+            for scenario in options['scenario'] or tuple(ROUTES):
+                results[scenario] = {}
+
+                for version, routes in (
+                    ('sync', ()), ('async', (ROUTES[scenario], ))
+                ):
+                    # Both versions start from cold caches. Clearing
+                    # them may drop the session, so log in again.
+                    self._clearCaches()
+                    sessionID = self._login(options)
+
+                    with _asyncViews(routes):
+                        results[scenario][version] = asyncio.run(self._run(
+                            scenario, getRequest, sessionID,
+                            options['requests'], options['concurrency']
+                        ))
+
+                    self.stdout.write(
+                        '{:<15} {:<6} p50 {p50:>8.2f} ms  p95 {p95:>8.2f} ms'
+                        '  p99 {p99:>8.2f} ms  {throughput:>8.1f} req/s  '
+                        '{errors} errors'.format(
+                            scenario, version, **results[scenario][version]
+                        )
+                    )
+
+        report: Dict[str, Any] = {
+            'date': timezone.now().isoformat(),
+            'commit': getCommit(),
+            'database': connection.vendor,
+            'requests': options['requests'],
+            'concurrency': options['concurrency'],
+            'scenarios': results,
+        }
+
+        if options['output'] == '-':
+            self.stdout.write(json.dumps(report, indent=2))
+        elif options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, indent=2)
+
+    @staticmethod
+    def _login(options: Dict[str, Any]) -> str:
+        """Logs in and returns the session ID."""
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            login: HttpResponse = Client().post('/api/login/', {
+                'username': options['username'],
+                'password': options['password'],
+            }, content_type='application/json')
+
+        if login.status_code != 200:
+            raise CommandError('Could not log in as {}.'.format(
+                options['username']
+            ))
+
+        return login.json()['sessionID']
+
+    @staticmethod
+    def _clearCaches():
+        """Clears the caches, including the in-process cache of the
+        short URLs.
+        """
+        for cache in caches.all():
+            cache.clear()
+        shortURLCache.clearLocal()
+
+    @staticmethod
+    async def _run(scenario: str, getRequest, sessionID: str,
+                   requests: int, concurrency: int) -> Dict[str, Any]:
+        client: AsyncClient = AsyncClient()
+        client.cookies['sessionID'] = sessionID
+        semaphore: asyncio.Semaphore = asyncio.Semaphore(concurrency)
+
+        durations: List[float] = []
+        errors: List[int] = []
+
+        async def send(index: int):
+            method, path, body = getRequest(scenario, index)
+
+            async with semaphore:
+                start: float = time.perf_counter()
+                if method == 'get':
+                    response: HttpResponse = await client.get(path)
+                else:
+                    response = await client.post(
+                        path, body, content_type='application/json'
+                    )
+                durations.append(time.perf_counter() - start)
+
+            if response.status_code >= 400:
+                errors.append(response.status_code)
+
+        start: float = time.perf_counter()
+        await asyncio.gather(*(send(index) for index in range(requests)))
+
+        return summarise(
+            durations, time.perf_counter() - start, len(errors)
+        )
@@ -0,0 +1,155 @@
+import json
+import random
+import timeit
+from datetime import timedelta
+from typing import Any, Callable, Dict, List
+
+from django.contrib.sessions.backends.base import SessionBase
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from api.models import Course
+from api.serialisers import (CourseSerialiser, CourseValuesSerialiser,
+                             SessionSerialiser, SessionValuesSerialiser)
+from api.sessions import getSessionStore
+
+from .benchmark import getCommit
+
+
+class Command(BaseCommand):
+    help = ('Compares the compiled serialisers with the DRF serialisers '
+            'they replace, on rows built in memory.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows', type=int, default=50,
+            help='Number of courses serialised per call, as in a page of '
+                 'the teacher course list.'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Number of timed runs. The best one is reported.'
+        )
+        parser.add_argument(
+            '--number', type=int, default=200,
+            help='Number of calls per run.'
+        )
+        parser.add_argument(
+            '--output', default=None,
+            help="File the JSON report is written to, '-' for stdout."
+        )
+
+    def handle(self, *args, **options):
+        if options['rows'] < 1:
+            raise CommandError('--rows must be at least 1.')
+
+        courses: List[Course] = self._getCourses(options['rows'])
+        # The same rows, as returned by `values()`.
+        rows: List[Dict[str, Any]] = [
+            {
+                column: getattr(course, column)
+                for column in CourseValuesSerialiser.getColumns()
+            }
+            for course in courses
+        ]
+        # Only serialised, so it is never saved.
+        session: SessionBase = getSessionStore()
+        session.set_expiry(timedelta(days=30))
+
+        cases: Dict[str, Dict[str, Callable[[], Any]]] = {
+            'courses': {
+                'drf': lambda: CourseSerialiser(courses, many=True).data,
+                'compiledInstances':
+                    lambda: CourseValuesSerialiser.serialiseMany(courses),
+                'compiledValues':
+                    lambda: CourseValuesSerialiser.serialiseMany(rows),
+            },
+            'session': {
+                'drf': lambda: SessionSerialiser(session).data,
+                'compiled':
+                    lambda: SessionValuesSerialiser.serialise(session),
+            },
+        }
+
+        results: Dict[str, Dict[str, Any]] = {}
+        for case, serialisers in cases.items():
+            # Every serialiser must produce the output of DRF.
+            expected: str = self._dump(serialisers['drf']())
+            for name, serialise in serialisers.items():
+                if self._dump(serialise()) != expected:
+                    raise CommandError(
+                        '{} {} does not match the DRF output.'.format(
+                            case, name
+                        )
+                    )
+
+            results[case] = {
+                name: self._time(serialise, options)
+                for name, serialise in serialisers.items()
+            }
+            self._print(case, results[case])
+
+        report: Dict[str, Any] = {
+            'date': timezone.now().isoformat(),
+            'commit': getCommit(),
+            'rows': options['rows'],
+            'cases': results,
+        }
+
+        if options['output'] == '-':
+            self.stdout.write(json.dumps(report, indent=2))
+        elif options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, indent=2)
+
+    @staticmethod
+    def _getCourses(count: int) -> List[Course]:
+        """Builds unsaved courses with varied values."""
+        generator: random.Random = random.Random(0)
+        courses: List[Course] = []
+
+        for index in range(count):
+            ratings: List[int] = [generator.randrange(50) for _ in range(5)]
+            courses.append(Course(
+                id=index + 1, name='Course {}'.format(index),
+                description='Description of course {}.'.format(index),
+                image='course/image/2020/01/01/{}.png'.format(index),
+                ratingCount=sum(ratings),
+                ratingSum=sum(
+                    star * count for star, count in enumerate(ratings, 1)
+                ),
+                rating1Count=ratings[0], rating2Count=ratings[1],
+                rating3Count=ratings[2], rating4Count=ratings[3],
+                rating5Count=ratings[4],
+                commentCount=generator.randrange(100),
+                replyCount=generator.randrange(300),
+                lastActivity=(
+                    timezone.now() - timedelta(minutes=index)
+                    if index % 3 else None
+                ),
+            ))
+
+        return courses
+
+    @staticmethod
+    def _dump(data: Any) -> str:
+        # The order of the keys is part of the output.
+        return json.dumps(data)
+
+    @staticmethod
+    def _time(serialise: Callable[[], Any],
+              options: Dict[str, Any]) -> Dict[str, float]:
+        """Returns the best time of a call in microseconds."""
+        best: float = min(timeit.repeat(
+            serialise, repeat=options['repeat'], number=options['number']
+        )) / options['number']
+
+        return {'perCallUs': round(best * 1e6, 2)}
+
+    def _print(self, case: str, result: Dict[str, Dict[str, float]]):
+        baseline: float = result['drf']['perCallUs']
+        self.stdout.write(case)
+        for name, timing in result.items():
+            self.stdout.write('  {:<20} {:>10.2f} us  {:>6.1f}x'.format(
+                name, timing['perCallUs'], baseline / timing['perCallUs']
+            ))
@@ -0,0 +1,63 @@
+import os
+from datetime import datetime, timedelta
+from typing import List, Set
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.models import VideoUpload
+
+
+class Command(BaseCommand):
+    help = ('Deletes the resumable video uploads that have not received '
+            'a chunk for a while, along with their partial files.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than', type=int, default=24,
+            help='Number of hours without a chunk after which an upload '
+                 'is deleted.'
+        )
+
+    def handle(self, *args, **options):
+        cutoff: datetime = timezone.now() - timedelta(
+            hours=options['older_than']
+        )
+
+        uploads: List[VideoUpload] = list(
+            VideoUpload.objects.filter(dateUpdated__lt=cutoff)
+        )
+        for upload in uploads:
+            try:
+                os.remove(upload.partialPath)
+            except FileNotFoundError:
+                pass
+        VideoUpload.objects.filter(
+            pk__in=[upload.pk for upload in uploads]
+        ).delete()
+
+        # Partial files whose upload was deleted without them, e.g. by a
+        # cascade from its course.
+        orphans: int = 0
+        uploadIDs: Set[str] = {
+            str(uploadID)
+            for uploadID in VideoUpload.objects.values_list('id', flat=True)
+        }
+        try:
+            names: List[str] = os.listdir(settings.VIDEO_UPLOAD_TEMP_DIR)
+        except FileNotFoundError:
+            names = []
+        for name in names:
+            path: str = os.path.join(settings.VIDEO_UPLOAD_TEMP_DIR, name)
+
+            if name not in uploadIDs and os.path.isfile(path) and \
+                    os.path.getmtime(path) < cutoff.timestamp():
+                os.remove(path)
+                orphans += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            'Deleted {} abandoned uploads and {} orphaned files.'.format(
+                len(uploads), orphans
+            )
+        ))
@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.images import evictDerivatives
+
+
+class Command(BaseCommand):
+    help = ('Removes the least recently used course image derivatives '
+            'until their cache fits in IMAGE_CACHE_MAX_SIZE.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-size', type=int, default=None,
+            help='Size of the cache in bytes to evict down to. Defaults '
+                 'to IMAGE_CACHE_MAX_SIZE.'
+        )
+
+    def handle(self, *args, **options):
+        maxSize: int = options['max_size']
+        if maxSize is None:
+            maxSize = settings.IMAGE_CACHE_MAX_SIZE
+
+        removed: int = evictDerivatives(maxSize)
+
+        self.stdout.write(self.style.SUCCESS(
+            'Removed {} image derivatives.'.format(removed)
+        ))
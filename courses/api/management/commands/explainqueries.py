@@ -0,0 +1,153 @@
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Tuple
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, models, transaction
+from django.db.models import Count
+from django.db.models.query import QuerySet
+
+from api.models import (Course, CourseComment, CourseRating, CourseReply,
+                        CourseTaughtByTeacher, CourseVideo)
+from shortener.models import URLShortener, generateShortHash
+
+
+class Rollback(Exception):
+    """Raised to undo the schema changes of the 'before' pass."""
+
+
+# The indexes and constraints added for the hot queries.
+NEW_INDEXES: List[Tuple[models.Model, str]] = [
+    (CourseVideo, 'courses_video_course_date'),
+    (CourseRating, 'courses_rating_course'),
+    (CourseComment, 'courses_comment_course'),
+    (CourseReply, 'courses_reply_comment'),
+]
+NEW_CONSTRAINTS: List[Tuple[models.Model, str]] = [
+    (CourseTaughtByTeacher, 'unique_teacher_course'),
+]
+# The single column indexes they replace.
+OLD_INDEXES: List[Tuple[models.Model, str]] = [
+    (CourseVideo, 'course'),
+    (CourseRating, 'course'),
+    (CourseComment, 'course'),
+    (CourseReply, 'comment'),
+    (CourseTaughtByTeacher, 'teacher'),
+]
+
+
+def _findByName(items, name: str):
+    return next(item for item in items if item.name == name)
+
+
+class Command(BaseCommand):
+    help = ('Prints the query plans of the hot queries with the previous '
+            'and the current indexes. Run it on a seeded database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--analyze', action='store_true',
+            help='Run the queries and show the actual timings, on '
+                 'databases that support it.'
+        )
+
+    def handle(self, *args, **options):
+        queries: List[Tuple[str, Callable[[], QuerySet]]] = \
+            self._getQueries()
+
+        # SQLite can only alter tables with the foreign key checks off,
+        # which must be done outside of the transaction.
+        with connection.constraint_checks_disabled():
+            try:
+                with transaction.atomic(), self._previousSchema():
+                    self._explain(
+                        'Before (previous indexes)', queries,
+                        options['analyze']
+                    )
+                    raise Rollback()
+            except Rollback:
+                pass
+
+        self._explain(
+            'After (current indexes)', queries, options['analyze']
+        )
+
+    @staticmethod
+    def _getQueries() -> List[Tuple[str, Callable[[], QuerySet]]]:
+        """Returns the hot queries, filled in with values from the
+        database.
+        """
+        course: int = Course.objects.values_list('id', flat=True)\
+            .order_by('id').first() or 0
+        comment: int = CourseComment.objects.filter(course_id=course)\
+            .values_list('id', flat=True).order_by('id').first() or 0
+        teacherUser: int = CourseTaughtByTeacher.objects\
+            .filter(course_id=course, teacher__isnull=False)\
+            .values_list('teacher__user_id', flat=True).first() or 0
+        urlSuffix: str = URLShortener.objects\
+            .values_list('urlSuffix', flat=True).order_by('id').first() or '/'
+
+        return [
+            ('Short URL by suffix (hash collisions)', lambda: URLShortener
+             .objects.filter(urlSuffix__in=[urlSuffix])),
+            ('Short URL by hash', lambda: URLShortener.objects.filter(
+                shortHash__in=[generateShortHash(urlSuffix)]
+            )),
+            ('Page of course videos', lambda: CourseVideo.objects
+             .filter(course_id=course).order_by('dateAdded', 'id')[:51]),
+            ('Courses of a teacher', lambda: Course.objects.filter(
+                coursetaughtbyteacher__teacher__user_id=teacherUser
+            ).distinct().order_by('id')[:51]),
+            ('Teachers of a course', lambda: CourseTaughtByTeacher.objects
+             .filter(course_id=course, teacher__isnull=False)
+             .select_related('teacher__user')),
+            ('Rating histogram of a course', lambda: CourseRating.objects
+             .filter(course_id=course).values('rating')
+             .annotate(count=Count('id')).order_by()),
+            ('Page of course comments', lambda: CourseComment.objects
+             .filter(course_id=course).order_by('id')[:51]),
+            ('Page of comment replies', lambda: CourseReply.objects
+             .filter(comment_id=comment).order_by('id')[:51]),
+        ]
+
+    @staticmethod
+    @contextmanager
+    def _previousSchema() -> Iterator[None]:
+        """Swaps the new indexes for the previous ones. Must be run in a
+        transaction that is rolled back, which is only possible on
+        databases with transactional DDL.
+        """
+        if not connection.features.can_rollback_ddl:
+            raise CommandError(
+                'The database cannot roll back schema changes, so the '
+                'previous indexes cannot be compared.'
+            )
+
+        with connection.schema_editor(atomic=False) as editor:
+            for model, name in NEW_INDEXES:
+                editor.remove_index(
+                    model, _findByName(model._meta.indexes, name)
+                )
+            for model, name in NEW_CONSTRAINTS:
+                editor.remove_constraint(
+                    model, _findByName(model._meta.constraints, name)
+                )
+            for model, fieldName in OLD_INDEXES:
+                editor.add_index(model, models.Index(
+                    fields=[fieldName], name='old_{}_{}'.format(
+                        model._meta.db_table, fieldName
+                    )
+                ))
+
+        yield
+
+    def _explain(self, title: str,
+                 queries: List[Tuple[str, Callable[[], QuerySet]]],
+                 analyze: bool):
+        self.stdout.write(self.style.MIGRATE_HEADING(title))
+
+        for name, query in queries:
+            self.stdout.write(self.style.MIGRATE_LABEL(name))
+            options = {'analyze': True} \
+                if analyze and connection.vendor == 'postgresql' else {}
+            self.stdout.write(query().explain(**options))
+            self.stdout.write('')
@@ -0,0 +1,209 @@
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from threading import Event, Thread
+from typing import Any, Dict, Iterator, Optional
+
+from django.core.files.storage import Storage
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
+from django.db.models.query import QuerySet
+from django.utils import timezone
+
+from api.models import CourseVideo, VideoProcessingJob
+from api.responsecache import invalidateCourses
+from api.transcoding import TranscodingError, convertToHLS
+
+
+class Command(BaseCommand):
+    help = 'Runs the queued jobs that convert the course videos to HLS.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Exit once the queue is empty instead of waiting for new '
+                 'jobs.'
+        )
+        parser.add_argument(
+            '--sleep', type=float, default=5.0,
+            help='Number of seconds to wait when the queue is empty.'
+        )
+        parser.add_argument(
+            '--max-attempts', type=int, default=3,
+            help='Number of times a job is tried before it fails.'
+        )
+        parser.add_argument(
+            '--retry-delay', type=int, default=60,
+            help='Number of seconds before a failed job is tried again. '
+                 'The delay doubles with every attempt.'
+        )
+        parser.add_argument(
+            '--heartbeat', type=float, default=60.0,
+            help='Number of seconds between two heartbeats of a running '
+                 'job.'
+        )
+        parser.add_argument(
+            '--stale-after', type=int, default=10,
+            help='Number of minutes without a heartbeat after which a '
+                 'running job is assumed to belong to a dead worker and '
+                 'is queued again.'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            self._requeueStaleJobs(options)
+
+            job: Optional[VideoProcessingJob] = self._claimJob()
+
+            if job is None:
+                if options['once']:
+                    return
+
+                time.sleep(options['sleep'])
+                continue
+
+            self._runJob(job, options)
+
+    @staticmethod
+    def _getNextAttemptAt(attempts: int, retryDelay: int) -> datetime:
+        """Returns when a job that failed `attempts` times is tried
+        again.
+        """
+        return timezone.now() + timedelta(
+            seconds=retryDelay * 2 ** (attempts - 1)
+        )
+
+    def _requeueStaleJobs(self, options: Dict[str, Any]):
+        """Queues the jobs of dead workers again, or fails them if they
+        have used all their attempts.
+        """
+        staleJobs: QuerySet = VideoProcessingJob.objects.filter(
+            status=VideoProcessingJob.RUNNING,
+            heartbeatAt__lt=timezone.now() - timedelta(
+                minutes=options['stale_after']
+            )
+        )
+        error: str = 'The worker running the job stopped.'
+
+        staleJobs.filter(attempts__gte=options['max_attempts']).update(
+            status=VideoProcessingJob.FAILED, error=error,
+            dateUpdated=timezone.now()
+        )
+        for attempts in staleJobs.values_list('attempts', flat=True)\
+                .distinct():
+            staleJobs.filter(attempts=attempts).update(
+                status=VideoProcessingJob.PENDING, error=error,
+                nextAttemptAt=self._getNextAttemptAt(
+                    attempts, options['retry_delay']
+                ),
+                dateUpdated=timezone.now()
+            )
+
+    @staticmethod
+    def _claimJob() -> Optional[VideoProcessingJob]:
+        """Takes the oldest pending job that is due. Several workers can
+        run at once since the claimed rows are locked and skipped by the
+        others.
+        """
+        with transaction.atomic():
+            job: Optional[VideoProcessingJob] = VideoProcessingJob.objects\
+                .select_for_update(skip_locked=True)\
+                .select_related('video')\
+                .filter(status=VideoProcessingJob.PENDING,
+                        nextAttemptAt__lte=timezone.now())\
+                .order_by('id').first()
+
+            if job is not None:
+                VideoProcessingJob.objects.filter(pk=job.pk).update(
+                    status=VideoProcessingJob.RUNNING,
+                    attempts=F('attempts') + 1,
+                    heartbeatAt=timezone.now(),
+                    dateUpdated=timezone.now()
+                )
+                job.attempts += 1
+
+        return job
+
+    @staticmethod
+    def _updateJob(job: VideoProcessingJob, **fields) -> bool:
+        """Updates a running job unless it has been queued again or
+        claimed by another worker in the meantime.
+
+        :returns: False if the job is no longer run by this worker.
+        :rtype: bool
+        """
+        return VideoProcessingJob.objects.filter(
+            pk=job.pk, status=VideoProcessingJob.RUNNING,
+            attempts=job.attempts
+        ).update(**fields) > 0
+
+    @contextmanager
+    def _heartbeat(self, job: VideoProcessingJob,
+                   interval: float) -> Iterator[None]:
+        """Updates the heartbeat of the job from a thread while the
+        block runs, so that the job is not taken for a dead one.
+        """
+        stopped: Event = Event()
+
+        def beat():
+            try:
+                while not stopped.wait(interval):
+                    self._updateJob(job, heartbeatAt=timezone.now())
+            finally:
+                connection.close()
+
+        thread: Thread = Thread(target=beat, daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stopped.set()
+            thread.join()
+
+    def _runJob(self, job: VideoProcessingJob, options: Dict[str, Any]):
+        videoStorage: Storage = CourseVideo._meta.get_field('video').storage
+        self.stdout.write('Processing {}...'.format(job.video.video.name))
+
+        try:
+            with self._heartbeat(job, options['heartbeat']):
+                manifest: str = convertToHLS(
+                    videoStorage, job.video.video.name
+                )
+        except (TranscodingError, OSError) as error:
+            if job.attempts < options['max_attempts']:
+                updated: bool = self._updateJob(
+                    job, status=VideoProcessingJob.PENDING,
+                    nextAttemptAt=self._getNextAttemptAt(
+                        job.attempts, options['retry_delay']
+                    ),
+                    error=str(error), dateUpdated=timezone.now()
+                )
+            else:
+                updated = self._updateJob(
+                    job, status=VideoProcessingJob.FAILED, error=str(error),
+                    dateUpdated=timezone.now()
+                )
+
+            self.stderr.write('Failed: {}'.format(error))
+        else:
+            updated = self._updateJob(
+                job, status=VideoProcessingJob.READY, manifest=manifest,
+                error='', dateUpdated=timezone.now()
+            )
+
+            self.stdout.write(
+                self.style.SUCCESS('Ready: {}'.format(manifest))
+            )
+
+        if not updated:
+            self.stderr.write(
+                'The job was queued again while it ran, its result is '
+                'discarded.'
+            )
+            return
+
+        # The jobs are updated without `save`, which is what drops the
+        # cached course of the video otherwise.
+        invalidateCourses([job.video.course_id], withTeachers=False)
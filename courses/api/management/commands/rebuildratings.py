@@ -0,0 +1,61 @@
+from collections import defaultdict
+from typing import DefaultDict, Dict, List
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from api.models import Course, CourseRating
+from api.responsecache import invalidateCourses
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the rating aggregates of every course from the ratings.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Number of courses updated per query.'
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            # Lock the courses first, so that ratings saved during the
+            # rebuild wait for it and are then counted on top of it.
+            courses: List[Course] = list(
+                Course.objects.select_for_update()
+                .only('id', *Course.RATING_FIELDS).order_by('id')
+            )
+
+            # The number of ratings of each star for every course, in a
+            # single grouped query.
+            histograms: DefaultDict[int, Dict[int, int]] = defaultdict(dict)
+            for row in CourseRating.objects.filter(
+                course__isnull=False, rating__isnull=False
+            ).values('course', 'rating').annotate(count=Count('id'))\
+                    .order_by():
+                histograms[row['course']][row['rating']] = row['count']
+
+            for course in courses:
+                histogram: Dict[int, int] = histograms.get(course.id, {})
+                course.ratingCount = sum(histogram.values())
+                course.ratingSum = sum(
+                    star * count for star, count in histogram.items()
+                )
+                for star in range(1, 6):
+                    setattr(
+                        course, 'rating{}Count'.format(star),
+                        histogram.get(star, 0)
+                    )
+
+            Course.objects.bulk_update(
+                courses, Course.RATING_FIELDS,
+                batch_size=options['batch_size']
+            )
+            # `bulk_update` sends no signals, so the cached responses of
+            # the courses are dropped here, once the transaction commits.
+            invalidateCourses(course.id for course in courses)
+
+        self.stdout.write(self.style.SUCCESS(
+            'Rebuilt the ratings of {} courses.'.format(len(courses))
+        ))
@@ -0,0 +1,75 @@
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Max
+
+from api.models import Course, CourseComment, CourseReply
+from api.responsecache import invalidateCourses
+
+# The counters recomputed by the command.
+COUNTER_FIELDS = ('commentCount', 'replyCount', 'lastActivity')
+
+
+class Command(BaseCommand):
+    help = ('Recomputes the comment and reply counters and the last '
+            'activity of every course.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Number of courses updated per query.'
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            # Lock the courses first, so that comments and replies saved
+            # during the reconciliation wait for it and are then counted
+            # on top of it.
+            courses: List[Course] = list(
+                Course.objects.select_for_update()
+                .only('id', *COUNTER_FIELDS).order_by('id')
+            )
+
+            # A single grouped query per table.
+            comments: Dict[int, Tuple[int, datetime]] = {
+                row['course']: (row['count'], row['latest'])
+                for row in CourseComment.objects.filter(course__isnull=False)
+                .values('course')
+                .annotate(count=Count('id'), latest=Max('dateAdded'))
+                .order_by()
+            }
+            replies: Dict[int, Tuple[int, datetime]] = {
+                row['comment__course']: (row['count'], row['latest'])
+                for row in CourseReply.objects.filter(
+                    comment__course__isnull=False
+                ).values('comment__course')
+                .annotate(count=Count('id'), latest=Max('dateAdded'))
+                .order_by()
+            }
+
+            for course in courses:
+                commentCount, lastComment = comments.get(course.id, (0, None))
+                replyCount, lastReply = replies.get(course.id, (0, None))
+
+                course.commentCount = commentCount
+                course.replyCount = replyCount
+                dates: List[datetime] = [
+                    date for date in (lastComment, lastReply)
+                    if date is not None
+                ]
+                course.lastActivity = (
+                    max(dates) if dates else None
+                )
+
+            Course.objects.bulk_update(
+                courses, COUNTER_FIELDS, batch_size=options['batch_size']
+            )
+            # `bulk_update` sends no signals, so the cached responses of
+            # the courses are dropped here, once the transaction commits.
+            invalidateCourses(course.id for course in courses)
+
+        self.stdout.write(self.style.SUCCESS(
+            'Reconciled the discussions of {} courses.'.format(len(courses))
+        ))
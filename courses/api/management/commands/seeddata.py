@@ -0,0 +1,165 @@
+import random
+from typing import List
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.models import (Course, CourseComment, CourseRating, CourseReply,
+                        CourseTaughtByTeacher, CourseVideo, Student, Teacher)
+
+
+class Command(BaseCommand):
+    help = ('Seeds the database with a synthetic dataset of teachers, '
+            'students, courses, videos, ratings, comments and replies.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--teachers', type=int, default=50)
+        parser.add_argument('--students', type=int, default=1000)
+        parser.add_argument('--courses', type=int, default=200)
+        parser.add_argument(
+            '--videos', type=int, default=20, help='Videos per course.'
+        )
+        parser.add_argument(
+            '--ratings', type=int, default=100, help='Ratings per course.'
+        )
+        parser.add_argument(
+            '--comments', type=int, default=50, help='Comments per course.'
+        )
+        parser.add_argument(
+            '--replies', type=int, default=3,
+            help='Average number of replies per comment.'
+        )
+        parser.add_argument(
+            '--prefix', default='seed',
+            help='Prefix of the usernames, so that several datasets can '
+                 'coexist. The teachers are named <prefix>-teacher-<n>.'
+        )
+        parser.add_argument(
+            '--password', default='password',
+            help='Password of every seeded user.'
+        )
+        parser.add_argument(
+            '--random-seed', type=int, default=0,
+            help='Seed of the random generator, for reproducible datasets.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of rows inserted per query.'
+        )
+
+    def handle(self, *args, **options):
+        generator: random.Random = random.Random(options['random_seed'])
+        batchSize: int = options['batch_size']
+        prefix: str = options['prefix']
+
+        # Hashing a password is slow on purpose, so every user shares
+        # the same hash.
+        password: str = make_password(options['password'])
+
+        with transaction.atomic():
+            teacherUsers: List[User] = User.objects.bulk_create([
+                User(
+                    username='{}-teacher-{}'.format(prefix, index),
+                    email='{}-teacher-{}@example.com'.format(prefix, index),
+                    first_name='Teacher', last_name=str(index),
+                    password=password
+                )
+                for index in range(options['teachers'])
+            ], batch_size=batchSize)
+            teachers: List[Teacher] = Teacher.objects.bulk_create([
+                Teacher(user=user, biography='Biography of {}.'.format(
+                    user.username
+                ))
+                for user in teacherUsers
+            ], batch_size=batchSize)
+
+            studentUsers: List[User] = User.objects.bulk_create([
+                User(
+                    username='{}-student-{}'.format(prefix, index),
+                    email='{}-student-{}@example.com'.format(prefix, index),
+                    first_name='Student', last_name=str(index),
+                    password=password
+                )
+                for index in range(options['students'])
+            ], batch_size=batchSize)
+            students: List[Student] = Student.objects.bulk_create([
+                Student(user=user) for user in studentUsers
+            ], batch_size=batchSize)
+
+            courses: List[Course] = Course.objects.bulk_create([
+                Course(
+                    name='Course {}'.format(index),
+                    description='Description of course {}.'.format(index),
+                    image='course/image/{}/{}.png'.format(prefix, index)
+                )
+                for index in range(options['courses'])
+            ], batch_size=batchSize)
+
+            # One or two teachers per course.
+            CourseTaughtByTeacher.objects.bulk_create([
+                CourseTaughtByTeacher(teacher=teacher, course=course)
+                for course in courses
+                for teacher in generator.sample(
+                    teachers, min(len(teachers), generator.randint(1, 2))
+                )
+            ], batch_size=batchSize)
+
+            CourseVideo.objects.bulk_create([
+                CourseVideo(
+                    course=course, title='Video {}'.format(index),
+                    description='Description of video {}.'.format(index),
+                    video='course/videos/{}/{}-{}.mp4'.format(
+                        prefix, course.id, index
+                    )
+                )
+                for course in courses for index in range(options['videos'])
+            ], batch_size=batchSize)
+
+            if students:
+                CourseRating.objects.bulk_create([
+                    CourseRating(
+                        course=course, student=generator.choice(students),
+                        rating=generator.choices(
+                            range(1, 6), weights=(1, 1, 3, 5, 4)
+                        )[0]
+                    )
+                    for course in courses
+                    for _ in range(options['ratings'])
+                ], batch_size=batchSize)
+
+            users: List[User] = teacherUsers + studentUsers
+            if users:
+                comments: List[CourseComment] = \
+                    CourseComment.objects.bulk_create([
+                        CourseComment(
+                            course=course, user=generator.choice(users),
+                            comment='Comment {}.'.format(index)
+                        )
+                        for course in courses
+                        for index in range(options['comments'])
+                    ], batch_size=batchSize)
+
+                CourseReply.objects.bulk_create([
+                    CourseReply(
+                        comment=comment, user=generator.choice(users),
+                        reply='Reply {}.'.format(index)
+                    )
+                    for comment in comments
+                    for index in range(generator.randint(
+                        0, 2 * options['replies']
+                    ))
+                ], batch_size=batchSize)
+
+            # `bulk_create` skips the model methods that maintain the
+            # aggregates, so they are computed once at the end.
+            call_command('rebuildratings', stdout=self.stdout)
+            call_command('reconcilediscussions', stdout=self.stdout)
+
+        self.stdout.write(self.style.SUCCESS(
+            'Seeded {} teachers, {} students and {} courses.'.format(
+                len(teachers), len(students), len(courses)
+            )
+        ))
@@ -1,12 +1,20 @@
-from typing import Tuple
+import os
+import uuid
+from datetime import datetime
+from typing import Dict, Optional, Tuple, Union
 
 import magic
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.contrib.sessions.models import Session
 from django.core.exceptions import ValidationError
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.core.files import File
+from django.db import models, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce, Greatest
 from django.db.models.fields.files import FieldFile
+from django.utils import timezone
 from django.utils.deconstruct import deconstructible
 
 
@@ -61,15 +69,80 @@ class Student(models.Model):
 
 
 class Course(models.Model):
+    # The denormalised rating aggregates, kept up to date by
+    # `CourseRating` and rebuilt by the `rebuildratings` command.
+    RATING_FIELDS = (
+        'ratingCount', 'ratingSum', 'rating1Count', 'rating2Count',
+        'rating3Count', 'rating4Count', 'rating5Count',
+    )
+
     name = models.CharField(max_length=100)
     image = models.ImageField(upload_to='course/image/%Y/%m/%d/')
     description = models.TextField()
+    ratingCount = models.PositiveIntegerField(default=0, editable=False)
+    ratingSum = models.PositiveIntegerField(default=0, editable=False)
+    rating1Count = models.PositiveIntegerField(default=0, editable=False)
+    rating2Count = models.PositiveIntegerField(default=0, editable=False)
+    rating3Count = models.PositiveIntegerField(default=0, editable=False)
+    rating4Count = models.PositiveIntegerField(default=0, editable=False)
+    rating5Count = models.PositiveIntegerField(default=0, editable=False)
+    # The discussion counters, kept up to date by `CourseComment` and
+    # `CourseReply` and rebuilt by the `reconcilediscussions` command.
+    commentCount = models.PositiveIntegerField(default=0, editable=False)
+    replyCount = models.PositiveIntegerField(default=0, editable=False)
+    lastActivity = models.DateTimeField(null=True, editable=False)
 
     objects = models.Manager()
 
     def __str__(self):
         return 'Course: {}'.format(self.name)
 
+    def getRatingSummary(self) -> Dict[str, Union[int, float, None,
+                                                  Dict[str, int]]]:
+        """Returns the rating aggregates of the course.
+
+        :returns: The number of ratings, their average (None if there
+            are no ratings) and the number of ratings for each star.
+        """
+        return self.summariseRatings(
+            *(getattr(self, field) for field in self.RATING_FIELDS)
+        )
+
+    @staticmethod
+    def summariseRatings(ratingCount: int, ratingSum: int,
+                         *starCounts: int) -> Dict[str, Union[
+                             int, float, None, Dict[str, int]]]:
+        """Builds the rating summary of `getRatingSummary` from the
+        values of `RATING_FIELDS`, in order, so that it can be built from
+        `values()` rows too.
+        """
+        return {
+            'count': ratingCount,
+            'average': (
+                round(ratingSum / ratingCount, 2) if ratingCount else None
+            ),
+            'histogram': {
+                str(star): count
+                for star, count in enumerate(starCounts, start=1)
+            },
+        }
+
+    @classmethod
+    def adjustRating(cls, courseID: Optional[int], rating: Optional[int],
+                     delta: int):
+        """Adds (`delta` = 1) or removes (`delta` = -1) a rating from the
+        aggregates of a course with a single `UPDATE`.
+        """
+        if courseID is None or rating is None:
+            return
+
+        countField: str = 'rating{}Count'.format(rating)
+        cls.objects.filter(pk=courseID).update(**{
+            'ratingCount': F('ratingCount') + delta,
+            'ratingSum': F('ratingSum') + delta * rating,
+            countField: F(countField) + delta,
+        })
+
     class Meta:
         db_table = 'courses_course'
         verbose_name = 'Course'
@@ -77,7 +150,10 @@ class Course(models.Model):
 
 
 class CourseTaughtByTeacher(models.Model):
-    teacher = models.ForeignKey(Teacher, models.SET_NULL, null=True)
+    # Indexed by the unique constraint.
+    teacher = models.ForeignKey(
+        Teacher, models.SET_NULL, null=True, db_index=False
+    )
     course = models.ForeignKey(Course, models.SET_NULL, null=True)
 
     objects = models.Manager()
@@ -89,6 +165,11 @@ class CourseTaughtByTeacher(models.Model):
 
     class Meta:
         db_table = 'courses_course_taught_by_teacher'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['teacher', 'course'], name='unique_teacher_course'
+            ),
+        ]
         verbose_name = 'Course Taught By Teacher'
         verbose_name_plural = 'Course(s) Taught By Teacher(s)'
 
@@ -97,22 +178,38 @@ class CourseTaughtByTeacher(models.Model):
 class CourseVideoValidator:
     """A validator for file fields that uses `libmagic` to verify the
     type of file.
+
+    Only the header of the file is sniffed, so the validator never loads
+    a whole video into memory.
     """
 
-    def __init__(self, allowedContentTypes: Tuple[str]):
+    def __init__(self, allowedContentTypes: Tuple[str],
+                 headerSize: int = 8192):
         """A validator for file fields that uses `libmagic` to verify the
         type of file.
 
         :param allowedContentTypes: A tuple of MIME type strings of
             supported file types.
+        :param headerSize: The number of bytes read from the beginning
+            of the file to find out its type.
         """
         self.allowedContentTypes: Tuple[str] = allowedContentTypes
+        self.headerSize: int = headerSize
 
     def __call__(self, video: FieldFile):
+        self.validateFile(video.file)
+
+    def validateFile(self, file: File):
+        """Validates a file that is not necessarily attached to a file
+        field.
+
+        :param file: The file to validate.
+        :type file: File
+
+        :raises ValidationError: If the type of the file is not allowed.
+        """
         # Get the MIME type string of this video.
-        videoContentType = magic.from_buffer(video.read(), mime=True)
-        # Point the cursor to the beginning of the file.
-        video.seek(0)
+        videoContentType = self.getContentType(file)
 
         if videoContentType not in self.allowedContentTypes:
             raise ValidationError(
@@ -120,13 +217,50 @@ class CourseVideoValidator:
                 params={'contentType': videoContentType}
             )
 
+    def getContentType(self, file: File) -> str:
+        """Finds out the MIME type of a file.
+
+        Uploads that were streamed to a temporary file are sniffed from
+        their path. Otherwise, only the first `headerSize` bytes are
+        read. The result is cached on the file object so that repeated
+        validations don't sniff the file again.
+
+        :param file: The file to sniff.
+        :type file: File
+
+        :returns: The MIME type string of the file.
+        :rtype: str
+        """
+        contentType: Optional[str] = getattr(
+            file, '_sniffedContentType', None
+        )
+
+        if contentType is None:
+            if hasattr(file, 'temporary_file_path'):
+                contentType = magic.from_file(
+                    file.temporary_file_path(), mime=True
+                )
+            else:
+                file.seek(0)
+                contentType = magic.from_buffer(
+                    file.read(self.headerSize), mime=True
+                )
+                # Point the cursor to the beginning of the file.
+                file.seek(0)
+
+            file._sniffedContentType = contentType
+
+        return contentType
+
     def __eq__(self, other):
         return (isinstance(other, CourseVideoValidator) and
-                self.allowedContentTypes == other.allowedContentTypes)
+                self.allowedContentTypes == other.allowedContentTypes and
+                self.headerSize == other.headerSize)
 
 
 class CourseVideo(models.Model):
-    course = models.ForeignKey(Course, models.CASCADE)
+    # Indexed along with the ordering of the videos.
+    course = models.ForeignKey(Course, models.CASCADE, db_index=False)
     title = models.CharField(max_length=100)
     description = models.TextField()
     dateAdded = models.DateTimeField(auto_now_add=True)
@@ -144,12 +278,112 @@ class CourseVideo(models.Model):
 
     class Meta:
         db_table = 'courses_video'
+        indexes = [
+            # The pages of videos of a course.
+            models.Index(
+                fields=['course', 'dateAdded', 'id'],
+                name='courses_video_course_date'
+            ),
+        ]
         verbose_name = 'Course Video'
         verbose_name_plural = 'Course Videos'
 
 
+class VideoProcessingJob(models.Model):
+    """A job of the local queue that converts an uploaded `CourseVideo`
+    to HLS.
+
+    The jobs are created when a video is saved for the first time and
+    are run by the `processvideos` management command.
+    """
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    READY = 'ready'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (READY, 'Ready'),
+        (FAILED, 'Failed'),
+    )
+
+    video = models.OneToOneField(
+        CourseVideo, models.CASCADE, related_name='processingJob'
+    )
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default=PENDING,
+        db_index=True
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # A pending job is not run before this date, so that a failed job is
+    # retried with a backoff.
+    nextAttemptAt = models.DateTimeField(default=timezone.now)
+    # Updated periodically by the worker running the job, so that the
+    # jobs of dead workers can be told apart from long conversions.
+    heartbeatAt = models.DateTimeField(null=True, blank=True)
+    # Storage name of the HLS master playlist once the job is ready.
+    manifest = models.CharField(max_length=255, blank=True)
+    error = models.TextField(blank=True)
+    dateCreated = models.DateTimeField(auto_now_add=True)
+    dateUpdated = models.DateTimeField(auto_now=True)
+
+    objects = models.Manager()
+
+    def __str__(self):
+        return 'Processing of video {} is {}'.format(
+            self.video.title, self.status
+        )
+
+    class Meta:
+        db_table = 'courses_video_processing_job'
+        verbose_name = 'Video Processing Job'
+        verbose_name_plural = 'Video Processing Jobs'
+
+
+class VideoUpload(models.Model):
+    """A resumable upload of a `CourseVideo` that is sent in chunks.
+
+    The chunks are appended to a partial file on disk and the
+    `CourseVideo` is only created once the upload is finalised.
+    """
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4,
+                          editable=False)
+    course = models.ForeignKey(Course, models.CASCADE)
+    user = models.ForeignKey(User, models.CASCADE)
+    title = models.CharField(max_length=100)
+    description = models.TextField()
+    fileName = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    offset = models.BigIntegerField(default=0)
+    dateCreated = models.DateTimeField(auto_now_add=True)
+    # The date of the last chunk, after which an abandoned upload is
+    # deleted by the `cleanuploads` management command.
+    dateUpdated = models.DateTimeField(auto_now=True)
+
+    objects = models.Manager()
+
+    @property
+    def partialPath(self) -> str:
+        """The path of the file the chunks are appended to."""
+        return os.path.join(settings.VIDEO_UPLOAD_TEMP_DIR, str(self.id))
+
+    def __str__(self):
+        return 'Upload of video {} for course {}'.format(
+            self.title, self.course.name
+        )
+
+    class Meta:
+        db_table = 'courses_video_upload'
+        verbose_name = 'Video Upload'
+        verbose_name_plural = 'Video Uploads'
+
+
 class CourseRating(models.Model):
-    course = models.ForeignKey(Course, models.SET_NULL, null=True)
+    course = models.ForeignKey(
+        Course, models.SET_NULL, null=True, db_index=False
+    )
     student = models.ForeignKey(Student, models.SET_NULL, null=True)
     rating = models.PositiveSmallIntegerField(
         validators=[
@@ -161,22 +395,106 @@ class CourseRating(models.Model):
 
     objects = models.Manager()
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The values in the database, which are already counted in the
+        # aggregates of the course.
+        instance._counted = (
+            instance.__dict__.get('course_id'),
+            instance.__dict__.get('rating')
+        )
+
+        return instance
+
+    def save(self, *args, **kwargs):
+        """Saves the rating and updates the aggregates of its course in
+        the same transaction.
+        """
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+            counted: Tuple[Optional[int], Optional[int]] = getattr(
+                self, '_counted', (None, None)
+            )
+            if counted != (self.course_id, self.rating):
+                Course.adjustRating(*counted, -1)
+                Course.adjustRating(self.course_id, self.rating, 1)
+                self._counted = (self.course_id, self.rating)
+
     def __str__(self):
         return 'Rating for course: {}'.format(self.course.name)
 
     class Meta:
         db_table = 'courses_course_rating'
+        indexes = [
+            # The histogram of a course is read from the index alone.
+            models.Index(
+                fields=['course', 'rating'], name='courses_rating_course'
+            ),
+        ]
         verbose_name = 'Course Rating'
         verbose_name_plural = 'Course Ratings'
 
 
+def _latest(date: datetime) -> Greatest:
+    """Returns an expression that moves `Course.lastActivity` forward to
+    a date, but never back, whatever the order the updates commit in.
+    """
+    return Greatest(Coalesce(F('lastActivity'), Value(date)), Value(date))
+
+
 class CourseComment(models.Model):
-    course = models.ForeignKey(Course, models.SET_NULL, null=True)
+    course = models.ForeignKey(
+        Course, models.SET_NULL, null=True, db_index=False
+    )
     user = models.ForeignKey(User, models.SET_NULL, null=True)
     comment = models.TextField()
+    dateAdded = models.DateTimeField(auto_now_add=True)
 
     objects = models.Manager()
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The course in the database, which the comment is counted on.
+        instance._countedCourseID = instance.__dict__.get('course_id')
+
+        return instance
+
+    def save(self, *args, **kwargs):
+        """Saves the comment and, when it is new, counts it on its course
+        in the same transaction. A comment moved to another course takes
+        its replies along in the counters.
+        """
+        with transaction.atomic():
+            adding: bool = self._state.adding
+            countedCourseID: Optional[int] = getattr(
+                self, '_countedCourseID', None
+            )
+            super().save(*args, **kwargs)
+
+            if adding:
+                Course.objects.filter(pk=self.course_id).update(
+                    commentCount=F('commentCount') + 1,
+                    lastActivity=_latest(self.dateAdded)
+                )
+            elif countedCourseID != self.course_id:
+                replyCount: int = CourseReply.objects.filter(
+                    comment_id=self.pk
+                ).count()
+                Course.objects.filter(pk=countedCourseID).update(
+                    commentCount=F('commentCount') - 1,
+                    replyCount=F('replyCount') - replyCount
+                )
+                Course.objects.filter(pk=self.course_id).update(
+                    commentCount=F('commentCount') + 1,
+                    replyCount=F('replyCount') + replyCount,
+                    lastActivity=_latest(self.dateAdded)
+                )
+
+            self._countedCourseID = self.course_id
+
     def __str__(self):
         return 'User \'{}\' commented on course \'{}\''.format(
             self.user.username, self.course.name
@@ -184,17 +502,63 @@ class CourseComment(models.Model):
 
     class Meta:
         db_table = 'courses_course_comment'
+        indexes = [
+            # The pages of comments of a course.
+            models.Index(
+                fields=['course', 'id'], name='courses_comment_course'
+            ),
+        ]
         verbose_name = 'Course Comment'
         verbose_name_plural = 'Course Comments'
 
 
 class CourseReply(models.Model):
-    comment = models.ForeignKey(CourseComment, models.SET_NULL, null=True)
+    comment = models.ForeignKey(
+        CourseComment, models.SET_NULL, null=True, db_index=False
+    )
     user = models.ForeignKey(User, models.SET_NULL, null=True)
     reply = models.TextField()
+    dateAdded = models.DateTimeField(auto_now_add=True)
 
     objects = models.Manager()
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The comment in the database, whose course the reply is counted
+        # on.
+        instance._countedCommentID = instance.__dict__.get('comment_id')
+
+        return instance
+
+    def save(self, *args, **kwargs):
+        """Saves the reply and, when it is new, counts it on the course of
+        its comment in the same transaction. A reply moved to another
+        comment is moved in the counters too.
+        """
+        with transaction.atomic():
+            adding: bool = self._state.adding
+            countedCommentID: Optional[int] = getattr(
+                self, '_countedCommentID', None
+            )
+            super().save(*args, **kwargs)
+
+            if adding or countedCommentID != self.comment_id:
+                if not adding and countedCommentID is not None:
+                    Course.objects.filter(
+                        coursecomment__id=countedCommentID
+                    ).update(replyCount=F('replyCount') - 1)
+
+                if self.comment_id is not None:
+                    Course.objects.filter(
+                        coursecomment__id=self.comment_id
+                    ).update(
+                        replyCount=F('replyCount') + 1,
+                        lastActivity=_latest(self.dateAdded)
+                    )
+
+            self._countedCommentID = self.comment_id
+
     def __str__(self):
         return 'User \'{}\' replied to comment \'{}\''.format(
             self.user.username, self.comment.id
@@ -202,5 +566,11 @@ class CourseReply(models.Model):
 
     class Meta:
         db_table = 'courses_course_reply'
+        indexes = [
+            # The first replies and the pages of replies of a comment.
+            models.Index(
+                fields=['comment', 'id'], name='courses_reply_comment'
+            ),
+        ]
         verbose_name = 'Course Reply'
         verbose_name_plural = 'Course Replies'
@@ -0,0 +1,174 @@
+import json
+import math
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from datetime import datetime
+from typing import Any, List, Optional, Sequence, Tuple, Union
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.db.models.query import QuerySet
+from django.http import HttpRequest
+from rest_framework.request import Request
+
+
+def encodeCursor(values: Sequence[Any]) -> str:
+    """Encodes the ordering values of the last row of a page into an
+    opaque cursor token.
+
+    :param values: The values of the ordering fields of the row.
+    :type values: Sequence
+
+    :returns: A URL safe cursor token.
+    :rtype: str
+    """
+    serialisable: List[Any] = [
+        value.isoformat() if isinstance(value, datetime) else value
+        for value in values
+    ]
+
+    return urlsafe_b64encode(
+        json.dumps(serialisable, separators=(',', ':')).encode()
+    ).decode()
+
+
+def decodeCursor(cursor: str, length: int) -> List[Any]:
+    """Decodes a cursor token created by `encodeCursor`.
+
+    :param cursor: The cursor token received from the client.
+    :type cursor: str
+    :param length: The number of ordering fields of the cursor.
+    :type length: int
+
+    :raises ValueError: If the cursor is not a valid cursor token.
+
+    :returns: The ordering values stored in the cursor.
+    :rtype: List
+    """
+    try:
+        values = json.loads(urlsafe_b64decode(cursor.encode()))
+    except (BinasciiError, UnicodeError, ValueError):
+        raise ValueError('Invalid cursor.')
+
+    if not isinstance(values, list) or len(values) != length:
+        raise ValueError('Invalid cursor.')
+
+    # JSON accepts numbers that no column can hold, such as 1e999 which
+    # is decoded as infinity.
+    for value in values:
+        if isinstance(value, float) and not math.isfinite(value):
+            raise ValueError('Invalid cursor.')
+        if isinstance(value, int) and not -2 ** 63 <= value < 2 ** 63:
+            raise ValueError('Invalid cursor.')
+
+    return values
+
+
+def getPageSize(request: Union[Request, HttpRequest]) -> int:
+    """Reads the page size from the `pageSize` query parameter.
+
+    Missing or invalid values fall back to `API_PAGE_SIZE` and the page
+    size is capped at `API_MAX_PAGE_SIZE`.
+    """
+    defaultSize: int = getattr(settings, 'API_PAGE_SIZE', 50)
+    maxSize: int = getattr(settings, 'API_MAX_PAGE_SIZE', 200)
+
+    try:
+        pageSize: int = int(request.GET.get('pageSize', defaultSize))
+    except ValueError:
+        pageSize = defaultSize
+
+    if pageSize <= 0:
+        pageSize = defaultSize
+
+    return min(pageSize, maxSize)
+
+
+def paginateKeyset(queryset: QuerySet, ordering: Sequence[str],
+                   cursor: Optional[str],
+                   pageSize: int) -> Tuple[List[Any], Optional[str]]:
+    """Fetches a single page of a queryset with keyset pagination.
+
+    Instead of an offset, the page starts right after the row encoded
+    in the cursor, so every page costs the same whatever its position.
+    The ordering fields must be sorted in ascending order and, taken
+    together, be unique.
+
+    :param queryset: The queryset to paginate. It can return model
+        instances or dictionaries from `values()`.
+    :type queryset: QuerySet
+    :param ordering: The names of the ordering fields.
+    :type ordering: Sequence[str]
+    :param cursor: The cursor received from the client, or None for the
+        first page.
+    :type cursor: str or None
+    :param pageSize: The maximum number of rows in the page.
+    :type pageSize: int
+
+    :raises ValueError: If the cursor is not a valid cursor token.
+
+    :returns: The rows of the page and the cursor of the next page, or
+        None if this is the last page.
+    :rtype: Tuple[List, str or None]
+    """
+    rows: List[Any] = list(
+        _getPageQueryset(queryset, ordering, cursor, pageSize)
+    )
+
+    return _splitPage(rows, ordering, pageSize)
+
+
+async def apaginateKeyset(queryset: QuerySet, ordering: Sequence[str],
+                          cursor: Optional[str], pageSize: int
+                          ) -> Tuple[List[Any], Optional[str]]:
+    """Asynchronous version of `paginateKeyset`."""
+    rows: List[Any] = [
+        row async for row in
+        _getPageQueryset(queryset, ordering, cursor, pageSize)
+    ]
+
+    return _splitPage(rows, ordering, pageSize)
+
+
+def _getPageQueryset(queryset: QuerySet, ordering: Sequence[str],
+                     cursor: Optional[str], pageSize: int) -> QuerySet:
+    """Returns the queryset of a page, with one extra row to find out if
+    there is a next page.
+    """
+    queryset = queryset.order_by(*ordering)
+
+    if cursor is not None:
+        values: List[Any] = decodeCursor(cursor, len(ordering))
+
+        # Build the lexicographic comparison
+        # (a > x) or (a = x and b > y) or ...
+        after: Q = Q()
+        for index, field in enumerate(ordering):
+            condition: Q = Q(**{field + '__gt': values[index]})
+            for previous in range(index):
+                condition &= Q(**{ordering[previous]: values[previous]})
+            after |= condition
+
+        try:
+            queryset = queryset.filter(after)
+        except (OverflowError, TypeError, ValueError, ValidationError):
+            # The values in the cursor do not match the field types.
+            raise ValueError('Invalid cursor.')
+
+    return queryset[:pageSize + 1]
+
+
+def _splitPage(rows: List[Any], ordering: Sequence[str],
+               pageSize: int) -> Tuple[List[Any], Optional[str]]:
+    """Removes the extra row of a page and encodes the next cursor."""
+    nextCursor: Optional[str] = None
+    if len(rows) > pageSize:
+        rows = rows[:pageSize]
+        last: Any = rows[-1]
+        nextCursor = encodeCursor([
+            last[field] if isinstance(last, dict) else getattr(last, field)
+            for field in ordering
+        ])
+
+    return rows, nextCursor
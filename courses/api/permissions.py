@@ -0,0 +1,13 @@
+from rest_framework.permissions import BasePermission
+from rest_framework.request import Request
+
+
+class IsTeacher(BasePermission):
+    """Allows access only to the users with a teacher account. Must be
+    used with `SessionIDAuthentication`.
+    """
+
+    message = 'This user is not a teacher.'
+
+    def has_permission(self, request: Request, view) -> bool:
+        return bool(request.auth is not None and request.auth.isTeacher)
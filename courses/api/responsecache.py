@@ -0,0 +1,275 @@
+"""Caches the rendered responses of the course views.
+
+Every course and every teacher has a version stamp in the cache. The
+cached responses and their ETags are derived from the stamp, so a
+response is invalidated by dropping the stamp of its course or teacher,
+which the signal receivers do whenever a row that the response shows
+changes. A conditional request with a current ETag is answered with
+304 from the stamp alone, without touching the database. The stamps
+expire after `API_RESPONSE_VERSION_TIMEOUT` seconds, which bounds how
+long a change made without signals, such as a `bulk_update`, goes
+unnoticed.
+"""
+import hashlib
+from typing import Dict, Iterable, List, NamedTuple, Optional
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpRequest, HttpResponse, HttpResponseNotModified
+from django.template.response import SimpleTemplateResponse
+from django.utils.http import parse_etags
+
+from courses.metrics import recordCacheLookup
+
+from .models import CourseTaughtByTeacher
+
+# The scopes of the version stamps.
+COURSE = 'course'
+TEACHER = 'teacher'
+
+
+class CachedResponse(NamedTuple):
+    """A rendered response along with its headers."""
+
+    content: bytes
+    status: int
+    headers: Dict[str, str]
+
+
+def _versionCacheKey(scope: str, objectID: int) -> str:
+    return 'api:response-version:{}:{}'.format(scope, objectID)
+
+
+def _versionTimeout() -> int:
+    return getattr(settings, 'API_RESPONSE_VERSION_TIMEOUT', 24 * 60 * 60)
+
+
+def getVersion(scope: str, objectID: int) -> str:
+    """Returns the version stamp of a course or a teacher, creating it if
+    it was dropped.
+
+    :param scope: `COURSE` or `TEACHER`.
+    :type scope: str
+
+    :param objectID: The ID of the course, or of the user of the
+        teacher.
+    :type objectID: int
+
+    :rtype: str
+    """
+    key: str = _versionCacheKey(scope, objectID)
+    version: Optional[str] = cache.get(key)
+    recordCacheLookup(version is not None)
+
+    if version is None:
+        # The stamps are random rather than counters, so that a stamp
+        # evicted from the cache is never handed out again. Another
+        # process may create the stamp at the same time, so the one that
+        # was stored is read back.
+        cache.add(key, uuid4().hex, _versionTimeout())
+        version = cache.get(key)
+
+    return version
+
+
+async def agetVersion(scope: str, objectID: int) -> str:
+    """Asynchronous version of `getVersion`."""
+    key: str = _versionCacheKey(scope, objectID)
+    version: Optional[str] = await cache.aget(key)
+    recordCacheLookup(version is not None)
+
+    if version is None:
+        await cache.aadd(key, uuid4().hex, _versionTimeout())
+        version = await cache.aget(key)
+
+    return version
+
+
+def invalidate(scope: str, objectIDs: Iterable[int]):
+    """Drops the version stamps of courses or teachers, and with them
+    their cached responses.
+
+    The stamps are dropped once the current transaction commits.
+    Otherwise, a request served in between would cache the rows from
+    before the transaction under the new stamp.
+
+    :param scope: `COURSE` or `TEACHER`.
+    :type scope: str
+
+    :param objectIDs: The IDs of the courses, or of the users of the
+        teachers.
+    :type objectIDs: Iterable[int]
+    """
+    keys: List[str] = [
+        _versionCacheKey(scope, objectID) for objectID in set(objectIDs)
+        if objectID is not None
+    ]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def invalidateCourses(courseIDs: Iterable[int], withTeachers: bool = True):
+    """Drops the cached responses of courses.
+
+    :param courseIDs: The IDs of the courses.
+    :type courseIDs: Iterable[int]
+
+    :param withTeachers: Whether the course lists of their teachers show
+        the change too. Their teachers are then found with one query.
+    :type withTeachers: bool
+    """
+    courseIDs = list(courseIDs)
+    invalidate(COURSE, courseIDs)
+
+    if withTeachers and courseIDs:
+        invalidate(TEACHER, CourseTaughtByTeacher.objects.filter(
+            course_id__in=courseIDs, teacher__isnull=False
+        ).values_list('teacher__user_id', flat=True))
+
+
+class ResponseCache:
+    """The cached responses of a request to a view that shows a single
+    course or teacher.
+
+    A response is cached for every host and query string, as both
+    appear in the response. Only successful JSON responses are cached,
+    and only for `API_RESPONSE_CACHE_TIMEOUT` seconds.
+    """
+
+    def __init__(self, request: HttpRequest, scope: str, objectID: int):
+        self.request: HttpRequest = request
+        self.scope: str = scope
+        self.objectID: int = objectID
+        self.timeout: int = getattr(settings, 'API_RESPONSE_CACHE_TIMEOUT', 0)
+        # Set once the version stamp has been read.
+        self.key: Optional[str] = None
+        self.etag: Optional[str] = None
+
+    @property
+    def enabled(self) -> bool:
+        # Responses for the browsable API are not cached.
+        renderer = getattr(self.request, 'accepted_renderer', None)
+
+        return self.timeout > 0 and (
+            renderer is None or renderer.format == 'json'
+        )
+
+    def lookup(self) -> Optional[HttpResponse]:
+        """Returns 304 if the client has the current response, the cached
+        response, or None if it has to be built.
+        """
+        if not self.enabled:
+            return None
+
+        self._setVersion(getVersion(self.scope, self.objectID))
+        if self._isNotModified():
+            return self._notModified()
+
+        cached: Optional[CachedResponse] = cache.get(self.key)
+        recordCacheLookup(cached is not None)
+
+        return self._fromCache(cached)
+
+    async def alookup(self) -> Optional[HttpResponse]:
+        """Asynchronous version of `lookup`."""
+        if not self.enabled:
+            return None
+
+        self._setVersion(await agetVersion(self.scope, self.objectID))
+        if self._isNotModified():
+            return self._notModified()
+
+        cached: Optional[CachedResponse] = await cache.aget(self.key)
+        recordCacheLookup(cached is not None)
+
+        return self._fromCache(cached)
+
+    def store(self, response: HttpResponse) -> HttpResponse:
+        """Caches a response once it is rendered and adds its ETag. Must
+        be called after `lookup`.
+
+        :param response: The response built by the view.
+        :type response: HttpResponse
+
+        :returns: The same response.
+        :rtype: HttpResponse
+        """
+        if self.key is None or response.status_code != 200:
+            return response
+
+        response['ETag'] = self.etag
+
+        # DRF responses are rendered after the view returns.
+        if (
+            isinstance(response, SimpleTemplateResponse)
+            and not response.is_rendered
+        ):
+            response.add_post_render_callback(self._save)
+        else:
+            self._save(response)
+
+        return response
+
+    async def astore(self, response: HttpResponse) -> HttpResponse:
+        """Asynchronous version of `store`, for the responses of the
+        asynchronous views, which are already rendered.
+        """
+        if self.key is None or response.status_code != 200:
+            return response
+
+        response['ETag'] = self.etag
+        await cache.aset(self.key, self._toCached(response), self.timeout)
+
+        return response
+
+    def _setVersion(self, version: str):
+        digest: str = hashlib.sha256('\n'.join((
+            self.scope, str(self.objectID), version, self.request.get_host(),
+            self.request.GET.urlencode()
+        )).encode()).hexdigest()[:32]
+
+        self.key = 'api:response:' + digest
+        # The stamp changes whenever the content does, so the ETag is
+        # strong.
+        self.etag = '"{}"'.format(digest)
+
+    def _isNotModified(self) -> bool:
+        # `If-None-Match` uses the weak comparison.
+        etags: List[str] = [
+            etag.removeprefix('W/') for etag in parse_etags(
+                self.request.META.get('HTTP_IF_NONE_MATCH', '')
+            )
+        ]
+
+        return self.etag in etags or '*' in etags
+
+    def _notModified(self) -> HttpResponse:
+        response: HttpResponse = HttpResponseNotModified()
+        response['ETag'] = self.etag
+
+        return response
+
+    def _fromCache(
+        self, cached: Optional[CachedResponse]
+    ) -> Optional[HttpResponse]:
+        if cached is None:
+            return None
+
+        response: HttpResponse = HttpResponse(
+            cached.content, status=cached.status
+        )
+        for header, value in cached.headers.items():
+            response[header] = value
+
+        return response
+
+    def _save(self, response: HttpResponse):
+        cache.set(self.key, self._toCached(response), self.timeout)
+
+    @staticmethod
+    def _toCached(response: HttpResponse) -> CachedResponse:
+        return CachedResponse(
+            response.content, response.status_code, dict(response.items())
+        )
@@ -0,0 +1,70 @@
+from typing import Optional, Tuple
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef
+
+from courses.metrics import recordCacheLookup
+
+from .models import Student, Teacher
+
+# The roles a user can have.
+TEACHER = 'teacher'
+STUDENT = 'student'
+
+# Stored in the cache for users that have neither role, so that they
+# are not looked up again.
+_NO_ROLE = ''
+
+
+def _roleCacheKey(userID: int) -> str:
+    return 'api:role:{}'.format(userID)
+
+
+def getUserRole(userID: int) -> Optional[str]:
+    """Finds out whether a user is a teacher or a student.
+
+    Both the tables are checked in a single query and the result is
+    cached per user until a `Teacher` or `Student` row of the user is
+    saved or deleted.
+
+    :param userID: The ID of the user.
+    :type userID: int
+
+    :returns: `TEACHER`, `STUDENT` or None if the user has neither role.
+    :rtype: str or None
+    """
+    role: Optional[str] = cache.get(_roleCacheKey(userID))
+    recordCacheLookup(role is not None)
+
+    if role is None:
+        flags: Optional[Tuple[bool, bool]] = User.objects.filter(pk=userID)\
+            .annotate(
+                isTeacher=Exists(Teacher.objects.filter(user=OuterRef('pk'))),
+                isStudent=Exists(Student.objects.filter(user=OuterRef('pk')))
+            )\
+            .values_list('isTeacher', 'isStudent').first()
+
+        if flags is not None and flags[0]:
+            role = TEACHER
+        elif flags is not None and flags[1]:
+            role = STUDENT
+        else:
+            role = _NO_ROLE
+
+        cache.set(
+            _roleCacheKey(userID), role,
+            getattr(settings, 'ROLE_CACHE_TIMEOUT', None)
+        )
+
+    return role or None
+
+
+def forgetUserRole(userID: int):
+    """Removes the cached role of a user.
+
+    :param userID: The ID of the user.
+    :type userID: int
+    """
+    cache.delete(_roleCacheKey(userID))
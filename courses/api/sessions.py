@@ -0,0 +1,322 @@
+from datetime import datetime
+from importlib import import_module
+from typing import NamedTuple, Optional
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends import signed_cookies
+from django.contrib.sessions.backends.base import SessionBase
+from django.core.cache import cache, caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Exists, OuterRef
+from django.db.models.query import QuerySet
+from django.utils import timezone
+
+from courses.metrics import recordCacheLookup
+
+from .models import Teacher, UserSessionMapping
+
+# Session engines that store their sessions in the `Session` table.
+DATABASE_ENGINES = (
+    'django.contrib.sessions.backends.db',
+    'django.contrib.sessions.backends.cached_db',
+)
+
+# Key of the session data that holds the ID of the session's user.
+USER_ID_KEY = '_api_user_id'
+
+
+class ResolvedSession(NamedTuple):
+    """A valid session along with its user."""
+
+    sessionKey: str
+    user: User
+    isTeacher: bool
+    expireDate: datetime
+
+
+def getSessionStore(sessionKey: Optional[str] = None) -> SessionBase:
+    """Returns a session store of the configured `SESSION_ENGINE`.
+
+    :param sessionKey: The key of an existing session, or None to
+        create a new session.
+    :type sessionKey: str or None
+
+    :rtype: SessionBase
+    """
+    engine = import_module(settings.SESSION_ENGINE)
+
+    return engine.SessionStore(sessionKey)
+
+
+def checkSessionEngine():
+    """Raises `ImproperlyConfigured` if the configured `SESSION_ENGINE`
+    cannot revoke its sessions.
+
+    Sessions stored in signed cookies stay valid until they expire, even
+    after they were deleted or replaced, and expire after
+    `SESSION_COOKIE_AGE` whatever their own expiry date.
+    """
+    engine = import_module(settings.SESSION_ENGINE)
+
+    if issubclass(engine.SessionStore, signed_cookies.SessionStore):
+        raise ImproperlyConfigured(
+            'The API cannot revoke sessions stored in signed cookies. '
+            'Set SESSION_ENGINE to an engine that stores its sessions on '
+            'the server.'
+        )
+
+
+def usesDatabaseSessions() -> bool:
+    """Returns True if the configured `SESSION_ENGINE` stores its
+    sessions in the `Session` table.
+    """
+    return settings.SESSION_ENGINE in DATABASE_ENGINES
+
+
+class SessionIndex:
+    """Maps a user to the key of their session.
+
+    There can be only one session assigned to a user.
+    """
+
+    def getSessionKey(self, userID: int) -> Optional[str]:
+        """Returns the key of the user's session, or None."""
+        raise NotImplementedError
+
+    def add(self, userID: int, store: SessionBase):
+        """Assigns the session to the user, replacing any previous
+        session.
+        """
+        raise NotImplementedError
+
+    def refresh(self, userID: int, store: SessionBase):
+        """Called after the expiry date of the session was extended.
+        The session key may have changed when the session was saved.
+        """
+        self.add(userID, store)
+
+    def remove(self, userID: int):
+        """Removes the session assigned to the user."""
+        raise NotImplementedError
+
+
+class DatabaseSessionIndex(SessionIndex):
+    """Session index backed by the `UserSessionMapping` table. Only
+    usable with session engines that write to the `Session` table.
+    """
+
+    def getSessionKey(self, userID: int) -> Optional[str]:
+        return UserSessionMapping.objects.filter(user_id=userID)\
+            .values_list('session_id', flat=True).first()
+
+    def add(self, userID: int, store: SessionBase):
+        UserSessionMapping.objects.update_or_create(
+            user_id=userID, defaults={'session_id': store.session_key}
+        )
+
+    def refresh(self, userID: int, store: SessionBase):
+        # The session key never changes and the expiry date is stored in
+        # the `Session` table, so there is nothing to update.
+        pass
+
+    def remove(self, userID: int):
+        # The mapping is deleted along with the `Session` row.
+        pass
+
+
+class CacheSessionIndex(SessionIndex):
+    """Session index backed by the cache used for sessions. Entries
+    expire along with the session.
+    """
+
+    @property
+    def cache(self):
+        return caches[settings.SESSION_CACHE_ALIAS]
+
+    @staticmethod
+    def _cacheKey(userID: int) -> str:
+        return 'api:user-session:{}'.format(userID)
+
+    def getSessionKey(self, userID: int) -> Optional[str]:
+        return self.cache.get(self._cacheKey(userID))
+
+    def add(self, userID: int, store: SessionBase):
+        self.cache.set(
+            self._cacheKey(userID), store.session_key,
+            store.get_expiry_age()
+        )
+
+    def remove(self, userID: int):
+        self.cache.delete(self._cacheKey(userID))
+
+
+def getSessionIndex() -> SessionIndex:
+    """Returns the session index matching the configured
+    `SESSION_ENGINE`.
+    """
+    if usesDatabaseSessions():
+        return DatabaseSessionIndex()
+
+    return CacheSessionIndex()
+
+
+def _resolvedSessionCacheKey(sessionKey: str) -> str:
+    return 'api:resolved-session:{}'.format(sessionKey)
+
+
+def resolveSession(sessionKey: str) -> Optional[ResolvedSession]:
+    """Finds the user of a session and whether they are a teacher.
+
+    Sessions that were resolved recently are served from the cache for
+    `SESSION_VALIDATION_CACHE_TIMEOUT` seconds. Otherwise, with the
+    database session engines, this is a single joined query on the
+    `UserSessionMapping` table. With the other engines, the session is
+    loaded from its store and the user is fetched with one query.
+
+    :param sessionKey: The key of the session.
+    :type sessionKey: str
+
+    :returns: The resolved session, or None if the session does not
+        exist or has expired.
+    :rtype: ResolvedSession or None
+    """
+    timeout: int = getattr(settings, 'SESSION_VALIDATION_CACHE_TIMEOUT', 0)
+
+    if timeout <= 0:
+        return _resolveSession(sessionKey)
+
+    resolved: Optional[ResolvedSession] = cache.get(
+        _resolvedSessionCacheKey(sessionKey)
+    )
+    recordCacheLookup(resolved is not None)
+
+    if resolved is None:
+        resolved = _resolveSession(sessionKey)
+
+        if resolved is not None:
+            # Never serve a session from the cache after it expired.
+            secondsLeft: float = (
+                resolved.expireDate - timezone.now()
+            ).total_seconds()
+            cache.set(
+                _resolvedSessionCacheKey(sessionKey), resolved,
+                int(min(timeout, secondsLeft))
+            )
+
+    return resolved
+
+
+async def aresolveSession(sessionKey: str) -> Optional[ResolvedSession]:
+    """Asynchronous version of `resolveSession`."""
+    timeout: int = getattr(settings, 'SESSION_VALIDATION_CACHE_TIMEOUT', 0)
+
+    if timeout <= 0:
+        return await _aresolveSession(sessionKey)
+
+    resolved: Optional[ResolvedSession] = await cache.aget(
+        _resolvedSessionCacheKey(sessionKey)
+    )
+    recordCacheLookup(resolved is not None)
+
+    if resolved is None:
+        resolved = await _aresolveSession(sessionKey)
+
+        if resolved is not None:
+            secondsLeft: float = (
+                resolved.expireDate - timezone.now()
+            ).total_seconds()
+            await cache.aset(
+                _resolvedSessionCacheKey(sessionKey), resolved,
+                int(min(timeout, secondsLeft))
+            )
+
+    return resolved
+
+
+def forgetResolvedSession(sessionKey: str):
+    """Removes a session from the cache of resolved sessions. This must
+    be called whenever the session or its user changes.
+
+    :param sessionKey: The key of the session.
+    :type sessionKey: str
+    """
+    cache.delete(_resolvedSessionCacheKey(sessionKey))
+
+
+def _getMappingQueryset(sessionKey: str) -> QuerySet:
+    """Returns the query that resolves a session of the database session
+    engines, with its user and their role, in a single join.
+    """
+    return UserSessionMapping.objects\
+        .select_related('user', 'session')\
+        .annotate(
+            isTeacher=Exists(Teacher.objects.filter(user=OuterRef('user')))
+        )\
+        .filter(
+            session__pk=sessionKey, session__expire_date__gt=timezone.now()
+        )
+
+
+def _getUserQueryset(userID: int) -> QuerySet:
+    """Returns the query that fetches the user of a session of the other
+    session engines, along with their role.
+    """
+    return User.objects.annotate(
+        isTeacher=Exists(Teacher.objects.filter(user=OuterRef('pk')))
+    ).filter(pk=userID)
+
+
+def _resolveSession(sessionKey: str) -> Optional[ResolvedSession]:
+    if usesDatabaseSessions():
+        mapping: Optional[UserSessionMapping] = \
+            _getMappingQueryset(sessionKey).first()
+        if mapping is None:
+            return None
+
+        return ResolvedSession(
+            mapping.session.session_key, mapping.user, mapping.isTeacher,
+            mapping.session.expire_date
+        )
+
+    # A missing or an expired session loads as an empty session.
+    store: SessionBase = getSessionStore(sessionKey)
+    userID: Optional[int] = store.get(USER_ID_KEY)
+
+    if userID is None:
+        return None
+
+    user: Optional[User] = _getUserQueryset(userID).first()
+    if user is None:
+        return None
+
+    return ResolvedSession(
+        sessionKey, user, user.isTeacher, store.get_expiry_date()
+    )
+
+
+async def _aresolveSession(sessionKey: str) -> Optional[ResolvedSession]:
+    if usesDatabaseSessions():
+        mapping: Optional[UserSessionMapping] = \
+            await _getMappingQueryset(sessionKey).afirst()
+        if mapping is None:
+            return None
+
+        return ResolvedSession(
+            mapping.session.session_key, mapping.user, mapping.isTeacher,
+            mapping.session.expire_date
+        )
+
+    store: SessionBase = getSessionStore(sessionKey)
+    userID: Optional[int] = await store.aget(USER_ID_KEY)
+
+    if userID is None:
+        return None
+
+    user: Optional[User] = await _getUserQueryset(userID).afirst()
+    if user is None:
+        return None
+
+    return ResolvedSession(
+        sessionKey, user, user.isTeacher, await store.aget_expiry_date()
+    )
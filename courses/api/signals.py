@@ -0,0 +1,183 @@
+from typing import Optional
+
+from django.contrib.auth.models import User
+from django.db.backends.signals import connection_created
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from courses.metrics import installQueryTimer
+
+from .dbstats import countConnection
+from .models import (Course, CourseComment, CourseRating, CourseReply,
+                     CourseTaughtByTeacher, CourseVideo, Student, Teacher,
+                     VideoProcessingJob)
+from .responsecache import TEACHER, invalidate, invalidateCourses
+from .roles import forgetUserRole
+from .sessions import forgetResolvedSession, getSessionIndex
+
+
+@receiver(post_save, sender=Teacher)
+@receiver(post_delete, sender=Teacher)
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+def invalidateUserRole(sender, instance, **kwargs):
+    """Drops the cached role of a user whenever their `Teacher` or
+    `Student` row changes.
+    """
+    forgetUserRole(instance.user_id)
+
+    # The resolved session of the user also holds their role.
+    sessionKey: Optional[str] = getSessionIndex().getSessionKey(
+        instance.user_id
+    )
+    if sessionKey is not None:
+        forgetResolvedSession(sessionKey)
+
+
+@receiver(post_save, sender=CourseVideo)
+def enqueueVideoProcessing(sender, instance, created, **kwargs):
+    """Queues new videos for conversion to HLS."""
+    if created and not kwargs.get('raw', False):
+        VideoProcessingJob.objects.create(video=instance)
+
+
+@receiver(post_delete, sender=CourseRating)
+def removeCourseRating(sender, instance, **kwargs):
+    """Removes a deleted rating from the aggregates of its course. The
+    deletion and this update share the deletion's transaction.
+    """
+    Course.adjustRating(
+        *getattr(instance, '_counted', (instance.course_id, instance.rating)),
+        -1
+    )
+
+
+@receiver(pre_delete, sender=CourseComment)
+def removeCourseComment(sender, instance, **kwargs):
+    """Removes a deleted comment and its replies from the counters of its
+    course. It runs before the replies are detached from the comment and
+    inside the deletion's transaction.
+    """
+    if instance.course_id is None:
+        return
+
+    Course.objects.filter(pk=instance.course_id).update(
+        commentCount=F('commentCount') - 1,
+        replyCount=F('replyCount') - CourseReply.objects.filter(
+            comment_id=instance.pk
+        ).count()
+    )
+
+
+@receiver(post_delete, sender=CourseReply)
+def removeCourseReply(sender, instance, **kwargs):
+    """Removes a deleted reply from the counters of the course of its
+    comment.
+    """
+    if instance.comment_id is not None:
+        Course.objects.filter(coursecomment__id=instance.comment_id).update(
+            replyCount=F('replyCount') - 1
+        )
+
+
+@receiver(post_save, sender=Course)
+@receiver(pre_delete, sender=Course)
+def invalidateCourse(sender, instance, **kwargs):
+    """Drops the cached responses that show a course. On deletion, it
+    runs while the teachers of the course can still be found.
+    """
+    invalidateCourses([instance.pk])
+
+
+@receiver(post_save, sender=CourseRating)
+@receiver(post_delete, sender=CourseRating)
+@receiver(post_save, sender=CourseComment)
+@receiver(post_delete, sender=CourseComment)
+def invalidateCourseCounters(sender, instance, **kwargs):
+    """Drops the cached responses of a course whose rating aggregates or
+    comment counters have changed. A comment moved to another course is
+    also removed from the counters of its previous course.
+    """
+    invalidateCourses([
+        instance.course_id, getattr(instance, '_countedCourseID', None)
+    ])
+
+
+@receiver(post_save, sender=CourseReply)
+@receiver(post_delete, sender=CourseReply)
+def invalidateReplyCourse(sender, instance, **kwargs):
+    """Drops the cached responses of the course of a reply's comment. A
+    reply moved to another comment is also removed from the counters of
+    the course of its previous comment.
+    """
+    invalidateCourses(CourseComment.objects.filter(pk__in=[
+        instance.comment_id, getattr(instance, '_countedCommentID', None)
+    ]).values_list('course_id', flat=True))
+
+
+@receiver(post_save, sender=CourseVideo)
+@receiver(post_delete, sender=CourseVideo)
+def invalidateVideoCourse(sender, instance, **kwargs):
+    """Drops the cached details of the course of a video. The course
+    lists of the teachers do not show the videos.
+    """
+    invalidateCourses([instance.course_id], withTeachers=False)
+
+
+@receiver(post_save, sender=VideoProcessingJob)
+def invalidateProcessedVideoCourse(sender, instance, **kwargs):
+    """Drops the cached details of the course of a video whose HLS
+    conversion has changed, as the URL of the video changes when it
+    is ready.
+    """
+    invalidateCourses(CourseVideo.objects.filter(
+        pk=instance.video_id
+    ).values_list('course_id', flat=True), withTeachers=False)
+
+
+@receiver(post_save, sender=CourseTaughtByTeacher)
+@receiver(post_delete, sender=CourseTaughtByTeacher)
+def invalidateTaughtBy(sender, instance, **kwargs):
+    """Drops the cached responses of a course and of its teacher when the
+    teacher starts or stops teaching it.
+    """
+    invalidateCourses([instance.course_id])
+    invalidate(TEACHER, Teacher.objects.filter(
+        pk=instance.teacher_id
+    ).values_list('user_id', flat=True))
+
+
+@receiver(pre_delete, sender=Teacher)
+def invalidateTeacherCourses(sender, instance, **kwargs):
+    """Drops the cached responses of the courses of a deleted teacher.
+    The teacher is detached from their courses without any signal, so it
+    runs while the courses can still be found.
+    """
+    invalidateCourses(CourseTaughtByTeacher.objects.filter(
+        teacher_id=instance.pk
+    ).values_list('course_id', flat=True), withTeachers=False)
+    invalidate(TEACHER, [instance.user_id])
+
+
+@receiver(post_save, sender=User)
+def invalidateTeacherName(sender, instance, created, update_fields,
+                          **kwargs):
+    """Drops the cached details of the courses of a teacher whose name may
+    have changed. Logins only save the time of the login, and are
+    skipped.
+    """
+    if created or (
+        update_fields is not None
+        and not {'first_name', 'last_name'} & set(update_fields)
+    ):
+        return
+
+    invalidateCourses(CourseTaughtByTeacher.objects.filter(
+        teacher__user=instance
+    ).values_list('course_id', flat=True), withTeachers=False)
+
+
+connection_created.connect(countConnection)
+# Counts and times the queries of the requests.
+connection_created.connect(installQueryTimer)
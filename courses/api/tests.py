@@ -1,3 +1,1084 @@
-from django.test import TestCase
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from base64 import urlsafe_b64encode
+from datetime import timedelta
+from io import BytesIO, StringIO
+from typing import Any, Dict, List, Optional
+from unittest import mock
+from urllib.parse import urlparse
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+
+from shortener.cache import shortURLCache
+
+from . import transcoding
+from .models import (Course, CourseComment, CourseRating, CourseReply,
+                     CourseTaughtByTeacher, CourseVideo, Student, Teacher,
+                     UserSessionMapping, VideoProcessingJob, VideoUpload)
+from .pagination import decodeCursor, encodeCursor
+from .roles import STUDENT, TEACHER, getUserRole
+from .views.upload import VideoUploadDetailView
+
+
+def clearCaches():
+    """Clears the shared cache and the in-process cache of the short
+    URLs.
+    """
+    cache.clear()
+    shortURLCache.clearLocal()
+
+
+@override_settings(
+    API_RESPONSE_CACHE_TIMEOUT=0,
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher']
+)
+class APITestCase(TestCase):
+    """Creates a teacher who teaches a course with a few videos. The
+    responses are not cached, so that every request reaches the view,
+    and the passwords are hashed quickly.
+    """
+
+    def setUp(self):
+        clearCaches()
+        self.addCleanup(clearCaches)
+
+        self.user: User = User.objects.create_user(
+            'teacher', 'teacher@example.com', 'password',
+            first_name='First', last_name='Teacher'
+        )
+        self.teacher: Teacher = Teacher.objects.create(
+            user=self.user, biography='Biography.'
+        )
+        self.course: Course = self.createCourse('Course')
+
+        for index in range(3):
+            self.addVideo(index)
+
+    def createCourse(self, name: str) -> Course:
+        """Creates a course taught by the teacher."""
+        course: Course = Course.objects.create(
+            name=name, description='Description.',
+            image='course/image/{}.png'.format(name)
+        )
+        CourseTaughtByTeacher.objects.create(
+            teacher=self.teacher, course=course
+        )
+
+        return course
+
+    def addTeacher(self, index: int):
+        """Adds another teacher to the course."""
+        user: User = User.objects.create_user(
+            'teacher{}'.format(index), first_name='Teacher',
+            last_name=str(index)
+        )
+        CourseTaughtByTeacher.objects.create(
+            teacher=Teacher.objects.create(user=user), course=self.course
+        )
+
+    def addVideo(self, index: int) -> CourseVideo:
+        return CourseVideo.objects.create(
+            course=self.course, title='Video {}'.format(index),
+            description='Description.',
+            video='course/videos/{}.mp4'.format(index)
+        )
+
+    def useTemporaryMediaRoot(self) -> str:
+        """Stores the media files of the test in a temporary directory,
+        which is deleted after the test.
+        """
+        mediaRoot: str = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, mediaRoot)
+
+        settings = override_settings(
+            MEDIA_ROOT=mediaRoot,
+            VIDEO_UPLOAD_TEMP_DIR=os.path.join(mediaRoot, 'uploads')
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        return mediaRoot
+
+    def logIn(self) -> Dict[str, Any]:
+        response = self.client.post('/api/login/', {
+            'username': 'teacher', 'password': 'password'
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+
+        return response.json()
+
+
+class CourseDetailTests(APITestCase):
+    def getDetail(self, **params):
+        return self.client.get(
+            '/api/course/detail/{}/'.format(self.course.id), params
+        )
+
+    def testQueryCount(self):
+        # The first request creates the short URLs.
+        self.getDetail()
+
+        # The course, its teachers with their names, its videos and its
+        # short URLs.
+        with self.assertNumQueries(4):
+            response = self.getDetail()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['videos']), 3)
+
+    def testQueryCountIsConstant(self):
+        for index in range(3):
+            self.addTeacher(index)
+            self.addVideo(index + 3)
+        self.getDetail()
+
+        with self.assertNumQueries(4):
+            response = self.getDetail()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['teachers']), 4)
+        self.assertEqual(len(response.json()['videos']), 6)
+
+    def testUnknownCourse(self):
+        response = self.client.get('/api/course/detail/0/')
+        self.assertEqual(response.status_code, 404)
+
+
+class TeacherCoursesTests(APITestCase):
+    def getCourses(self, **params):
+        return self.client.get('/api/teacher/course/all/', params)
+
+    def testQueryCount(self):
+        for index in range(4):
+            self.createCourse('Course {}'.format(index))
+        self.logIn()
+        # The first request creates the short URLs.
+        self.getCourses()
+        clearCaches()
+
+        # The session with the role of its user, the courses and their
+        # short URLs.
+        with self.assertNumQueries(3):
+            response = self.getCourses()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 5)
+
+    def testQueryCountIsConstant(self):
+        self.logIn()
+        self.getCourses()
+        for index in range(10):
+            self.createCourse('Course {}'.format(index))
+        self.getCourses()
+        clearCaches()
+
+        with self.assertNumQueries(3):
+            response = self.getCourses()
+        self.assertEqual(len(response.json()), 11)
+
+    def testNotLoggedIn(self):
+        self.assertEqual(self.getCourses().status_code, 401)
+
+
+def makeCursor(text: str) -> str:
+    """Encodes raw JSON as a cursor token."""
+    return urlsafe_b64encode(text.encode()).decode()
+
+
+class CursorTests(APITestCase):
+    def testDecode(self):
+        self.assertEqual(decodeCursor(encodeCursor([1, 'a']), 2), [1, 'a'])
+
+        for cursor in (
+            'not a cursor', makeCursor('{}'), makeCursor('[1, 2]'),
+            makeCursor('[1e999]'), makeCursor('[-1e999]'),
+            makeCursor('[NaN]'), makeCursor('[{}]'.format(2 ** 63))
+        ):
+            with self.subTest(cursor=cursor):
+                with self.assertRaises(ValueError):
+                    decodeCursor(cursor, 1)
+
+    def testVideoPages(self):
+        videoIDs: List[int] = []
+        cursor: Optional[str] = None
+        while True:
+            response = self.client.get(
+                '/api/course/detail/{}/'.format(self.course.id),
+                {'pageSize': 2, **({'cursor': cursor} if cursor else {})}
+            )
+            self.assertEqual(response.status_code, 200)
+            videoIDs += [video['id'] for video in response.json()['videos']]
+            cursor = response.json()['nextCursor']
+            if cursor is None:
+                break
+
+        self.assertEqual(videoIDs, sorted(
+            CourseVideo.objects.values_list('id', flat=True)
+        ))
+
+    def testCoursePages(self):
+        for index in range(4):
+            self.createCourse('Course {}'.format(index))
+        self.logIn()
+
+        response = self.client.get(
+            '/api/teacher/course/all/', {'pageSize': 3}
+        )
+        self.assertEqual(len(response.json()), 3)
+
+        response = self.client.get('/api/teacher/course/all/', {
+            'pageSize': 3, 'cursor': response['X-Next-Cursor']
+        })
+        self.assertEqual(len(response.json()), 2)
+        self.assertFalse(response.has_header('X-Next-Cursor'))
+
+    def testInvalidCursor(self):
+        self.logIn()
+
+        for cursor in (
+            'not a cursor', makeCursor('["a", "b"]'), makeCursor('[1e999]'),
+            makeCursor('[{}]'.format(2 ** 64))
+        ):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(
+                    '/api/teacher/course/all/', {'cursor': cursor}
+                )
+                self.assertEqual(response.status_code, 400)
+                response = self.client.get(
+                    '/api/course/{}/comments/'.format(self.course.id),
+                    {'cursor': cursor}
+                )
+                self.assertEqual(response.status_code, 400)
+
+
+# The start of an MP4 file.
+MP4_HEADER = b'\x00\x00\x00\x18ftypmp42\x00\x00\x00\x00mp42isom'
+
+
+class VideoUploadTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.mediaRoot: str = self.useTemporaryMediaRoot()
+        self.logIn()
+
+    def createUpload(self, size: int) -> str:
+        """Starts an upload and returns its URL."""
+        response = self.client.post('/api/teacher/video/upload/', {
+            'courseID': self.course.id, 'title': 'Title',
+            'description': 'Description.', 'fileName': '../a video.mp4',
+            'size': size
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+
+        return '/api/teacher/video/upload/{}/'.format(
+            response.json()['uploadID']
+        )
+
+    def sendChunk(self, url: str, chunk: bytes, offset: int):
+        return self.client.patch(
+            url, chunk, content_type='application/offset+octet-stream',
+            HTTP_UPLOAD_OFFSET=str(offset)
+        )
+
+    def testResumableUpload(self):
+        video: bytes = MP4_HEADER + os.urandom(100000)
+        url: str = self.createUpload(len(video))
+
+        response = self.sendChunk(url, video[:50000], 0)
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(response['Upload-Offset'], '50000')
+
+        # A chunk sent at the wrong offset.
+        self.assertEqual(self.sendChunk(url, video[:100], 0).status_code, 409)
+        self.assertEqual(self.client.head(url)['Upload-Offset'], '50000')
+        # The upload is not complete yet.
+        self.assertEqual(self.client.post(url + 'finalize/').status_code, 409)
+
+        response = self.sendChunk(url, video[50000:], 50000)
+        self.assertEqual(response.status_code, 204)
+
+        response = self.client.post(url + 'finalize/')
+        self.assertEqual(response.status_code, 201)
+        courseVideo: CourseVideo = CourseVideo.objects.get(
+            id=response.json()['id']
+        )
+        with courseVideo.video.open('rb') as file:
+            self.assertEqual(file.read(), video)
+
+    def testHeaderSentInSeveralChunks(self):
+        video: bytes = MP4_HEADER + os.urandom(20000)
+        url: str = self.createUpload(len(video))
+
+        # The first chunks are too short to tell the type of the file.
+        for start, end in ((0, 10), (10, 100), (100, 1000)):
+            response = self.sendChunk(url, video[start:end], start)
+            self.assertEqual(response.status_code, 204)
+
+        response = self.sendChunk(url, video[1000:], 1000)
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.client.post(url + 'finalize/').status_code, 201)
+
+    def testUnsupportedType(self):
+        text: bytes = b'Not a video. ' * 1000
+        url: str = self.createUpload(len(text))
+
+        self.assertEqual(self.sendChunk(url, text[:100], 0).status_code, 204)
+        response = self.sendChunk(url, text[100:], 100)
+        self.assertEqual(response.status_code, 415)
+        self.assertEqual(self.client.head(url).status_code, 404)
+
+    def testUnsupportedTypeShorterThanHeader(self):
+        text: bytes = b'Not a video.'
+        url: str = self.createUpload(len(text))
+
+        response = self.sendChunk(url, text, 0)
+        self.assertEqual(response.status_code, 415)
+
+    def testOffsetChangedByAnotherRequest(self):
+        url: str = self.createUpload(len(MP4_HEADER) + 100)
+        copyChunk = VideoUploadDetailView._copyChunk
+
+        def copyAfterAnotherRequest(request, partial, length: int) -> int:
+            # Another request records its chunk while this one is copied.
+            VideoUpload.objects.update(offset=10)
+            return copyChunk(request, partial, length)
+
+        with mock.patch.object(
+            VideoUploadDetailView, '_copyChunk',
+            staticmethod(copyAfterAnotherRequest)
+        ):
+            response = self.sendChunk(url, MP4_HEADER, 0)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Upload-Offset'], '10')
+
+    def completeUpload(self) -> str:
+        video: bytes = MP4_HEADER + os.urandom(1000)
+        url: str = self.createUpload(len(video))
+        self.assertEqual(self.sendChunk(url, video, 0).status_code, 204)
+
+        return url
+
+    def testFinalizeAfterLeavingCourse(self):
+        url: str = self.completeUpload()
+        CourseTaughtByTeacher.objects.filter(course=self.course).delete()
+
+        self.assertEqual(self.client.post(url + 'finalize/').status_code, 403)
+        self.assertEqual(
+            CourseVideo.objects.filter(course=self.course).count(), 3
+        )
+
+    def testFinalizeFails(self):
+        url: str = self.completeUpload()
+
+        with mock.patch.object(CourseVideo, 'save', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                self.client.post(url + 'finalize/')
+        # Only the upload directory is left.
+        self.assertEqual(
+            [files for _, _, files in os.walk(self.mediaRoot) if files], []
+        )
+
+    def testCleanUploads(self):
+        abandonedURL: str = self.completeUpload()
+        url: str = self.createUpload(100)
+        VideoUpload.objects.filter(pk=abandonedURL.split('/')[-2]).update(
+            dateUpdated=timezone.now() - timedelta(hours=25)
+        )
+
+        # The file of an upload that was deleted without it.
+        orphan: str = os.path.join(self.mediaRoot, 'uploads', 'orphan')
+        open(orphan, 'wb').close()
+        timestamp: float = time.time() - 25 * 60 * 60
+        os.utime(orphan, (timestamp, timestamp))
+
+        call_command('cleanuploads', stdout=StringIO())
+
+        self.assertEqual(self.client.head(abandonedURL).status_code, 404)
+        self.assertEqual(self.client.head(url).status_code, 200)
+        self.assertEqual(
+            os.listdir(os.path.join(self.mediaRoot, 'uploads')),
+            [url.split('/')[-2]]
+        )
+
+
+class CourseVideoFileTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        mediaRoot: str = self.useTemporaryMediaRoot()
+
+        self.data: bytes = os.urandom(1000)
+        os.makedirs(os.path.join(mediaRoot, 'course', 'videos'))
+        with open(
+            os.path.join(mediaRoot, 'course', 'videos', '0.mp4'), 'wb'
+        ) as file:
+            file.write(self.data)
+
+        self.url: str = '/media/course/videos/0.mp4'
+
+    def getContent(self, response) -> bytes:
+        return b''.join(response.streaming_content)
+
+    def testFullFile(self):
+        response = self.client.get(self.url, HTTP_ACCEPT='video/mp4')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(self.getContent(response), self.data)
+
+    def testRanges(self):
+        for header, start, end in (
+            ('bytes=10-19', 10, 20), ('bytes=-5', 995, 1000),
+            ('bytes=990-', 990, 1000), ('bytes=990-2000', 990, 1000)
+        ):
+            with self.subTest(header=header):
+                response = self.client.get(self.url, HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(
+                    response['Content-Range'],
+                    'bytes {}-{}/1000'.format(start, end - 1)
+                )
+                self.assertEqual(
+                    self.getContent(response), self.data[start:end]
+                )
+
+    def testUnsatisfiableRange(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=1000-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */1000')
+
+    def testConditionalRequests(self):
+        etag: str = self.client.get(self.url)['ETag']
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # A range of another version of the file returns the whole file.
+        response = self.client.get(
+            self.url, HTTP_RANGE='bytes=0-1', HTTP_IF_RANGE='"other"'
+        )
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(
+            self.url, HTTP_RANGE='bytes=0-1', HTTP_IF_RANGE=etag
+        )
+        self.assertEqual(response.status_code, 206)
+
+    def testMissingFile(self):
+        for url in (
+            '/media/course/videos/1.mp4',
+            '/media/course/videos/../../../etc/passwd'
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+    def testShortURL(self):
+        response = self.client.get(
+            '/api/course/detail/{}/'.format(self.course.id)
+        )
+        video: Dict[str, Any] = response.json()['videos'][0]
+
+        response = self.client.get(urlparse(video['url']).path)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response['Location'], self.url)
+
+
+class VideoProcessingTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.useTemporaryMediaRoot()
+
+    def completed(self, returncode: int = 0,
+            stderr: str = '') -> subprocess.CompletedProcess:
+        return subprocess.CompletedProcess([], returncode, '', stderr)
+
+    def testAudioProbe(self):
+        for stderr, hasAudio in (
+            ('  Stream #0:0(und): Video: h264\n'
+             '  Stream #0:1[0x2](und): Audio: aac (LC)\n', True),
+            ('  Stream #0:0(und): Video: h264\n', False)
+        ):
+            with self.subTest(hasAudio=hasAudio), mock.patch(
+                'subprocess.run', return_value=self.completed(1, stderr)
+            ):
+                self.assertEqual(
+                    transcoding._hasAudio('ffmpeg', 'video.mp4'), hasAudio
+                )
+
+    def testVideoWithoutAudio(self):
+        renditions = ((720, '2800k', '128k'), (360, '800k', '96k'))
+
+        command: List[str] = transcoding._transcodeCommand(
+            'ffmpeg', 'video.mp4', renditions, 6, False
+        )
+        self.assertNotIn('0:a', command)
+        self.assertEqual(
+            command[command.index('-var_stream_map') + 1], 'v:0 v:1'
+        )
+
+        command = transcoding._transcodeCommand(
+            'ffmpeg', 'video.mp4', renditions, 6, True
+        )
+        self.assertEqual(command.count('0:a'), 2)
+        self.assertEqual(
+            command[command.index('-var_stream_map') + 1], 'v:0,a:0 v:1,a:1'
+        )
+
+    @override_settings(VIDEO_HLS_TIMEOUT=10)
+    def testTimeout(self):
+        with mock.patch('shutil.which', return_value='ffmpeg'), \
+                mock.patch('subprocess.run', side_effect=[
+                    self.completed(), subprocess.TimeoutExpired('ffmpeg', 10)
+                ]) as run:
+            with self.assertRaisesMessage(
+                transcoding.TranscodingError, 'within 10 seconds'
+            ):
+                transcoding.convertToHLS(
+                    CourseVideo._meta.get_field('video').storage,
+                    'course/videos/0.mp4'
+                )
+        self.assertEqual(run.call_args.kwargs['timeout'], 10)
+
+    def testStaleJob(self):
+        jobs: List[VideoProcessingJob] = list(
+            VideoProcessingJob.objects.order_by('id')
+        )
+        # The worker of the first job stopped, the second job is still
+        # running.
+        for job, heartbeatAt in (
+            (jobs[0], timezone.now() - timedelta(minutes=11)),
+            (jobs[1], timezone.now())
+        ):
+            VideoProcessingJob.objects.filter(pk=job.pk).update(
+                status=VideoProcessingJob.RUNNING, attempts=1,
+                heartbeatAt=heartbeatAt
+            )
+        jobs[2].delete()
+
+        with mock.patch(
+            'api.management.commands.processvideos.convertToHLS',
+            return_value='master.m3u8'
+        ):
+            call_command(
+                'processvideos', '--once', '--retry-delay', '0',
+                stdout=StringIO(), stderr=StringIO()
+            )
+
+        jobs[0].refresh_from_db()
+        self.assertEqual(jobs[0].status, VideoProcessingJob.READY)
+        self.assertEqual(jobs[0].attempts, 2)
+        jobs[1].refresh_from_db()
+        self.assertEqual(jobs[1].status, VideoProcessingJob.RUNNING)
+
+class CourseImageTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.mediaRoot: str = self.useTemporaryMediaRoot()
+        self.cacheDirectory: str = os.path.join(
+            self.mediaRoot, 'cache', 'images'
+        )
+
+        settings = override_settings(IMAGE_CACHE_DIR=self.cacheDirectory)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def createImage(self, name: str):
+        path: str = os.path.join(self.mediaRoot, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        Image.new('RGB', (1000, 500), (255, 0, 0)).save(path)
+
+        Course.objects.filter(pk=self.course.pk).update(image=name)
+
+    def getSrcset(self) -> Dict[str, Dict[str, str]]:
+        return self.client.get(
+            '/api/course/detail/{}/'.format(self.course.id)
+        ).json()['imageSrcset']
+
+    def getContent(self, url: str) -> bytes:
+        response = self.client.get(urlparse(url).path)
+        self.assertEqual(response.status_code, 200)
+
+        return b''.join(response.streaming_content)
+
+    def getImage(self, url: str) -> Image.Image:
+        return Image.open(BytesIO(self.getContent(url)))
+
+    def testDerivative(self):
+        self.createImage('course/image/course.png')
+
+        image: Image.Image = self.getImage(self.getSrcset()['webp']['320w'])
+        self.assertEqual(image.format, 'WEBP')
+        self.assertEqual(image.size, (320, 160))
+
+    def testDefaultImage(self):
+        self.createImage('defaults/images/defaultPhoto.png')
+
+        image: Image.Image = self.getImage(self.getSrcset()['jpeg']['160w'])
+        self.assertEqual(image.size, (160, 80))
+
+    def testOtherImage(self):
+        self.createImage('other/course.png')
+
+        self.assertEqual(self.getSrcset(), {})
+
+    def testOriginalServedWhenNotResized(self):
+        self.createImage('course/image/course.png')
+        url: str = self.getSrcset()['webp']['320w']
+
+        with mock.patch('PIL.Image.MAX_IMAGE_PIXELS', 1000):
+            # Too large to be decoded safely.
+            content: bytes = self.getContent(url)
+        self.assertEqual(Image.open(BytesIO(content)).size, (1000, 500))
+
+        with open(
+            os.path.join(self.mediaRoot, 'course', 'image', 'course.png'),
+            'r+b'
+        ) as file:
+            file.truncate(100)
+        self.assertEqual(len(self.getContent(url)), 100)
+
+    @override_settings(IMAGE_CACHE_MAX_SIZE=0)
+    def testEviction(self):
+        self.createImage('course/image/course.png')
+        srcset: Dict[str, Dict[str, str]] = self.getSrcset()
+
+        def countDerivatives() -> int:
+            return sum(
+                len(files) for _, _, files in os.walk(self.cacheDirectory)
+            )
+
+        # Only the first derivative runs the eviction, the next ones
+        # wait for the interval.
+        for url in srcset['webp'].values():
+            self.getImage(url)
+        self.assertEqual(countDerivatives(), len(srcset['webp']))
+
+        call_command('evictimages', stdout=StringIO())
+        self.assertEqual(countDerivatives(), 0)
+
+class RatingAggregateTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.student: Student = Student.objects.create(
+            user=User.objects.create_user('student')
+        )
+
+    def addRating(self, course: Course, rating: int) -> CourseRating:
+        return CourseRating.objects.create(
+            course=course, student=self.student, rating=rating
+        )
+
+    def getSummary(self, course: Course) -> Dict[str, Any]:
+        course.refresh_from_db()
+
+        return course.getRatingSummary()
+
+    def testCreateAndDelete(self):
+        for rating in (5, 5, 4, 1):
+            self.addRating(self.course, rating)
+
+        self.assertEqual(self.getSummary(self.course), {
+            'count': 4, 'average': 3.75,
+            'histogram': {'1': 1, '2': 0, '3': 0, '4': 1, '5': 2},
+        })
+
+        CourseRating.objects.filter(rating=5).first().delete()
+        self.assertEqual(self.getSummary(self.course)['count'], 3)
+        self.assertEqual(
+            self.getSummary(self.course)['histogram']['5'], 1
+        )
+
+    def testChangeRating(self):
+        rating: CourseRating = self.addRating(self.course, 5)
+
+        rating = CourseRating.objects.get(pk=rating.pk)
+        rating.rating = 2
+        rating.save()
+        self.assertEqual(self.getSummary(self.course), {
+            'count': 1, 'average': 2.0,
+            'histogram': {'1': 0, '2': 1, '3': 0, '4': 0, '5': 0},
+        })
+
+        # Saving it again does not count it twice.
+        rating.save()
+        self.assertEqual(self.getSummary(self.course)['count'], 1)
+
+    def testMoveRating(self):
+        otherCourse: Course = self.createCourse('Other')
+        rating: CourseRating = self.addRating(self.course, 4)
+
+        rating.course = otherCourse
+        rating.save()
+        self.assertEqual(self.getSummary(self.course)['count'], 0)
+        self.assertEqual(self.getSummary(otherCourse), {
+            'count': 1, 'average': 4.0,
+            'histogram': {'1': 0, '2': 0, '3': 0, '4': 1, '5': 0},
+        })
+
+    def testRebuild(self):
+        self.addRating(self.course, 3)
+        Course.objects.update(ratingCount=0, ratingSum=0, rating3Count=0)
+
+        call_command('rebuildratings', stdout=StringIO())
+        self.assertEqual(self.getSummary(self.course)['average'], 3.0)
+
+    def testCourseDetail(self):
+        self.addRating(self.course, 4)
+        self.addRating(self.course, 5)
+
+        response = self.client.get(
+            '/api/course/detail/{}/'.format(self.course.id)
+        )
+        self.assertEqual(response.json()['rating']['count'], 2)
+        self.assertEqual(response.json()['rating']['average'], 4.5)
+
+
+class DiscussionCounterTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.student: User = User.objects.create_user('student')
+
+    def addComment(self, course: Course) -> CourseComment:
+        return CourseComment.objects.create(
+            course=course, user=self.student, comment='Comment.'
+        )
+
+    def addReply(self, comment: CourseComment) -> CourseReply:
+        return CourseReply.objects.create(
+            comment=comment, user=self.student, reply='Reply.'
+        )
+
+    def assertCounters(self, course: Course, commentCount: int,
+                       replyCount: int):
+        course.refresh_from_db()
+        self.assertEqual(
+            (course.commentCount, course.replyCount),
+            (commentCount, replyCount)
+        )
+
+    def testCreateAndDelete(self):
+        comments: List[CourseComment] = [
+            self.addComment(self.course) for _ in range(3)
+        ]
+        replies: List[CourseReply] = [
+            self.addReply(comment) for comment in comments for _ in range(2)
+        ]
+        reply: CourseReply = replies[-1]
+
+        self.assertCounters(self.course, 3, 6)
+        self.assertEqual(self.course.lastActivity, reply.dateAdded)
+
+        reply.delete()
+        self.assertCounters(self.course, 3, 5)
+        # The replies of a deleted comment are uncounted too.
+        comments[0].delete()
+        self.assertCounters(self.course, 2, 3)
+
+    def testMoveComment(self):
+        otherCourse: Course = self.createCourse('Other')
+        comment: CourseComment = self.addComment(self.course)
+        self.addComment(self.course)
+        for _ in range(2):
+            self.addReply(comment)
+
+        comment = CourseComment.objects.get(pk=comment.pk)
+        comment.course = otherCourse
+        comment.save()
+        self.assertCounters(self.course, 1, 0)
+        self.assertCounters(otherCourse, 1, 2)
+
+        # Saving it again does not count it twice.
+        comment.comment = 'Edited.'
+        comment.save()
+        self.assertCounters(otherCourse, 1, 2)
+
+        # A reply moved back to a comment of the first course.
+        reply: CourseReply = CourseReply.objects.filter(
+            comment=comment
+        ).first()
+        reply.comment = CourseComment.objects.filter(
+            course=self.course
+        ).get()
+        reply.save()
+        self.assertCounters(self.course, 1, 1)
+        self.assertCounters(otherCourse, 1, 1)
+
+        reply.reply = 'Edited.'
+        reply.save()
+        self.assertCounters(self.course, 1, 1)
+
+    def testReconcile(self):
+        comment: CourseComment = self.addComment(self.course)
+        self.addReply(comment)
+        Course.objects.update(commentCount=0, replyCount=0, lastActivity=None)
+
+        call_command('reconcilediscussions', stdout=StringIO())
+        self.assertCounters(self.course, 1, 1)
+        self.assertIsNotNone(self.course.lastActivity)
+
+    def testCourseDetail(self):
+        comment: CourseComment = self.addComment(self.course)
+        self.addReply(comment)
+
+        response = self.client.get(
+            '/api/course/detail/{}/'.format(self.course.id)
+        )
+        self.assertEqual(response.json()['commentCount'], 1)
+        self.assertEqual(response.json()['replyCount'], 1)
+
+class CourseCommentsTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.student: User = User.objects.create_user('student')
+
+        self.comments: List[CourseComment] = [
+            CourseComment.objects.create(
+                course=self.course, user=self.student, comment='Comment.'
+            ) for _ in range(3)
+        ]
+        # More replies than `API_REPLIES_PER_COMMENT` on every comment.
+        for comment in self.comments:
+            CourseReply.objects.bulk_create([
+                CourseReply(comment=comment, user=self.student, reply='Reply.')
+                for _ in range(5)
+            ])
+
+    def getComments(self, **params):
+        return self.client.get(
+            '/api/course/{}/comments/'.format(self.course.id), params
+        )
+
+    @override_settings(API_REPLIES_PER_COMMENT=3)
+    def testQueryCount(self):
+        # The comments and the replies of all of them.
+        with self.assertNumQueries(2):
+            response = self.getComments()
+        self.assertEqual(response.status_code, 200)
+
+        comments: List[Dict[str, Any]] = response.json()['comments']
+        self.assertEqual(len(comments), 3)
+        for comment in comments:
+            self.assertEqual(len(comment['replies']), 3)
+            self.assertIsNotNone(comment['repliesCursor'])
+        self.assertEqual(comments[0]['user']['username'], 'student')
+
+    @override_settings(API_REPLIES_PER_COMMENT=3)
+    def testRemainingReplies(self):
+        comment: Dict[str, Any] = self.getComments().json()['comments'][0]
+
+        response = self.client.get(
+            '/api/course/comment/{}/replies/'.format(comment['id']),
+            {'cursor': comment['repliesCursor']}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['replies']), 2)
+        self.assertIsNone(response.json()['nextCursor'])
+
+    def testPages(self):
+        response = self.getComments(pageSize=2)
+        self.assertEqual(len(response.json()['comments']), 2)
+
+        response = self.getComments(
+            pageSize=2, cursor=response.json()['nextCursor']
+        )
+        self.assertEqual(
+            [comment['id'] for comment in response.json()['comments']],
+            [self.comments[2].id]
+        )
+
+    def testUnknownCourse(self):
+        response = self.client.get('/api/course/0/comments/')
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(API_RESPONSE_CACHE_TIMEOUT=60)
+class ResponseCacheTests(APITestCase):
+    def getDetail(self, **headers):
+        return self.client.get(
+            '/api/course/detail/{}/'.format(self.course.id), **headers
+        )
+
+    def testCachedResponse(self):
+        response = self.getDetail()
+        etag: str = response['ETag']
+
+        with self.assertNumQueries(0):
+            cached = self.getDetail()
+        self.assertEqual(cached.content, response.content)
+
+        with self.assertNumQueries(0):
+            response = self.getDetail(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def testVideoAdded(self):
+        etag: str = self.getDetail()['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.addVideo(3)
+
+        response = self.getDetail(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['videos']), 4)
+
+    def testLogInKeepsCachedResponse(self):
+        etag: str = self.getDetail()['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.logIn()
+
+        response = self.getDetail(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def testTeacherDeleted(self):
+        self.getDetail()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+
+        self.assertEqual(self.getDetail().json()['teachers'], [])
+
+    def testAggregatesRebuilt(self):
+        for command, field in (
+            ('rebuildratings', 'ratingCount'),
+            ('reconcilediscussions', 'commentCount')
+        ):
+            with self.subTest(command=command):
+                # Stale aggregates, changed without any signal.
+                Course.objects.update(**{field: 1})
+                etag: str = self.getDetail()['ETag']
+
+                with self.captureOnCommitCallbacks(execute=True):
+                    call_command(command, stdout=StringIO())
+
+                response = self.getDetail(HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etag)
+                self.assertEqual(response.json()['rating']['count'], 0)
+                self.assertEqual(response.json()['commentCount'], 0)
+
+
+class SessionTests(APITestCase):
+    def validate(self, sessionID: str):
+        return self.client.post(
+            '/api/validate/', {'sessionID': sessionID},
+            content_type='application/json'
+        )
+
+    def testValidate(self):
+        sessionID: str = self.logIn()['sessionID']
+
+        response = self.validate(sessionID)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['sessionID'], sessionID)
+
+    def testValidateSessionWithoutUserID(self):
+        # Sessions used to be created without the ID of their user, which
+        # is then only known through the session index.
+        session: SessionStore = SessionStore()
+        session.set_expiry(timedelta(days=14))
+        session.create()
+        UserSessionMapping.objects.create(
+            user=self.user, session_id=session.session_key
+        )
+
+        response = self.validate(session.session_key)
+        self.assertEqual(response.status_code, 200)
+        # The session expired in less than 30 days, so it was extended.
+        self.assertGreater(
+            Session.objects.get(pk=session.session_key).expire_date,
+            timezone.now() + timedelta(days=40)
+        )
+
+    def testLogOut(self):
+        sessionID: str = self.logIn()['sessionID']
+
+        response = self.client.post(
+            '/api/logout/', {'sessionID': sessionID},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.validate(sessionID).status_code, 401)
+
+class PermissionTests(APITestCase):
+    def getCourses(self, sessionID: Optional[str] = None):
+        if sessionID is not None:
+            self.client.cookies['sessionID'] = sessionID
+
+        return self.client.get('/api/teacher/course/all/')
+
+    def testNoSession(self):
+        response = self.getCourses()
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Session')
+
+    def testInvalidSession(self):
+        self.assertEqual(self.getCourses('invalid').status_code, 401)
+
+    def testStudent(self):
+        Student.objects.create(user=User.objects.create_user(
+            'student', password='password'
+        ))
+        response = self.client.post('/api/login/', {
+            'username': 'student', 'password': 'password'
+        }, content_type='application/json')
+
+        response = self.getCourses(response.json()['sessionID'])
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(
+            response.json()['detail'], 'This user is not a teacher.'
+        )
+
+    def testTeacher(self):
+        self.assertEqual(
+            self.getCourses(self.logIn()['sessionID']).status_code, 200
+        )
+
+class RoleCacheTests(APITestCase):
+    def testCachedRole(self):
+        self.assertEqual(getUserRole(self.user.pk), TEACHER)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(getUserRole(self.user.pk), TEACHER)
+
+    def testTeacherRemoved(self):
+        self.assertEqual(getUserRole(self.user.pk), TEACHER)
+
+        self.teacher.delete()
+        self.assertIsNone(getUserRole(self.user.pk))
+
+    def testStudentAdded(self):
+        user: User = User.objects.create_user('student')
+        # A user without a role is cached too.
+        self.assertIsNone(getUserRole(user.pk))
+        with self.assertNumQueries(0):
+            self.assertIsNone(getUserRole(user.pk))
+
+        Student.objects.create(user=user)
+        self.assertEqual(getUserRole(user.pk), STUDENT)
+
+    def testSessionOfRemovedTeacher(self):
+        sessionID: str = self.logIn()['sessionID']
+        self.client.cookies['sessionID'] = sessionID
+        self.assertEqual(
+            self.client.get('/api/teacher/course/all/').status_code, 200
+        )
+
+        # The role held by the resolved session is dropped too.
+        self.teacher.delete()
+        self.assertEqual(
+            self.client.get('/api/teacher/course/all/').status_code, 403
+        )
+
+
+class BenchmarkTests(APITestCase):
+    def testClearCachesRequired(self):
+        cache.set('key', 'value')
+
+        with self.assertRaisesMessage(CommandError, '--clear-caches'):
+            call_command('benchmarkasync', stdout=StringIO())
+        self.assertEqual(cache.get('key'), 'value')
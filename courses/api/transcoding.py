@@ -0,0 +1,201 @@
+import os
+import re
+import shutil
+import subprocess
+from typing import List, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.core.files.storage import Storage
+
+# Name of the HLS master playlist written next to the original video.
+MASTER_PLAYLIST = 'master.m3u8'
+
+# Number of seconds allowed for the short `ffmpeg` calls that inspect
+# `ffmpeg` or the video.
+PROBE_TIMEOUT = 60
+
+# An audio stream in the description of the input printed by `ffmpeg`,
+# e.g. 'Stream #0:1[0x2](und): Audio: aac (LC)'.
+AUDIO_STREAM_PATTERN = re.compile(r'^\s*Stream #\d+:\d+.*: Audio: ', re.M)
+
+
+class TranscodingError(Exception):
+    """Raised when a video could not be converted to HLS."""
+
+
+def _getFFmpeg() -> str:
+    """Returns the path of the `ffmpeg` binary.
+
+    :raises TranscodingError: If `ffmpeg` is not installed.
+    """
+    ffmpeg: Optional[str] = shutil.which(
+        getattr(settings, 'FFMPEG_BINARY', 'ffmpeg')
+    )
+
+    if ffmpeg is None:
+        raise TranscodingError('ffmpeg is not installed.')
+
+    return ffmpeg
+
+
+def _hasEncoder(ffmpeg: str, encoder: str) -> bool:
+    """Returns True if `ffmpeg` was built with the given encoder."""
+    result = subprocess.run(
+        [ffmpeg, '-hide_banner', '-encoders'],
+        capture_output=True, text=True, timeout=PROBE_TIMEOUT
+    )
+
+    return any(
+        line.split()[1:2] == [encoder] for line in result.stdout.splitlines()
+    )
+
+
+def _hasAudio(ffmpeg: str, source: str) -> bool:
+    """Returns True if the video has an audio stream."""
+    # Without an output, `ffmpeg` only describes the input, and fails.
+    result = subprocess.run(
+        [ffmpeg, '-hide_banner', '-i', source],
+        capture_output=True, text=True, timeout=PROBE_TIMEOUT
+    )
+
+    return AUDIO_STREAM_PATTERN.search(result.stderr) is not None
+
+
+def _transcodeCommand(ffmpeg: str, source: str,
+                      renditions: Sequence[Tuple[int, str, str]],
+                      segmentDuration: int, hasAudio: bool) -> List[str]:
+    """Builds the command that encodes the video at every rendition and
+    writes one variant playlist per rendition plus a master playlist.
+    The variants of a video without audio only have a video stream, as
+    `ffmpeg` fails on a stream map that names a missing stream.
+    """
+    command: List[str] = [ffmpeg, '-y', '-i', source, '-filter_complex']
+
+    # Split the video once and scale every copy to its height.
+    scales: List[str] = [
+        '[v{index}]scale=-2:{height}[v{index}out]'.format(
+            index=index, height=height
+        )
+        for index, (height, _, _) in enumerate(renditions)
+    ]
+    command.append('[0:v]split={}{};'.format(
+        len(renditions),
+        ''.join('[v{}]'.format(index) for index in range(len(renditions)))
+    ) + ';'.join(scales))
+
+    streamMap: List[str] = list()
+    for index, (_, videoBitrate, audioBitrate) in enumerate(renditions):
+        command += [
+            '-map', '[v{}out]'.format(index),
+            '-c:v:{}'.format(index), 'libx264',
+            '-b:v:{}'.format(index), videoBitrate,
+        ]
+        if hasAudio:
+            command += [
+                '-map', '0:a',
+                '-c:a:{}'.format(index), 'aac',
+                '-b:a:{}'.format(index), audioBitrate,
+            ]
+            streamMap.append('v:{0},a:{0}'.format(index))
+        else:
+            streamMap.append('v:{}'.format(index))
+
+    command += [
+        # Keyframes at segment boundaries so that every segment starts
+        # cleanly.
+        '-force_key_frames',
+        'expr:gte(t,n_forced*{})'.format(segmentDuration),
+        '-f', 'hls',
+        '-hls_time', str(segmentDuration),
+        '-hls_playlist_type', 'vod',
+        '-hls_segment_filename', 'v%v/segment%05d.ts',
+        '-master_pl_name', MASTER_PLAYLIST,
+        '-var_stream_map', ' '.join(streamMap),
+        'v%v/index.m3u8',
+    ]
+
+    return command
+
+
+def _segmentCommand(ffmpeg: str, source: str,
+                    segmentDuration: int) -> List[str]:
+    """Builds the command that splits the video into HLS segments
+    without encoding it again. Used when no H.264 encoder is available.
+    """
+    return [
+        ffmpeg, '-y', '-i', source,
+        '-c', 'copy',
+        '-f', 'hls',
+        '-hls_time', str(segmentDuration),
+        '-hls_playlist_type', 'vod',
+        '-hls_segment_filename', 'segment%05d.ts',
+        MASTER_PLAYLIST,
+    ]
+
+
+def convertToHLS(storage: Storage, videoName: str) -> str:
+    """Converts a stored video to HLS.
+
+    The video is encoded at every rendition of `VIDEO_HLS_RENDITIONS`.
+    If `ffmpeg` has no H.264 encoder, the video is only split into
+    segments. The playlists and segments are written to a directory
+    next to the original video. `ffmpeg` is stopped after
+    `VIDEO_HLS_TIMEOUT` seconds.
+
+    :param storage: The storage of the video. It must be a storage on
+        the local file system.
+    :type storage: Storage
+    :param videoName: The name of the video in the storage.
+    :type videoName: str
+
+    :raises TranscodingError: If the video could not be converted.
+
+    :returns: The storage name of the master playlist.
+    :rtype: str
+    """
+    ffmpeg: str = _getFFmpeg()
+    source: str = storage.path(videoName)
+    segmentDuration: int = getattr(settings, 'VIDEO_HLS_SEGMENT_DURATION', 6)
+
+    # e.g. 'course/videos/2020/07/17/lecture.mp4' is written to
+    # 'course/videos/2020/07/17/lecture_hls/'.
+    outputName: str = os.path.splitext(videoName)[0] + '_hls'
+    outputDirectory: str = storage.path(outputName)
+
+    # Start from a clean directory when a job is retried.
+    shutil.rmtree(outputDirectory, ignore_errors=True)
+
+    if _hasEncoder(ffmpeg, 'libx264'):
+        renditions: Sequence[Tuple[int, str, str]] = settings.\
+            VIDEO_HLS_RENDITIONS
+        for index in range(len(renditions)):
+            os.makedirs(
+                os.path.join(outputDirectory, 'v{}'.format(index)),
+                exist_ok=True
+            )
+        command: List[str] = _transcodeCommand(
+            ffmpeg, source, renditions, segmentDuration,
+            _hasAudio(ffmpeg, source)
+        )
+    else:
+        os.makedirs(outputDirectory, exist_ok=True)
+        command = _segmentCommand(ffmpeg, source, segmentDuration)
+
+    timeout: Optional[int] = getattr(settings, 'VIDEO_HLS_TIMEOUT', None)
+    try:
+        result = subprocess.run(
+            command, cwd=outputDirectory, capture_output=True, text=True,
+            timeout=timeout
+        )
+    except subprocess.TimeoutExpired:
+        shutil.rmtree(outputDirectory, ignore_errors=True)
+        raise TranscodingError(
+            'ffmpeg did not finish within {} seconds.'.format(timeout)
+        )
+
+    if result.returncode != 0:
+        shutil.rmtree(outputDirectory, ignore_errors=True)
+        # The end of the log holds the actual error.
+        raise TranscodingError(result.stderr[-2000:])
+
+    return outputName + '/' + MASTER_PLAYLIST
@@ -1,6 +1,7 @@
+from django.conf import settings
 from django.urls import path
 
-from .views import course, login, teacher
+from .views import course, discussion, login, stats, teacher, upload
 
 app_name = 'api'
 
@@ -10,22 +11,69 @@ urlpatterns = [
     path('logout/', login.LogoutView.as_view(), name='logout'),
     path('signup/', login.SignupView.as_view(), name='signup'),
     path(
-        'validate/', login.ValidateSessionView.as_view(),
+        'validate/', (
+            login.AsyncValidateSessionView
+            if 'api:validate' in settings.ASYNC_VIEWS
+            else login.ValidateSessionView
+        ).as_view(),
         name='validate'
     ),
 
     # Teacher URLs.
     # All courses.
     path(
-        'teacher/course/all/', teacher.AllCourses.as_view(),
+        'teacher/course/all/', (
+            teacher.AsyncAllCourses
+            if 'api:courseAll' in settings.ASYNC_VIEWS
+            else teacher.AllCourses
+        ).as_view(),
         name='courseAll'
     ),
+    # Resumable upload of course videos.
+    path(
+        'teacher/video/upload/', upload.VideoUploadView.as_view(),
+        name='videoUpload'
+    ),
+    path(
+        'teacher/video/upload/<uuid:uploadID>/',
+        upload.VideoUploadDetailView.as_view(), name='videoUploadDetail'
+    ),
+    path(
+        'teacher/video/upload/<uuid:uploadID>/finalize/',
+        upload.VideoUploadFinalizeView.as_view(),
+        name='videoUploadFinalize'
+    ),
     # Update view for course.
     # path('teacher/course/update/<int:courseID>/'),
 
+    # Database connection and pool counters, for the admins.
+    path(
+        'stats/database/', stats.DatabaseStatsView.as_view(),
+        name='databaseStats'
+    ),
+    # Per-route request duration histograms, for the admins.
+    path(
+        'stats/requests/', stats.RequestStatsView.as_view(),
+        name='requestStats'
+    ),
+
     # Course URLs.
     # Detail view of course.
-    path('course/detail/<int:courseID>/', course.CourseDetailView.as_view(),
-         name='courseDetail'
+    path(
+        'course/detail/<int:courseID>/', (
+            course.AsyncCourseDetailView
+            if 'api:courseDetail' in settings.ASYNC_VIEWS
+            else course.CourseDetailView
+        ).as_view(),
+        name='courseDetail'
+    ),
+    # Comments of a course and the remaining replies to a comment.
+    path(
+        'course/<int:courseID>/comments/',
+        discussion.CourseCommentsView.as_view(), name='courseComments'
+    ),
+    path(
+        'course/comment/<int:commentID>/replies/',
+        discussion.CourseRepliesView.as_view(), name='courseReplies'
     ),
 ]
@@ -1,77 +1,120 @@
-from datetime import timedelta
+from datetime import datetime, timedelta
 from typing import Optional
+from urllib.parse import urljoin
 
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.contrib.sessions.backends.db import SessionStore
-from django.contrib.sessions.models import Session
-from django.core.exceptions import ObjectDoesNotExist, MultipleObjectsReturned
+from django.contrib.sessions.backends.base import SessionBase
 from django.utils import timezone
 
-from .models import UserSessionMapping
+from .sessions import (USER_ID_KEY, SessionIndex, forgetResolvedSession,
+                       getSessionIndex, getSessionStore)
 
 
-def createSessionForUser(user: User) -> Optional[Session]:
+def getMediaPath(url: str) -> str:
+    """Returns the URL of a media file as an absolute path, to be
+    shortened.
+
+    `Storage.url` already returns an absolute path when `MEDIA_URL` is
+    relative, and prefixing another '/' would turn it into a
+    protocol-relative URL ('//media/...') that browsers resolve against
+    a host called 'media'. A full URL is returned as it is.
+
+    :param url: The URL returned by the storage.
+    :type url: str
+
+    :rtype: str
+    """
+    return urljoin('/', url)
+
+
+def createSessionForUser(user: User) -> Optional[SessionBase]:
     """Will return a session for the given
-    `django.contrib.auth.models.User` object. It will look up in the
-    `api.models.UserSessionMapping` table to find out if a session
-    already exists for the user. If an existing session is found, it
-    returns it; otherwise, it will create a new session and return it.
+    `django.contrib.auth.models.User` object. It will look up the
+    session index to find out if a session already exists for the user.
+    If an existing session is found, it returns it; otherwise, it will
+    create a new session and return it.
+
+    The session is stored by the configured `SESSION_ENGINE`.
 
     :param user: A `User` object.
     :type user: User
 
     :returns: A valid session if session was created. Otherwise none.
-    :rtype: Session or None
+    :rtype: SessionBase or None
+    """
+    sessionIndex: SessionIndex = getSessionIndex()
+
+    # Search the session index for this user.
+    sessionKey: Optional[str] = sessionIndex.getSessionKey(user.pk)
+
+    if sessionKey is not None:
+        # A session was found for this user. Make sure that it still
+        # exists and belongs to this user before returning it. Missing
+        # and expired sessions load as empty sessions.
+        existingSession: SessionBase = getSessionStore(sessionKey)
+
+        if existingSession.get(USER_ID_KEY) == user.pk:
+            return existingSession
+
+    # The user does not have an active session. So create one. The
+    # expiry date is stored in the session so that every engine can
+    # read it back.
+    newSession: SessionBase = getSessionStore()
+    newSession[USER_ID_KEY] = user.pk
+    newSession.set_expiry(
+        timezone.now() + timedelta(seconds=settings.SESSION_COOKIE_AGE)
+    )
+    newSession.save()
+
+    # Assign this session to the user.
+    sessionIndex.add(user.pk, newSession)
+
+    return newSession
+
+
+def _sessionNeedsExtension(expireDate: datetime) -> bool:
+    """Returns True if there are less than 30 days for a session with
+    the given expiry date to expire.
     """
-    # The return value.
-    session: Optional[Session] = None
-
-    # Search the `UserSessionMapping` table for this user.
-    try:
-        sessionMap: UserSessionMapping = UserSessionMapping.objects.get(
-            user=user
-        )
-    except ObjectDoesNotExist:
-        # The user does not have an active session. So create one.
-        newSessionStore: SessionStore = SessionStore()
-        newSessionStore.create()
-
-        # Now retrieve a `Session` object. This allows us to access
-        # session data and session expiry date.
-        session = Session.objects.get(pk=newSessionStore.session_key)
-
-        # Create a `UserSessionMapping` object for this user and
-        # session.
-        UserSessionMapping(user=user, session=session).save()
-    except MultipleObjectsReturned:
-        # TODO: Manage when multiple sessions were found.
-        pass
-    else:
-        # A `UserSessionMapping` object was found for this user. So we
-        # return that session for the user.
-        session = Session.objects.get(pk=sessionMap.session)
-
-    return session
-
-
-def _updateSessionExpiryDate(session: Session):
+    # Calculate the difference between the current time and the
+    # expiry date of the session key.
+    difference: timedelta = expireDate - timezone.now()
+
+    return abs(difference.days) < 30
+
+
+def _updateSessionExpiryDate(session: SessionBase, userID: int) -> bool:
     """Used to update the given session's expiry date.
 
     If there are less than 30 days for the session to expire, this
-    function will add another 30 days to the session's expiry date.
+    function will add another 30 days to the session's expiry date. The
+    session is only saved when its expiry date was changed.
 
     :param session: The session whose expiry date is to be checked.
-    :type session: Session.
-    """
+    :type session: SessionBase
 
-    # Calculate the difference between the current time and the
-    # expiry date of the session key.
-    difference: timedelta = session.expire_date - timezone.now()
+    :param userID: The ID of the user of the session. Sessions created
+        before the user was stored in the session data only know their
+        user through the session index.
+    :type userID: int
 
+    :returns: True if the expiry date was extended.
+    :rtype: bool
+    """
     # Add another 30 days if the number of days before the
     # expiry of the session is less than 30.
-    if abs(difference.days) < 30:
-        session.expire_date += timedelta(days=30)
+    if not _sessionNeedsExtension(session.get_expiry_date()):
+        return False
 
-    # Save this information.
+    session.set_expiry(session.get_expiry_date() + timedelta(days=30))
+
+    # The cached copy of this session has the old expiry date.
+    forgetResolvedSession(session.session_key)
+
+    # Save this information. The session index is refreshed as well,
+    # in case the engine changed the session key when saving.
     session.save()
+    getSessionIndex().refresh(userID, session)
+
+    return True
@@ -0,0 +1,50 @@
+from typing import Any
+
+from django.http import Http404, HttpRequest, HttpResponse
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import APIException
+from rest_framework.status import (HTTP_200_OK, HTTP_401_UNAUTHORIZED,
+                                   HTTP_404_NOT_FOUND)
+
+from courses.metrics import TimedJSONRenderer
+
+
+class AsyncAPIView(View):
+    """Base class of the asynchronous versions of the API views.
+
+    DRF views are synchronous, so these are plain Django views. Their
+    responses are rendered with DRF's JSON renderer and the API errors
+    they raise are turned into the same responses, so that clients
+    cannot tell the two versions apart. The asynchronous version of a
+    route is chosen with the `ASYNC_VIEWS` setting.
+    """
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # Like the DRF views, the API does not use CSRF tokens.
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request: HttpRequest, *args,
+                       **kwargs) -> HttpResponse:
+        try:
+            return await super().dispatch(request, *args, **kwargs)
+        except Http404 as error:
+            return self.render({'detail': str(error)}, HTTP_404_NOT_FOUND)
+        except APIException as error:
+            response: HttpResponse = self.render(
+                {'detail': error.detail}, error.status_code
+            )
+            if error.status_code == HTTP_401_UNAUTHORIZED:
+                # Same header as `SessionIDAuthentication`.
+                response['WWW-Authenticate'] = 'Session'
+
+            return response
+
+    @staticmethod
+    def render(data: Any, status: int = HTTP_200_OK) -> HttpResponse:
+        """Renders data to JSON the same way as DRF's `Response`."""
+        return HttpResponse(
+            TimedJSONRenderer().render(data), status=status,
+            content_type='application/json'
+        )
@@ -1,66 +1,216 @@
-from typing import Dict, List, Union
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Union
 
 from django.core.exceptions import ObjectDoesNotExist
+from django.core.files.storage import Storage
+from django.db.models import Prefetch
 from django.db.models.query import QuerySet
+from django.http import HttpRequest, HttpResponse
 from rest_framework.request import Request
 from rest_framework.response import Response
-from rest_framework.status import HTTP_200_OK, HTTP_404_NOT_FOUND
+from rest_framework.status import (HTTP_200_OK, HTTP_400_BAD_REQUEST,
+                                   HTTP_404_NOT_FOUND)
 from rest_framework.views import APIView
 
-from api.models import Course, CourseVideo, CourseTaughtByTeacher
-from shortener.views import shortenURL
+from api.images import getSrcset
+from api.models import (Course, CourseVideo, CourseTaughtByTeacher,
+                        VideoProcessingJob)
+from api.pagination import apaginateKeyset, getPageSize, paginateKeyset
+from api.responsecache import COURSE, ResponseCache
+from api.utils import getMediaPath
+from api.views.base import AsyncAPIView
+from shortener.views import ashortenURLs, shortenURLs
 
 
 class CourseDetailView(APIView):
+    """Detail view of a course.
+
+    The videos of the course are paginated on `(dateAdded, id)`. The
+    size of a page is read from the `pageSize` query parameter and the
+    next page is requested by passing the `nextCursor` of the response
+    as the `cursor` query parameter.
+    """
+
     def get(self, request: Request, courseID: int) -> Response:
-        # Get a `Course` object for this course ID.
+        # Cached responses and conditional requests are served without
+        # touching the database.
+        responseCache: ResponseCache = ResponseCache(
+            request, COURSE, courseID
+        )
+        cached: Optional[HttpResponse] = responseCache.lookup()
+        if cached is not None:
+            return cached
+
         try:
-            course: Course = Course.objects.get(id=courseID)
+            course: Course = _getCourseQueryset().get(id=courseID)
         except ObjectDoesNotExist:
             return Response(
                 {'body': 'No course was found with ID {}.'.format(courseID)},
                 HTTP_404_NOT_FOUND
             )
 
-        # Obtaining the teacher(s) of this course.
-        courseTaughtBy: QuerySet = CourseTaughtByTeacher.objects.\
-            filter(course=course)
+        # Getting a page of the course videos.
+        courseVideos: List[Dict[str, Any]]
+        nextCursor: Optional[str]
+        try:
+            courseVideos, nextCursor = paginateKeyset(
+                _getVideoQueryset(course), ('dateAdded', 'id'),
+                request.query_params.get('cursor'), getPageSize(request)
+            )
+        except ValueError:
+            return Response(
+                {'body': 'Invalid cursor.'}, HTTP_400_BAD_REQUEST
+            )
+
+        # Shorten the URLs of the course image and of all the videos in
+        # a single batch.
+        shortHashes: Dict[str, str] = shortenURLs(
+            _getURLs(course, courseVideos)
+        )
+
+        # Constructing and sending the response.
+        return responseCache.store(Response(
+            _buildResponseData(
+                request, course, courseVideos, nextCursor, shortHashes
+            ),
+            HTTP_200_OK
+        ))
+
+
+class AsyncCourseDetailView(AsyncAPIView):
+    """Asynchronous version of `CourseDetailView`."""
 
-        teachers: List[str] = list()
-        for teacher in courseTaughtBy:
-            teachers.append(
-                teacher.teacher.user.first_name + " "
-                + teacher.teacher.user.last_name
+    async def get(self, request: HttpRequest, courseID: int) -> HttpResponse:
+        responseCache: ResponseCache = ResponseCache(
+            request, COURSE, courseID
+        )
+        cached: Optional[HttpResponse] = await responseCache.alookup()
+        if cached is not None:
+            return cached
+
+        try:
+            course: Course = await _getCourseQueryset().aget(id=courseID)
+        except ObjectDoesNotExist:
+            return self.render(
+                {'body': 'No course was found with ID {}.'.format(courseID)},
+                HTTP_404_NOT_FOUND
             )
 
-        # Constructing the response dictionary.
-        CourseVideoType = Dict[str, Union[str, int]]
-        Mapping = Union[List[CourseVideoType], List[str], int, str]
-        responseData: Dict[str, Mapping] = {
-            'id': course.id,
-            'name': course.name,
-            'description': course.description,
-            'image': ('http://' + request.get_host() + '/short/'
-                      + shortenURL('/' + course.image.url) + '/'),
-            'teachers': teachers,
-            'videos': list(),
-        }
+        courseVideos: List[Dict[str, Any]]
+        nextCursor: Optional[str]
+        try:
+            courseVideos, nextCursor = await apaginateKeyset(
+                _getVideoQueryset(course), ('dateAdded', 'id'),
+                request.GET.get('cursor'), getPageSize(request)
+            )
+        except ValueError:
+            return self.render(
+                {'body': 'Invalid cursor.'}, HTTP_400_BAD_REQUEST
+            )
 
-        # Getting the list of course videos.
-        courseVideos: QuerySet = CourseVideo.objects.filter(course=course)
+        shortHashes: Dict[str, str] = await ashortenURLs(
+            _getURLs(course, courseVideos)
+        )
 
-        # Adding information for each course video to the response.
-        for video in courseVideos:
-            current: CourseVideoType = {
-                'id': video.id,
-                'title': video.title,
-                'description': video.description,
-                'dateUploaded': video.dateAdded.isoformat(),
-                'url': ('http://' + request.get_host() + '/short/'
-                        + shortenURL('/' + video.video.url) + '/')
-            }
+        return await responseCache.astore(self.render(_buildResponseData(
+            request, course, courseVideos, nextCursor, shortHashes
+        )))
 
-            responseData['videos'].append(current)
 
-        # Constructing and sending the response.
-        return Response(responseData, HTTP_200_OK)
+def _getCourseQueryset() -> QuerySet:
+    """Returns the query of a course along with the teacher(s) of the
+    course. The names of the teachers are fetched with a single join.
+    """
+    return Course.objects.prefetch_related(
+        Prefetch(
+            'coursetaughtbyteacher_set',
+            queryset=CourseTaughtByTeacher.objects
+            .filter(teacher__isnull=False)
+            .select_related('teacher__user')
+            .only(
+                'course', 'teacher__user__first_name',
+                'teacher__user__last_name'
+            ),
+            to_attr='taughtBy'
+        )
+    )
+
+
+def _getVideoQueryset(course: Course) -> QuerySet:
+    """Returns the query of the videos of a course. Only the columns that
+    are sent to the client are loaded.
+    """
+    return CourseVideo.objects.filter(course=course).values(
+        'id', 'title', 'description', 'dateAdded', 'video',
+        'processingJob__status', 'processingJob__manifest'
+    )
+
+
+def _getURLs(course: Course, courseVideos: List[Dict[str, Any]]) -> List[str]:
+    """Sets the URL of every video and returns the URLs of the course
+    image and of the videos, to be shortened.
+    """
+    # `values()` returns the name of the video file, so the storage is
+    # used to build its URL. Videos that have been converted to HLS are
+    # served through their playlist.
+    videoStorage: Storage = CourseVideo._meta.get_field('video').storage
+    for video in courseVideos:
+        if video['processingJob__status'] == VideoProcessingJob.READY:
+            video['url'] = getMediaPath(
+                videoStorage.url(video['processingJob__manifest'])
+            )
+        else:
+            video['url'] = getMediaPath(videoStorage.url(video['video']))
+
+    return [getMediaPath(course.image.url)] + [
+        video['url'] for video in courseVideos
+    ]
+
+
+def _buildResponseData(request: HttpRequest, course: Course,
+                       courseVideos: List[Dict[str, Any]],
+                       nextCursor: Optional[str],
+                       shortHashes: Dict[str, str]) -> Dict[str, Any]:
+    teachers: List[str] = [
+        taughtBy.teacher.user.first_name + " "
+        + taughtBy.teacher.user.last_name
+        for taughtBy in course.taughtBy
+    ]
+
+    # Constructing the response dictionary.
+    CourseVideoType = Dict[str, Union[str, int]]
+    Mapping = Union[List[CourseVideoType], List[str], Dict, datetime,
+                    int, str, None]
+    responseData: Dict[str, Mapping] = {
+        'id': course.id,
+        'name': course.name,
+        'description': course.description,
+        'image': ('http://' + request.get_host() + '/short/'
+                  + shortHashes[getMediaPath(course.image.url)] + '/'),
+        # Resized versions of the image, by format and width.
+        'imageSrcset': getSrcset(request, course.image.name),
+        'teachers': teachers,
+        # The rating aggregates are stored on the course row.
+        'rating': course.getRatingSummary(),
+        'commentCount': course.commentCount,
+        'replyCount': course.replyCount,
+        'lastActivity': course.lastActivity,
+        'videos': list(),
+        # Cursor of the next page of videos, None on the last page.
+        'nextCursor': nextCursor,
+    }
+
+    # Adding information for each course video to the response.
+    for video in courseVideos:
+        current: CourseVideoType = {
+            'id': video['id'],
+            'title': video['title'],
+            'description': video['description'],
+            'dateUploaded': video['dateAdded'].isoformat(),
+            'url': ('http://' + request.get_host() + '/short/'
+                    + shortHashes[video['url']] + '/')
+        }
+
+        responseData['videos'].append(current)
+
+    return responseData
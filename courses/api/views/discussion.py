@@ -0,0 +1,149 @@
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.models import Prefetch
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.status import (HTTP_200_OK, HTTP_400_BAD_REQUEST,
+                                   HTTP_404_NOT_FOUND)
+from rest_framework.views import APIView
+
+from api.models import Course, CourseComment, CourseReply
+from api.pagination import encodeCursor, getPageSize, paginateKeyset
+
+# The columns of the author loaded with each comment and reply.
+USER_FIELDS = ('user__username', 'user__first_name', 'user__last_name')
+
+
+def _serialiseUser(user: Optional[User]) -> Optional[Dict[str, str]]:
+    """Returns the public details of the author of a comment or reply,
+    or None if their account was deleted.
+    """
+    if user is None:
+        return None
+
+    return {
+        'username': user.username,
+        'firstName': user.first_name,
+        'lastName': user.last_name,
+    }
+
+
+def _serialiseReply(reply: CourseReply) -> Dict[str, Any]:
+    return {
+        'id': reply.id,
+        'user': _serialiseUser(reply.user),
+        'reply': reply.reply,
+    }
+
+
+class CourseCommentsView(APIView):
+    """Lists the comments of a course along with their first replies.
+
+    The comments are paginated on their ID with the `cursor` and
+    `pageSize` query parameters. At most `API_REPLIES_PER_COMMENT`
+    replies are returned for each comment; when a comment has more, its
+    `repliesCursor` is passed as the `cursor` of `CourseRepliesView` to
+    load the rest.
+
+    A page is fetched in two queries whatever its size, one for the
+    comments and one for the replies of all of them.
+    """
+
+    def get(self, request: Request, courseID: int) -> Response:
+        replyCap: int = settings.API_REPLIES_PER_COMMENT
+
+        # The replies of every comment in the page are fetched in a
+        # single query, limited to one more than the cap per comment to
+        # find out if there are more.
+        replies: Prefetch = Prefetch(
+            'coursereply_set',
+            queryset=CourseReply.objects.select_related('user')
+            .only('comment', 'reply', *USER_FIELDS)
+            .order_by('id')[:replyCap + 1],
+            to_attr='firstReplies'
+        )
+
+        comments: List[CourseComment]
+        nextCursor: Optional[str]
+        try:
+            comments, nextCursor = paginateKeyset(
+                CourseComment.objects.filter(course_id=courseID)
+                .select_related('user').only('comment', *USER_FIELDS)
+                .prefetch_related(replies),
+                ('id',),
+                request.query_params.get('cursor'),
+                getPageSize(request)
+            )
+        except ValueError:
+            return Response(
+                {'body': 'Invalid cursor.'}, HTTP_400_BAD_REQUEST
+            )
+
+        # An empty first page is the only case where the course may not
+        # exist.
+        if not comments and 'cursor' not in request.query_params and \
+                not Course.objects.filter(id=courseID).exists():
+            return Response(
+                {'body': 'No course was found with ID {}.'.format(courseID)},
+                HTTP_404_NOT_FOUND
+            )
+
+        responseData: List[Dict[str, Any]] = []
+        for comment in comments:
+            firstReplies: List[CourseReply] = comment.firstReplies[:replyCap]
+
+            repliesCursor: Optional[str] = None
+            if len(comment.firstReplies) > replyCap:
+                repliesCursor = encodeCursor([firstReplies[-1].id])
+
+            responseData.append({
+                'id': comment.id,
+                'user': _serialiseUser(comment.user),
+                'comment': comment.comment,
+                'replies': [_serialiseReply(reply) for reply in firstReplies],
+                # Cursor of the remaining replies, None if all of them
+                # are included.
+                'repliesCursor': repliesCursor,
+            })
+
+        return Response(
+            {'comments': responseData, 'nextCursor': nextCursor}, HTTP_200_OK
+        )
+
+
+class CourseRepliesView(APIView):
+    """Lists the replies to a comment, paginated on their ID with the
+    `cursor` and `pageSize` query parameters.
+    """
+
+    def get(self, request: Request, commentID: int) -> Response:
+        replies: List[CourseReply]
+        nextCursor: Optional[str]
+        try:
+            replies, nextCursor = paginateKeyset(
+                CourseReply.objects.filter(comment_id=commentID)
+                .select_related('user').only('reply', *USER_FIELDS),
+                ('id',),
+                request.query_params.get('cursor'),
+                getPageSize(request)
+            )
+        except ValueError:
+            return Response(
+                {'body': 'Invalid cursor.'}, HTTP_400_BAD_REQUEST
+            )
+
+        if not replies and 'cursor' not in request.query_params and \
+                not CourseComment.objects.filter(id=commentID).exists():
+            return Response(
+                {'body': 'No comment was found with ID {}.'.format(
+                    commentID
+                )},
+                HTTP_404_NOT_FOUND
+            )
+
+        return Response({
+            'replies': [_serialiseReply(reply) for reply in replies],
+            'nextCursor': nextCursor,
+        }, HTTP_200_OK)
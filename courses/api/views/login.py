@@ -1,21 +1,30 @@
-from typing import Dict, Union
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple, Union
 
+from asgiref.sync import sync_to_async
 from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
-from django.contrib.sessions.models import Session
-from django.core.exceptions import ObjectDoesNotExist
+from django.contrib.sessions.backends.base import SessionBase
 from django.db.utils import IntegrityError
+from django.http import HttpRequest, HttpResponse
 from django.utils import timezone
 from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.status import (HTTP_200_OK, HTTP_400_BAD_REQUEST,
-                                   HTTP_401_UNAUTHORIZED, HTTP_404_NOT_FOUND,
+                                   HTTP_401_UNAUTHORIZED,
                                    HTTP_500_INTERNAL_SERVER_ERROR)
 from rest_framework.views import APIView
 
-from api.models import Student, Teacher, UserSessionMapping
-from api.serialisers import SessionSerialiser
-from api.utils import _updateSessionExpiryDate, createSessionForUser
+from api.authentication import (AuthenticationResult,
+                                SessionIDAuthentication, aauthenticate)
+from api.models import Student, Teacher
+from api.roles import TEACHER, getUserRole
+from api.serialisers import SessionValuesSerialiser
+from api.sessions import (ResolvedSession, forgetResolvedSession,
+                          getSessionIndex, getSessionStore)
+from api.utils import (_sessionNeedsExtension, _updateSessionExpiryDate,
+                       createSessionForUser)
+from api.views.base import AsyncAPIView
 
 
 class LoginView(APIView):
@@ -30,24 +39,25 @@ class LoginView(APIView):
 
         # Check if the user is authenticated or not.
         if user is not None:
-            # Find out if the user is a teacher or not.
-            try:
-                teacherUser = Teacher.objects.get(user=user)
-            except ObjectDoesNotExist:
-                teacherUser = None
+            # Find out if the user is a teacher or not. The role is
+            # cached per user.
+            isTeacher: bool = getUserRole(user.pk) == TEACHER
 
             # User is authenticated, obtain a session for them. If an
             # already existing session exists for this user, return it.
             # Otherwise, create a new one.
-            newSession: Session = createSessionForUser(user)
+            newSession: SessionBase = createSessionForUser(user)
 
             # Update session expiry date if needed.
-            _updateSessionExpiryDate(newSession)
+            _updateSessionExpiryDate(newSession, user.pk)
 
-            # Serialiser instance to serialise the session data
-            sessionSerialiser: SessionSerialiser = SessionSerialiser(
-                newSession
-            )
+            # The user's information is about to change, so drop any
+            # cached validation of this session.
+            forgetResolvedSession(newSession.session_key)
+
+            # Serialise the session data.
+            serialisedSession: Dict[str, Optional[str]] = \
+                SessionValuesSerialiser.serialise(newSession)
 
             responseData: Dict[str, Union[bool, str]] = {
                 # User information.
@@ -62,16 +72,18 @@ class LoginView(APIView):
                 'sessionID': newSession.session_key,
                 # The serialiser returns an RFC 3339 compliant date
                 # which is a string and so it can be sent to the client.
-                'sessionExpireDate': sessionSerialiser.data['expire_date'],
+                'sessionExpireDate': serialisedSession['expire_date'],
                 # Flag set only if the user is a teacher.
-                'isTeacher': True if teacherUser else False
+                'isTeacher': isTeacher
             }
 
             # Change the last login time to the current time.
             user.last_login = timezone.now()
 
-            # Save the updated information in the database.
-            user.save()
+            # Save the updated information in the database. Only the
+            # login time is written, so the cached course details of a
+            # teacher are kept.
+            user.save(update_fields=['last_login'])
 
             # User is authorised, prepare OK response.
             # Creating a response.
@@ -79,7 +91,7 @@ class LoginView(APIView):
             # Place the session ID in a cookie.
             response.set_cookie(
                 'sessionID', newSession.session_key,
-                expires=newSession.expire_date
+                expires=newSession.get_expiry_date()
             )
 
             return response
@@ -92,17 +104,15 @@ class LoginView(APIView):
 
 
 class LogoutView(APIView):
+    authentication_classes = [SessionIDAuthentication, ]
+
     def post(self, request: Request) -> Response:
-        # Obtain the session ID from cookies.
-        # If the session ID is not found in the cookies search for it
-        # in the request body. If not found return BAD_REQUEST.
-        if request.COOKIES.get('sessionID') is not None:
-            print('Found session ID in cookies')
-            sessionID = request.COOKIES.get('sessionID')
-        elif request.data.get('sessionID') is not None:
-            print('Found session ID in request body')
-            sessionID = request.data['sessionID']
-        else:
+        # The session ID is obtained from the cookies or from the
+        # request body by the authentication class. If it was not
+        # found, return BAD_REQUEST.
+        resolved: Optional[ResolvedSession] = request.auth
+
+        if resolved is None:
             responseData: Dict[str, str] = {
                 'body': 'Could not obtain the session ID. Make sure that'
                         + 'the session ID is either in the body or set as a '
@@ -110,20 +120,18 @@ class LogoutView(APIView):
             }
             return Response(responseData, status=HTTP_400_BAD_REQUEST)
 
-        # Get the existing session object.
-        try:
-            existingSession: Session = Session.objects.get(pk=sessionID)
-        except ObjectDoesNotExist:
-            responseData: Dict[str, str] = {
-                'body': 'Could not find the requested session.'
-            }
-            return Response(responseData, status=HTTP_404_NOT_FOUND)
+        sessionID: str = resolved.sessionKey
 
-        # Delete this session.
+        # Delete this session and remove it from the session index.
+        existingSession: SessionBase = getSessionStore(sessionID)
         existingSession.delete()
+        getSessionIndex().remove(resolved.user.pk)
+
+        # Make sure that the session is not served from the cache.
+        forgetResolvedSession(sessionID)
 
         # Check if the delete operation was successful.
-        if existingSession.session_key is None:
+        if not existingSession.exists(sessionID):
             responseData: Dict[str, str] = {
                 'body': 'Successfully deleted session.'
             }
@@ -202,14 +210,13 @@ class SignupView(APIView):
                 Student.objects.create(user=newUser)
 
         # Create a new session for this user.
-        newSession: Session = createSessionForUser(newUser)
+        newSession: SessionBase = createSessionForUser(newUser)
 
         if newSession is not None:
             # Serialise the current session to get the session expiry
             # date in RFC 3339 format.
-            serialisedSession: SessionSerialiser = SessionSerialiser(
-                newSession
-            )
+            serialisedSession: Dict[str, Optional[str]] = \
+                SessionValuesSerialiser.serialise(newSession)
 
             # Construct the same type of response data as constructed in
             # the login view.
@@ -218,8 +225,8 @@ class SignupView(APIView):
                 'lastName': newUser.last_name,
                 'email': newUser.email,
                 'lastLogin': newUser.last_login,
-                'sessionID': serialisedSession.data['session_key'],
-                'sessionExpireDate': serialisedSession.data['expire_date'],
+                'sessionID': serialisedSession['session_key'],
+                'sessionExpireDate': serialisedSession['expire_date'],
                 'isTeacher': requestData['isTeacher'],
             }
 
@@ -227,7 +234,7 @@ class SignupView(APIView):
             # Setting the session ID as cookie.
             response.set_cookie(
                 'sessionID', newSession.session_key,
-                expires=newSession.expire_date
+                expires=newSession.get_expiry_date()
             )
 
             return response
@@ -245,42 +252,89 @@ class SignupView(APIView):
 class ValidateSessionView(APIView):
     """A view to make sure that a client's session ID is a valid one."""
 
+    authentication_classes = [SessionIDAuthentication, ]
+
     def post(self, request: Request) -> Response:
-        receivedSessionID = request.data['sessionID']
-        receivedSessionExpiryDate = request.data['sessionExpireDate']
+        # The authentication class has already found the user of the
+        # received session, either in the cache or with a single query.
+        resolved: Optional[ResolvedSession] = request.auth
 
-        # Check if the received session ID exists in the mapping table.
-        try:
-            sessionMapping: UserSessionMapping = UserSessionMapping.objects\
-                .get(
-                    session__pk=receivedSessionID
-                )
-        except ObjectDoesNotExist:
-            # No object was found that matched the received session ID
-            # and so the session is not valid.
+        if resolved is None:
+            # No session ID was received and so the session is not
+            # valid.
             return Response(status=HTTP_401_UNAUTHORIZED)
-        else:
-            # Obtain session information from database.
-            session: Session = Session.objects.get(pk=receivedSessionID)
 
-            # Update the session's expiry date if needed.
-            _updateSessionExpiryDate(session)
+        sessionKey: str = resolved.sessionKey
+        sessionExpireDate: datetime = resolved.expireDate
 
-            # Construct the response to the client.
-            responseData: Dict[str, str] = {
-                'firstName': sessionMapping.user.first_name,
-                'lastName': sessionMapping.user.last_name,
-                'email': sessionMapping.user.email,
-                'lastLogin': sessionMapping.user.last_login,
-                'sessionID': session.session_key,
-                'sessionExpireDate': session.expire_date,
-            }
-
-            # The session is authorised. Set the session ID as the cookie.
-            response = Response(responseData, status=HTTP_200_OK)
-            response.set_cookie(
-                'sessionID', receivedSessionID,
-                expires=session.expire_date
+        # Update the session's expiry date if needed. The session is only
+        # loaded and written when the expiry date changes.
+        if _sessionNeedsExtension(sessionExpireDate):
+            sessionKey, sessionExpireDate = _extendSession(
+                sessionKey, resolved.user.pk
             )
 
-            return response
+        # The session is authorised. Set the session ID as the cookie.
+        response = Response(
+            _buildValidationData(resolved, sessionKey, sessionExpireDate),
+            status=HTTP_200_OK
+        )
+        response.set_cookie(
+            'sessionID', sessionKey, expires=sessionExpireDate
+        )
+
+        return response
+
+
+class AsyncValidateSessionView(AsyncAPIView):
+    """Asynchronous version of `ValidateSessionView`."""
+
+    async def post(self, request: HttpRequest) -> HttpResponse:
+        authentication: AuthenticationResult = await aauthenticate(request)
+
+        if authentication is None:
+            return HttpResponse(status=HTTP_401_UNAUTHORIZED)
+
+        resolved: ResolvedSession = authentication[1]
+        sessionKey: str = resolved.sessionKey
+        sessionExpireDate: datetime = resolved.expireDate
+
+        # Sessions are extended at most once a month, so the session
+        # store is only written through a thread then.
+        if _sessionNeedsExtension(sessionExpireDate):
+            sessionKey, sessionExpireDate = await sync_to_async(
+                _extendSession
+            )(sessionKey, resolved.user.pk)
+
+        response: HttpResponse = self.render(
+            _buildValidationData(resolved, sessionKey, sessionExpireDate)
+        )
+        response.set_cookie(
+            'sessionID', sessionKey, expires=sessionExpireDate
+        )
+
+        return response
+
+
+def _extendSession(sessionKey: str, userID: int) -> Tuple[str, datetime]:
+    """Extends the expiry date of a session of a user.
+
+    :returns: The key of the session, which may have changed, and its
+        new expiry date.
+    """
+    session: SessionBase = getSessionStore(sessionKey)
+    _updateSessionExpiryDate(session, userID)
+
+    return session.session_key, session.get_expiry_date()
+
+
+def _buildValidationData(resolved: ResolvedSession, sessionKey: str,
+                         sessionExpireDate: datetime) -> Dict[str, Any]:
+    return {
+        'firstName': resolved.user.first_name,
+        'lastName': resolved.user.last_name,
+        'email': resolved.user.email,
+        'lastLogin': resolved.user.last_login,
+        'sessionID': sessionKey,
+        'sessionExpireDate': sessionExpireDate,
+    }
@@ -0,0 +1,240 @@
+import mimetypes
+import os
+import re
+from typing import Iterator, Optional, Tuple
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import Storage
+from django.http import (FileResponse, Http404, HttpRequest, HttpResponse,
+                         HttpResponseBase, StreamingHttpResponse)
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from django.views import View
+from PIL.Image import DecompressionBombError
+from rest_framework.status import (HTTP_206_PARTIAL_CONTENT,
+                                   HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+
+from api.images import (getDerivative, getFormats, getWidths,
+                        hasDerivatives)
+from api.models import Course, CourseVideo
+
+# Number of bytes read from the disk at a time for partial content.
+BLOCK_SIZE = 64 * 1024
+
+# A single byte range, e.g. 'bytes=0-499', 'bytes=500-' or 'bytes=-500'.
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _parseRange(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Parses a `Range` header with a single byte range.
+
+    :param header: The value of the `Range` header.
+    :param size: The size of the file in bytes.
+
+    :raises ValueError: If the range cannot be satisfied.
+
+    :returns: The first and the last byte of the range, or None if the
+        header is not a single byte range and should be ignored.
+    :rtype: Tuple[int, int] or None
+    """
+    match = RANGE_PATTERN.match(header.replace(' ', ''))
+
+    if match is None or match.group(1) == match.group(2) == '':
+        return None
+
+    if match.group(1) == '':
+        # A suffix range, the last N bytes of the file.
+        suffixLength: int = int(match.group(2))
+        if suffixLength == 0:
+            raise ValueError('Unsatisfiable range.')
+
+        return max(size - suffixLength, 0), size - 1
+
+    start: int = int(match.group(1))
+    end: int = int(match.group(2)) if match.group(2) else size - 1
+
+    if start >= size:
+        raise ValueError('Unsatisfiable range.')
+
+    if end < start:
+        return None
+
+    return start, min(end, size - 1)
+
+
+def _readRange(path: str, start: int, length: int) -> Iterator[bytes]:
+    """Reads a part of a file in blocks."""
+    with open(path, 'rb') as file:
+        file.seek(start)
+
+        while length > 0:
+            block: bytes = file.read(min(BLOCK_SIZE, length))
+            if not block:
+                break
+
+            length -= len(block)
+            yield block
+
+
+def serveFile(request: HttpRequest, path: str,
+              name: str) -> HttpResponseBase:
+    """Serves a file with support for conditional and range requests.
+
+    The response carries a strong `ETag` and a `Last-Modified` date, so
+    `If-None-Match`/`If-Modified-Since` requests are answered with 304.
+    A single byte range in the `Range` header is answered with 206
+    partial content, unless an `If-Range` precondition fails.
+
+    When `MEDIA_SENDFILE` is set to 'x-accel-redirect' or 'x-sendfile',
+    the transfer is handed over to the front proxy instead.
+
+    :param request: The request for the file.
+    :param path: The absolute path of the file on disk.
+    :param name: The name of the file in its storage.
+
+    :raises Http404: If the file does not exist.
+    """
+    try:
+        stat: os.stat_result = os.stat(path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise Http404('The file does not exist.')
+
+    size: int = stat.st_size
+    etag: str = quote_etag('{:x}-{:x}'.format(stat.st_mtime_ns, size))
+    lastModified: str = http_date(stat.st_mtime)
+    contentType: str = mimetypes.guess_type(path)[0] or \
+        'application/octet-stream'
+
+    # The headers shared by every response for this file.
+    headers: HttpResponse = HttpResponse()
+    headers['ETag'] = etag
+    headers['Last-Modified'] = lastModified
+
+    conditional: Optional[HttpResponse] = get_conditional_response(
+        request, etag=etag, last_modified=int(stat.st_mtime),
+        response=headers
+    )
+    if conditional is not headers:
+        # 304 Not Modified or 412 Precondition Failed.
+        return conditional
+
+    sendfile: Optional[str] = getattr(settings, 'MEDIA_SENDFILE', None)
+    if sendfile is not None:
+        # The front proxy serves the file and handles the ranges.
+        response: HttpResponseBase = HttpResponse(content_type=contentType)
+        if sendfile == 'x-accel-redirect':
+            response['X-Accel-Redirect'] = (
+                settings.MEDIA_SENDFILE_PREFIX + name
+            )
+        else:
+            response['X-Sendfile'] = path
+    else:
+        fileRange: Optional[Tuple[int, int]] = None
+
+        if 'HTTP_RANGE' in request.META and _ifRangePasses(
+            request, etag, int(stat.st_mtime)
+        ):
+            try:
+                fileRange = _parseRange(request.META['HTTP_RANGE'], size)
+            except ValueError:
+                response = HttpResponse(
+                    status=HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE
+                )
+                response['Content-Range'] = 'bytes */{}'.format(size)
+                return response
+
+        if fileRange is None:
+            # The whole file. `FileResponse` uses the server's sendfile
+            # support when it has one.
+            response = FileResponse(
+                open(path, 'rb'), content_type=contentType
+            )
+        else:
+            start, end = fileRange
+            response = StreamingHttpResponse(
+                _readRange(path, start, end - start + 1),
+                status=HTTP_206_PARTIAL_CONTENT, content_type=contentType
+            )
+            response['Content-Length'] = str(end - start + 1)
+            response['Content-Range'] = 'bytes {}-{}/{}'.format(
+                start, end, size
+            )
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = lastModified
+
+    return response
+
+
+def _ifRangePasses(request: HttpRequest, etag: str,
+                   lastModified: int) -> bool:
+    """Returns True if the `Range` header should be honoured, i.e. if
+    there is no `If-Range` header or if it matches the current version
+    of the file.
+    """
+    ifRange: Optional[str] = request.META.get('HTTP_IF_RANGE')
+
+    if ifRange is None:
+        return True
+
+    if ifRange.startswith('"') or ifRange.startswith('W/'):
+        # Weak entity tags never match for ranges.
+        return ifRange == etag
+
+    return parse_http_date_safe(ifRange) == lastModified
+
+
+class CourseVideoFileView(View):
+    """Serves the course videos, with support for seeking.
+
+    The short URLs of the videos redirect here. It is a plain Django view,
+    as players send `Accept` headers that DRF's content negotiation would
+    reject, and every range request would pay for it.
+    """
+
+    def get(self, request: HttpRequest, path: str) -> HttpResponseBase:
+        videoStorage: Storage = CourseVideo._meta.get_field('video').storage
+        name: str = 'course/videos/' + path
+
+        try:
+            filePath: str = videoStorage.path(name)
+        except (SuspiciousFileOperation, NotImplementedError):
+            raise Http404('The file does not exist.')
+
+        return serveFile(request, filePath, name)
+
+
+class CourseImageDerivativeView(View):
+    """Serves a course image resized to one of the
+    `IMAGE_DERIVATIVE_WIDTHS` and encoded in one of the
+    `IMAGE_DERIVATIVE_FORMATS`. The derivative is generated on the first
+    request and cached on disk. The original image is served when it
+    cannot be resized. Like `CourseVideoFileView`, it is a plain Django
+    view so that the `Accept` headers of browsers are not rejected.
+    """
+
+    def get(self, request: HttpRequest, width: int, imageFormat: str,
+            path: str) -> HttpResponseBase:
+        if width not in getWidths() or imageFormat not in getFormats() \
+                or not hasDerivatives(path):
+            raise Http404('The file does not exist.')
+
+        imageStorage: Storage = Course._meta.get_field('image').storage
+
+        try:
+            derivativePath: str = getDerivative(
+                imageStorage, path, width, imageFormat
+            )
+        except (SuspiciousFileOperation, NotImplementedError,
+                FileNotFoundError, NotADirectoryError):
+            raise Http404('The file does not exist.')
+        except (DecompressionBombError, OSError):
+            # The image is not valid or too large to be decoded.
+            return serveFile(request, imageStorage.path(path), path)
+
+        return serveFile(
+            request, derivativePath,
+            os.path.relpath(derivativePath, settings.MEDIA_ROOT)
+        )
@@ -0,0 +1,31 @@
+from rest_framework.permissions import IsAdminUser
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.status import HTTP_200_OK
+from rest_framework.views import APIView
+
+from api.dbstats import getDatabaseStats
+from courses.metrics import registry
+
+
+class DatabaseStatsView(APIView):
+    """Exposes the connection settings and the pool counters of the
+    databases, for the process that serves the request.
+    """
+
+    permission_classes = [IsAdminUser, ]
+
+    def get(self, request: Request) -> Response:
+        return Response(getDatabaseStats(), HTTP_200_OK)
+
+
+class RequestStatsView(APIView):
+    """Exposes the duration histogram and the average queries, database
+    time, cache lookups and render time of every route, for the process
+    that serves the request.
+    """
+
+    permission_classes = [IsAdminUser, ]
+
+    def get(self, request: Request) -> Response:
+        return Response(registry.stats(), HTTP_200_OK)
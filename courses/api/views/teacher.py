@@ -1,69 +1,154 @@
-from typing import Dict, List
+from typing import Any, Dict, List, Optional
 
-from django.core.exceptions import ObjectDoesNotExist
+from django.contrib.auth.models import User
 from django.db.models.query import QuerySet
+from django.http import HttpRequest, HttpResponse
+from rest_framework.exceptions import NotAuthenticated, PermissionDenied
 from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.status import HTTP_200_OK, HTTP_400_BAD_REQUEST
 from rest_framework.views import APIView
 
-from api.models import (Course, CourseTaughtByTeacher, Teacher,
-                        UserSessionMapping)
-from api.serialisers import CourseSerialiser
-from shortener.views import shortenURL
+from api.authentication import (AuthenticationResult,
+                                SessionIDAuthentication, aauthenticate)
+from api.images import getSrcset
+from api.models import Course
+from api.pagination import apaginateKeyset, getPageSize, paginateKeyset
+from api.permissions import IsTeacher
+from api.responsecache import TEACHER, ResponseCache
+from api.serialisers import CourseValuesSerialiser
+from api.utils import getMediaPath
+from api.views.base import AsyncAPIView
+from shortener.views import ashortenURLs, shortenURLs
 
 
 class AllCourses(APIView):
+    """Lists the courses taught by the logged in teacher.
+
+    Requests without a valid session are rejected with 401 and users
+    that are not teachers with 403.
+
+    The courses are paginated on `id`. The size of a page is read from
+    the `pageSize` query parameter. When there are more courses, the
+    cursor of the next page is sent in the `X-Next-Cursor` header and
+    is passed back as the `cursor` query parameter.
+    """
+
+    authentication_classes = [SessionIDAuthentication, ]
+    permission_classes = [IsTeacher, ]
+
     def get(self, request: Request) -> Response:
-        # Get the session ID from the cookies
-        sessionID: str = request.COOKIES['sessionID']
+        # The authentication class has resolved the session to its user
+        # and the permission class has made sure that they are a
+        # teacher.
+        user: User = request.user
 
-        # Obtain the `User` object from `UserSessionMapping` model.
-        mapping: UserSessionMapping = UserSessionMapping.objects.get(
-            session=sessionID
+        responseCache: ResponseCache = ResponseCache(
+            request, TEACHER, user.id
         )
+        cached: Optional[HttpResponse] = responseCache.lookup()
+        if cached is not None:
+            return cached
 
-        # Make sure that this user is a teacher.
+        # Get a page of the courses taught by this teacher with a single
+        # join.
+        courses: List[Dict[str, Any]]
+        nextCursor: Optional[str]
         try:
-            Teacher.objects.get(user=mapping.user)
-        except ObjectDoesNotExist:
+            courses, nextCursor = paginateKeyset(
+                _getCourseQueryset(user), ('id', ),
+                request.query_params.get('cursor'), getPageSize(request)
+            )
+        except ValueError:
             return Response(
-                {'body': 'This user is not a teacher.'},
-                HTTP_400_BAD_REQUEST
+                {'body': 'Invalid cursor.'}, HTTP_400_BAD_REQUEST
             )
 
-        # Get all the courses taught by this teacher.
-        courses: QuerySet = CourseTaughtByTeacher.objects.filter(
-            teacher__user=mapping.user
+        # Serialise the information of all the courses at once.
+        responseData: List[Dict[str, Any]] = CourseValuesSerialiser\
+            .serialiseMany(courses)
+
+        # Shorten the URLs of all the course images in a single batch.
+        shortHashes: Dict[str, str] = shortenURLs(_getImageURLs(responseData))
+        _setImageURLs(request, courses, responseData, shortHashes)
+
+        response: Response = Response(responseData, HTTP_200_OK)
+        if nextCursor is not None:
+            response['X-Next-Cursor'] = nextCursor
+
+        return responseCache.store(response)
+
+
+class AsyncAllCourses(AsyncAPIView):
+    """Asynchronous version of `AllCourses`."""
+
+    async def get(self, request: HttpRequest) -> HttpResponse:
+        authentication: AuthenticationResult = await aauthenticate(request)
+
+        if authentication is None:
+            raise NotAuthenticated()
+
+        user, resolved = authentication
+        if not resolved.isTeacher:
+            raise PermissionDenied(IsTeacher.message)
+
+        responseCache: ResponseCache = ResponseCache(
+            request, TEACHER, user.id
         )
+        cached: Optional[HttpResponse] = await responseCache.alookup()
+        if cached is not None:
+            return cached
 
-        # Response data.
-        responseData: List[Dict[str, str]] = list()
-
-        for course in courses:
-            # Obtain course information for each of the course taught
-            # by this teacher.
-            try:
-                courseTaught: Course = Course.objects.get(
-                    id=course.course.id
-                )
-            except ObjectDoesNotExist:
-                pass
-            else:
-                # Serialise this course information.
-                serialisedCourse = CourseSerialiser(courseTaught)
-                courseJSON = serialisedCourse.data
-
-                # Shorten the URL of the course image.
-                # The URL as returned from the database is not absolute
-                # and so we need to prepend a '/' to the URL to make it
-                # absolute.
-                shortHash: str = shortenURL('/' + courseJSON['image'])
-
-                # Modify the URL of the course image.
-                courseJSON['image'] = ('http://' + request.get_host()
-                                       + '/short/' + shortHash + '/')
-
-                responseData.append(courseJSON)
-
-        return Response(responseData, HTTP_200_OK)
+        courses: List[Dict[str, Any]]
+        nextCursor: Optional[str]
+        try:
+            courses, nextCursor = await apaginateKeyset(
+                _getCourseQueryset(user), ('id', ),
+                request.GET.get('cursor'), getPageSize(request)
+            )
+        except ValueError:
+            return self.render(
+                {'body': 'Invalid cursor.'}, HTTP_400_BAD_REQUEST
+            )
+
+        responseData: List[Dict[str, Any]] = CourseValuesSerialiser\
+            .serialiseMany(courses)
+
+        shortHashes: Dict[str, str] = await ashortenURLs(
+            _getImageURLs(responseData)
+        )
+        _setImageURLs(request, courses, responseData, shortHashes)
+
+        response: HttpResponse = self.render(responseData)
+        if nextCursor is not None:
+            response['X-Next-Cursor'] = nextCursor
+
+        return await responseCache.astore(response)
+
+
+def _getCourseQueryset(user: User) -> QuerySet:
+    """Returns the query of the courses of a teacher. Only the columns
+    that are serialised are loaded, as dictionaries.
+    """
+    return Course.objects.filter(
+        coursetaughtbyteacher__teacher__user=user
+    ).distinct().values(*CourseValuesSerialiser.getColumns())
+
+
+def _getImageURLs(responseData: List[Dict[str, Any]]) -> List[str]:
+    # The URLs are shortened as absolute paths.
+    return [getMediaPath(courseJSON['image']) for courseJSON in responseData]
+
+
+def _setImageURLs(request: HttpRequest, courses: List[Dict[str, Any]],
+                  responseData: List[Dict[str, Any]],
+                  shortHashes: Dict[str, str]):
+    """Modifies the URL of the course images and adds their resized
+    versions.
+    """
+    for course, courseJSON in zip(courses, responseData):
+        courseJSON['image'] = (
+            'http://' + request.get_host() + '/short/'
+            + shortHashes[getMediaPath(courseJSON['image'])] + '/'
+        )
+        courseJSON['imageSrcset'] = getSrcset(request, course['image'])
@@ -0,0 +1,405 @@
+import os
+import shutil
+from typing import Dict, Optional, Union
+from uuid import UUID
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File, locks
+from django.core.files.storage import FileSystemStorage, Storage
+from django.db import transaction
+from django.db.models.fields.files import FileField
+from django.http import UnreadablePostError
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.status import (HTTP_200_OK, HTTP_201_CREATED,
+                                   HTTP_204_NO_CONTENT, HTTP_400_BAD_REQUEST,
+                                   HTTP_403_FORBIDDEN, HTTP_404_NOT_FOUND,
+                                   HTTP_409_CONFLICT,
+                                   HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                                   HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+from rest_framework.views import APIView
+
+from api.authentication import SessionIDAuthentication
+from api.models import CourseTaughtByTeacher, CourseVideo, VideoUpload
+from api.permissions import IsTeacher
+
+# Number of bytes copied from the request to the disk at a time.
+BLOCK_SIZE = 64 * 1024
+
+
+def _offsetHeaders(upload: VideoUpload) -> Dict[str, str]:
+    return {
+        'Upload-Offset': str(upload.offset),
+        'Upload-Length': str(upload.size),
+        'Cache-Control': 'no-store',
+    }
+
+
+def _getUpload(request: Request, uploadID: UUID) -> Optional[VideoUpload]:
+    """Returns the upload with the given ID if it belongs to the user of
+    the request.
+    """
+    return VideoUpload.objects.filter(pk=uploadID, user=request.user).first()
+
+
+def _discardUpload(upload: VideoUpload):
+    """Deletes an upload along with its partial file."""
+    try:
+        os.remove(upload.partialPath)
+    except FileNotFoundError:
+        pass
+
+    upload.delete()
+
+
+def _storeUpload(storage: Storage, partialPath: str, name: str) -> str:
+    """Moves a finished upload into the storage of the video field.
+
+    With the file system storage, the partial file is moved, which is
+    just a rename when both are on the same file system. Other storages
+    receive a stream of the file.
+
+    :returns: The name of the stored file.
+    :rtype: str
+    """
+    if isinstance(storage, FileSystemStorage):
+        name = storage.get_available_name(name)
+        path: str = storage.path(name)
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.move(partialPath, path)
+
+        if settings.FILE_UPLOAD_PERMISSIONS is not None:
+            os.chmod(path, settings.FILE_UPLOAD_PERMISSIONS)
+
+        return name
+
+    with open(partialPath, 'rb') as partial:
+        name = storage.save(name, File(partial))
+
+    os.remove(partialPath)
+
+    return name
+
+
+class VideoUploadView(APIView):
+    """Starts a resumable upload of a course video.
+
+    The request body holds the `courseID`, `title`, `description`,
+    `fileName` and `size` in bytes of the video. The response holds the
+    `uploadID` that the chunks are sent to.
+    """
+
+    authentication_classes = [SessionIDAuthentication, ]
+    permission_classes = [IsTeacher, ]
+
+    def post(self, request: Request) -> Response:
+        requestData = request.data
+
+        try:
+            courseID: int = int(requestData['courseID'])
+            size: int = int(requestData['size'])
+            title: str = requestData['title']
+            description: str = requestData['description']
+            # Only keep the name of the file, not its path.
+            fileName: str = os.path.basename(requestData['fileName'])
+        except (KeyError, TypeError, ValueError):
+            return Response(
+                {'body': 'The course ID, title, description, file name and '
+                         + 'size of the video are required.'},
+                HTTP_400_BAD_REQUEST
+            )
+
+        if size <= 0 or not fileName:
+            return Response(
+                {'body': 'The size and file name of the video are not '
+                         + 'valid.'},
+                HTTP_400_BAD_REQUEST
+            )
+
+        if size > settings.VIDEO_UPLOAD_MAX_SIZE:
+            return Response(
+                {'body': 'The video is too large.'},
+                HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            )
+
+        # Only the teachers of a course can upload its videos.
+        if not CourseTaughtByTeacher.objects.filter(
+            course_id=courseID, teacher__user=request.user
+        ).exists():
+            return Response(
+                {'body': 'This user does not teach this course.'},
+                HTTP_403_FORBIDDEN
+            )
+
+        upload: VideoUpload = VideoUpload.objects.create(
+            course_id=courseID, user=request.user, title=title,
+            description=description, fileName=fileName, size=size
+        )
+
+        # Create the empty file the chunks are appended to.
+        os.makedirs(settings.VIDEO_UPLOAD_TEMP_DIR, exist_ok=True)
+        open(upload.partialPath, 'wb').close()
+
+        responseData: Dict[str, Union[str, int]] = {
+            'uploadID': str(upload.id),
+            'offset': upload.offset,
+            'size': upload.size,
+        }
+
+        response: Response = Response(responseData, HTTP_201_CREATED)
+        response['Location'] = request.build_absolute_uri(
+            str(upload.id) + '/'
+        )
+        for header, value in _offsetHeaders(upload).items():
+            response[header] = value
+
+        return response
+
+
+class VideoUploadDetailView(APIView):
+    """Receives the chunks of a resumable upload.
+
+    `HEAD` and `GET` return the current offset of the upload in the
+    `Upload-Offset` header. `PATCH` appends the raw request body at the
+    offset given in the `Upload-Offset` header, which must match the
+    current offset. `DELETE` aborts the upload.
+    """
+
+    authentication_classes = [SessionIDAuthentication, ]
+    permission_classes = [IsTeacher, ]
+    # The chunks are streamed to the disk, so the body is never parsed.
+    parser_classes = []
+
+    def get(self, request: Request, uploadID: UUID) -> Response:
+        upload: Optional[VideoUpload] = _getUpload(request, uploadID)
+
+        if upload is None:
+            return Response(
+                {'body': 'No upload was found with this ID.'},
+                HTTP_404_NOT_FOUND
+            )
+
+        responseData: Dict[str, Union[str, int]] = {
+            'uploadID': str(upload.id),
+            'offset': upload.offset,
+            'size': upload.size,
+        }
+
+        return Response(
+            responseData, HTTP_200_OK, headers=_offsetHeaders(upload)
+        )
+
+    def patch(self, request: Request, uploadID: UUID) -> Response:
+        upload: Optional[VideoUpload] = _getUpload(request, uploadID)
+
+        if upload is None:
+            return Response(
+                {'body': 'No upload was found with this ID.'},
+                HTTP_404_NOT_FOUND
+            )
+
+        try:
+            offset: int = int(request.headers['Upload-Offset'])
+            length: int = int(request.headers.get('Content-Length') or 0)
+        except (KeyError, ValueError):
+            return Response(
+                {'body': 'The Upload-Offset and Content-Length headers are '
+                         + 'required.'},
+                HTTP_400_BAD_REQUEST
+            )
+
+        # The chunks must be sent in order. The client has to ask for the
+        # current offset after a dropped connection.
+        if offset != upload.offset:
+            return Response(
+                {'body': 'The offset does not match the upload.'},
+                HTTP_409_CONFLICT, headers=_offsetHeaders(upload)
+            )
+
+        if offset + length > upload.size:
+            return Response(
+                {'body': 'The chunk goes past the end of the upload.'},
+                HTTP_400_BAD_REQUEST
+            )
+
+        with open(upload.partialPath, 'r+b') as partial:
+            # Another chunk of this upload is being written.
+            if not locks.lock(partial, locks.LOCK_EX | locks.LOCK_NB):
+                return Response(
+                    {'body': 'Another chunk of this upload is in progress.'},
+                    HTTP_409_CONFLICT, headers=_offsetHeaders(upload)
+                )
+
+            try:
+                # A previous request with the same offset finished while
+                # this one was waiting for the lock.
+                if not VideoUpload.objects.filter(
+                    pk=upload.pk, offset=offset
+                ).exists():
+                    return self._offsetConflict(request, uploadID)
+
+                # Drop anything written after the last recorded offset.
+                partial.truncate(offset)
+                partial.seek(offset)
+
+                written: int = self._copyChunk(request, partial, length)
+                partial.flush()
+            finally:
+                locks.unlock(partial)
+
+        # The type of the video is checked once its whole header has been
+        # received, so that a chunk interrupted after a few bytes can
+        # still be resumed.
+        headerSize: int = min(
+            CourseVideo.videoValidator.headerSize, upload.size
+        )
+        if offset < headerSize <= offset + written:
+            try:
+                with open(upload.partialPath, 'rb') as partial:
+                    CourseVideo.videoValidator.validateFile(File(partial))
+            except ValidationError as error:
+                _discardUpload(upload)
+
+                return Response(
+                    {'body': error.messages[0]},
+                    HTTP_415_UNSUPPORTED_MEDIA_TYPE
+                )
+
+        # Record the bytes that were actually received, so that an
+        # interrupted chunk can be resumed from where it stopped.
+        upload.offset = offset + written
+        if not VideoUpload.objects.filter(pk=upload.pk, offset=offset).update(
+            offset=upload.offset, dateUpdated=timezone.now()
+        ):
+            return self._offsetConflict(request, uploadID)
+
+        return Response(
+            status=HTTP_204_NO_CONTENT, headers=_offsetHeaders(upload)
+        )
+
+    def delete(self, request: Request, uploadID: UUID) -> Response:
+        upload: Optional[VideoUpload] = _getUpload(request, uploadID)
+
+        if upload is None:
+            return Response(
+                {'body': 'No upload was found with this ID.'},
+                HTTP_404_NOT_FOUND
+            )
+
+        _discardUpload(upload)
+
+        return Response(status=HTTP_204_NO_CONTENT)
+
+    @staticmethod
+    def _offsetConflict(request: Request, uploadID: UUID) -> Response:
+        """Returns the response to a chunk whose offset was changed by
+        another request in the meantime.
+        """
+        upload: Optional[VideoUpload] = _getUpload(request, uploadID)
+
+        if upload is None:
+            return Response(
+                {'body': 'No upload was found with this ID.'},
+                HTTP_404_NOT_FOUND
+            )
+
+        return Response(
+            {'body': 'The offset does not match the upload.'},
+            HTTP_409_CONFLICT, headers=_offsetHeaders(upload)
+        )
+
+    @staticmethod
+    def _copyChunk(request: Request, partial, length: int) -> int:
+        """Copies the request body to the partial file in blocks.
+
+        :returns: The number of bytes written. It is less than the
+            length of the chunk if the connection was dropped.
+        :rtype: int
+        """
+        stream = request.stream
+        written: int = 0
+
+        while stream is not None and written < length:
+            try:
+                block: bytes = stream.read(min(BLOCK_SIZE, length - written))
+            except (OSError, UnreadablePostError):
+                break
+
+            if not block:
+                break
+
+            partial.write(block)
+            written += len(block)
+
+        return written
+
+
+class VideoUploadFinalizeView(APIView):
+    """Creates the `CourseVideo` of a complete upload."""
+
+    authentication_classes = [SessionIDAuthentication, ]
+    permission_classes = [IsTeacher, ]
+
+    def post(self, request: Request, uploadID: UUID) -> Response:
+        with transaction.atomic():
+            # Lock the upload so that it is only finalised once.
+            upload: Optional[VideoUpload] = VideoUpload.objects\
+                .select_for_update()\
+                .filter(pk=uploadID, user=request.user).first()
+
+            if upload is None:
+                return Response(
+                    {'body': 'No upload was found with this ID.'},
+                    HTTP_404_NOT_FOUND
+                )
+
+            if upload.offset != upload.size:
+                return Response(
+                    {'body': 'The upload is not complete.'},
+                    HTTP_409_CONFLICT, headers=_offsetHeaders(upload)
+                )
+
+            # The user may have stopped teaching the course since the
+            # upload started.
+            if not CourseTaughtByTeacher.objects.filter(
+                course_id=upload.course_id, teacher__user=request.user
+            ).exists():
+                return Response(
+                    {'body': 'This user does not teach this course.'},
+                    HTTP_403_FORBIDDEN
+                )
+
+            video: CourseVideo = CourseVideo(
+                course_id=upload.course_id, title=upload.title,
+                description=upload.description
+            )
+
+            # Move the file to where the video field would have stored
+            # it.
+            videoField: FileField = CourseVideo._meta.get_field('video')
+            video.video.name = _storeUpload(
+                videoField.storage, upload.partialPath,
+                videoField.generate_filename(video, upload.fileName)
+            )
+            try:
+                video.save()
+            except Exception:
+                # The upload cannot be finalised again since its file
+                # was moved, so do not leave the file behind.
+                videoField.storage.delete(video.video.name)
+                raise
+
+            upload.delete()
+
+        responseData: Dict[str, Union[str, int]] = {
+            'id': video.id,
+            'title': video.title,
+            'description': video.description,
+            'dateUploaded': video.dateAdded.isoformat(),
+        }
+
+        return Response(responseData, HTTP_201_CREATED)
+
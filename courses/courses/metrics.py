@@ -0,0 +1,209 @@
+"""Per-request performance metrics.
+
+The metrics of the request being served are kept in a context variable,
+so that they follow the request into the threads of `sync_to_async`.
+`RequestMetricsMiddleware` starts and finishes the measurement, and
+adds every finished request to the histogram of its route.
+"""
+from bisect import bisect_left
+from contextvars import ContextVar
+from threading import Lock
+from time import perf_counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from rest_framework.renderers import JSONRenderer
+
+# Upper bounds in milliseconds of the buckets of the duration
+# histograms. The last bucket has no upper bound.
+DEFAULT_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class RequestMetrics:
+    """The measurements of a single request. Durations are in seconds."""
+
+    __slots__ = (
+        'start', 'queries', 'dbTime', 'cacheHits', 'cacheMisses',
+        'renderTime'
+    )
+
+    def __init__(self):
+        self.start: float = perf_counter()
+        self.queries: int = 0
+        self.dbTime: float = 0.0
+        self.cacheHits: int = 0
+        self.cacheMisses: int = 0
+        self.renderTime: float = 0.0
+
+
+currentRequest: ContextVar[Optional[RequestMetrics]] = ContextVar(
+    'currentRequest', default=None
+)
+
+
+def timeQuery(execute, sql, params, many, context):
+    """Database execute wrapper that counts and times the queries of the
+    current request. It is installed on every connection, so that the
+    queries of the asynchronous views, run in other threads, are counted
+    too.
+    """
+    metrics: Optional[RequestMetrics] = currentRequest.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+
+    start: float = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.dbTime += perf_counter() - start
+
+
+def installQueryTimer(sender, connection, **kwargs):
+    """Receiver of `connection_created`."""
+    if timeQuery not in connection.execute_wrappers:
+        connection.execute_wrappers.append(timeQuery)
+
+
+def recordCacheLookup(hit: bool):
+    """Counts a cache lookup in the metrics of the current request.
+
+    :param hit: Whether the value was found in the cache.
+    :type hit: bool
+    """
+    metrics: Optional[RequestMetrics] = currentRequest.get()
+    if metrics is not None:
+        if hit:
+            metrics.cacheHits += 1
+        else:
+            metrics.cacheMisses += 1
+
+
+class TimedJSONRenderer(JSONRenderer):
+    """DRF's JSON renderer, timed in the metrics of the current
+    request.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        start: float = perf_counter()
+        try:
+            return super().render(data, accepted_media_type, renderer_context)
+        finally:
+            metrics: Optional[RequestMetrics] = currentRequest.get()
+            if metrics is not None:
+                metrics.renderTime += perf_counter() - start
+
+
+class RouteHistogram:
+    """The aggregated metrics of the requests of a route."""
+
+    __slots__ = (
+        'buckets', 'count', 'errors', 'totalTime', 'maxTime', 'queries',
+        'dbTime', 'cacheHits', 'cacheMisses', 'renderTime'
+    )
+
+    def __init__(self, size: int):
+        self.buckets: List[int] = [0] * size
+        self.count: int = 0
+        self.errors: int = 0
+        self.totalTime: float = 0.0
+        self.maxTime: float = 0.0
+        self.queries: int = 0
+        self.dbTime: float = 0.0
+        self.cacheHits: int = 0
+        self.cacheMisses: int = 0
+        self.renderTime: float = 0.0
+
+
+class MetricsRegistry:
+    """The in-memory histograms of the request durations, by route, for
+    this process.
+    """
+
+    def __init__(self):
+        self._lock: Lock = Lock()
+        self._routes: Dict[Tuple[str, str], RouteHistogram] = {}
+
+    @property
+    def bounds(self) -> Tuple[int, ...]:
+        return getattr(settings, 'REQUEST_METRICS_BUCKETS', DEFAULT_BUCKETS)
+
+    def add(self, method: str, route: str, status: int, duration: float,
+            metrics: RequestMetrics):
+        """Adds a finished request to the histogram of its route.
+
+        :param method: The HTTP method of the request.
+        :type method: str
+
+        :param route: The route pattern of the request.
+        :type route: str
+
+        :param status: The status code of the response.
+        :type status: int
+
+        :param duration: The duration of the request in seconds.
+        :type duration: float
+
+        :param metrics: The measurements of the request.
+        :type metrics: RequestMetrics
+        """
+        bounds: Tuple[int, ...] = self.bounds
+        bucket: int = bisect_left(bounds, duration * 1000)
+
+        with self._lock:
+            histogram: Optional[RouteHistogram] = self._routes.get(
+                (method, route)
+            )
+            if histogram is None:
+                histogram = self._routes[method, route] = RouteHistogram(
+                    len(bounds) + 1
+                )
+
+            histogram.buckets[bucket] += 1
+            histogram.count += 1
+            histogram.errors += status >= 500
+            histogram.totalTime += duration
+            histogram.maxTime = max(histogram.maxTime, duration)
+            histogram.queries += metrics.queries
+            histogram.dbTime += metrics.dbTime
+            histogram.cacheHits += metrics.cacheHits
+            histogram.cacheMisses += metrics.cacheMisses
+            histogram.renderTime += metrics.renderTime
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Returns the histogram and the averages of every route. The
+        buckets are keyed by their upper bound in milliseconds, and are
+        not cumulative.
+        """
+        labels: List[str] = [str(bound) for bound in self.bounds] + ['+Inf']
+
+        with self._lock:
+            routes: List[Tuple[Tuple[str, str], RouteHistogram]] = sorted(
+                self._routes.items()
+            )
+
+            return [
+                {
+                    'method': method,
+                    'route': route,
+                    'count': histogram.count,
+                    'errors': histogram.errors,
+                    'buckets': dict(zip(labels, histogram.buckets)),
+                    'meanMs': histogram.totalTime * 1000 / histogram.count,
+                    'maxMs': histogram.maxTime * 1000,
+                    'meanQueries': histogram.queries / histogram.count,
+                    'meanDbMs': histogram.dbTime * 1000 / histogram.count,
+                    'meanRenderMs':
+                        histogram.renderTime * 1000 / histogram.count,
+                    'cacheHits': histogram.cacheHits,
+                    'cacheMisses': histogram.cacheMisses,
+                }
+                for (method, route), histogram in routes
+            ]
+
+
+registry: MetricsRegistry = MetricsRegistry()
@@ -0,0 +1,130 @@
+import json
+import logging
+from time import perf_counter
+from typing import Any, Dict, List, Optional
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse
+
+from .metrics import RequestMetrics, currentRequest, registry
+
+logger: logging.Logger = logging.getLogger('courses.performance')
+
+
+class RequestMetricsMiddleware:
+    """Measures every request: its duration, the number and the duration
+    of its queries, its cache hits and misses and the time spent
+    rendering its response.
+
+    The measurements are sent back in a `Server-Timing` header, added to
+    the histogram of the route, and logged when the request is slower
+    than `REQUEST_METRICS_SLOW_MS` or runs more than
+    `REQUEST_METRICS_SLOW_QUERIES` queries. Must be the first middleware
+    so that the others are measured too.
+
+    For streamed responses, only the time until the response starts is
+    measured.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        metrics: RequestMetrics = RequestMetrics()
+        token = currentRequest.set(metrics)
+        try:
+            response: HttpResponse = self.get_response(request)
+        finally:
+            currentRequest.reset(token)
+
+        return self._finish(request, response, metrics)
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        metrics: RequestMetrics = RequestMetrics()
+        token = currentRequest.set(metrics)
+        try:
+            response: HttpResponse = await self.get_response(request)
+        finally:
+            currentRequest.reset(token)
+
+        return self._finish(request, response, metrics)
+
+    def _finish(self, request: HttpRequest, response: HttpResponse,
+                metrics: RequestMetrics) -> HttpResponse:
+        duration: float = perf_counter() - metrics.start
+        route: str = (
+            request.resolver_match.route
+            if request.resolver_match is not None else '<unmatched>'
+        )
+
+        registry.add(
+            request.method, route, response.status_code, duration, metrics
+        )
+
+        if getattr(settings, 'REQUEST_METRICS_SERVER_TIMING', True):
+            response['Server-Timing'] = self._getServerTiming(
+                duration, metrics
+            )
+
+        slowMs: int = getattr(settings, 'REQUEST_METRICS_SLOW_MS', 500)
+        slowQueries: int = getattr(
+            settings, 'REQUEST_METRICS_SLOW_QUERIES', 50
+        )
+        if duration * 1000 >= slowMs or metrics.queries >= slowQueries:
+            self._logSlowRequest(request, response, route, duration, metrics)
+
+        return response
+
+    @staticmethod
+    def _getServerTiming(duration: float, metrics: RequestMetrics) -> str:
+        """Returns the value of the `Server-Timing` header."""
+        timings: List[str] = [
+            'total;dur={:.1f}'.format(duration * 1000),
+            'db;dur={:.1f};desc="{} queries"'.format(
+                metrics.dbTime * 1000, metrics.queries
+            ),
+            'cache;desc="{} hits, {} misses"'.format(
+                metrics.cacheHits, metrics.cacheMisses
+            ),
+        ]
+        if metrics.renderTime:
+            timings.append(
+                'render;dur={:.1f}'.format(metrics.renderTime * 1000)
+            )
+
+        return ', '.join(timings)
+
+    @staticmethod
+    def _logSlowRequest(request: HttpRequest, response: HttpResponse,
+                        route: str, duration: float,
+                        metrics: RequestMetrics):
+        """Logs a slow request as a single JSON line."""
+        viewName: Optional[str] = (
+            request.resolver_match.view_name
+            if request.resolver_match is not None else None
+        )
+        record: Dict[str, Any] = {
+            'event': 'slowRequest',
+            'method': request.method,
+            'path': request.path,
+            'route': route,
+            'view': viewName,
+            'status': response.status_code,
+            'durationMs': round(duration * 1000, 1),
+            'queries': metrics.queries,
+            'dbMs': round(metrics.dbTime * 1000, 1),
+            'cacheHits': metrics.cacheHits,
+            'cacheMisses': metrics.cacheMisses,
+            'renderMs': round(metrics.renderTime * 1000, 1),
+        }
+
+        logger.warning(json.dumps(record), extra={'requestMetrics': record})
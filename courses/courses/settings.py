@@ -47,6 +47,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'courses.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -80,17 +81,173 @@ WSGI_APPLICATION = 'courses.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.1/ref/settings/#databases
 
+# The database is configured from the environment. Set `DB_ENGINE` to
+# 'django.db.backends.sqlite3' and `DB_NAME` to a file path to use SQLite
+# locally.
+#
+# `DB_CONN_MAX_AGE` is the number of seconds a connection is reused for,
+# 0 to close it after every request and 'none' to keep it forever.
+# With `DB_CONN_HEALTH_CHECKS`, a reused connection is checked before
+# its first query in a request and replaced if the server dropped it.
+#
+# `DB_POOL` turns on the built-in PostgreSQL connection pool instead
+# (requires `psycopg[pool]` 3). It is shared by the threads of a
+# process and replaces persistent connections.
+
+
+def _getEnvBool(name: str, default: bool) -> bool:
+    return os.environ.get(name, str(default)).lower() in ('1', 'true', 'yes')
+
+
+def _getConnMaxAge():
+    value: str = os.environ.get('DB_CONN_MAX_AGE', '60')
+
+    return None if value.lower() == 'none' else int(value)
+
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
-        'NAME': 'courses_db',
-        'USER': 'ios_user',
-        'PASSWORD': 'ios_user123',
-        'HOST': '127.0.0.1',
-        'PORT': '5432',
+        'ENGINE': os.environ.get(
+            'DB_ENGINE', 'django.db.backends.postgresql'
+        ),
+        'NAME': os.environ.get('DB_NAME', 'courses_db'),
+        'USER': os.environ.get('DB_USER', 'ios_user'),
+        'PASSWORD': os.environ.get('DB_PASSWORD', 'ios_user123'),
+        'HOST': os.environ.get('DB_HOST', '127.0.0.1'),
+        'PORT': os.environ.get('DB_PORT', '5432'),
+        'CONN_MAX_AGE': _getConnMaxAge(),
+        'CONN_HEALTH_CHECKS': _getEnvBool('DB_CONN_HEALTH_CHECKS', True),
+    }
+}
+
+if _getEnvBool('DB_POOL', False):
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', '2')),
+            'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', '10')),
+            # Seconds a request waits for a free connection before
+            # failing.
+            'timeout': float(os.environ.get('DB_POOL_TIMEOUT', '10')),
+        },
+    }
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.0/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
 
+# Short URL cache settings.
+# Maximum number of entries in the in-process LRU cache.
+SHORTENER_LRU_SIZE = 10000
+# Alias of the shared cache from `CACHES`.
+SHORTENER_CACHE_ALIAS = 'default'
+# The mappings never change, so they never expire.
+SHORTENER_CACHE_TIMEOUT = None
+# When enabled, short URLs are generated in memory and written to the
+# database in the background, in batches. Until they are written, they
+# are only known to the process that generated them and to the shared
+# cache, so `SHORTENER_CACHE_ALIAS` must then be a cache shared by all
+# the processes, like Redis or Memcached, and not the local memory
+# cache.
+SHORTENER_LAZY_PERSISTENCE = False
+# Maximum number of short URLs written per query by the background
+# flush.
+SHORTENER_FLUSH_BATCH_SIZE = 500
+# Number of seconds between two background flushes.
+SHORTENER_FLUSH_INTERVAL = 1.0
+
+
+# Sessions
+# https://docs.djangoproject.com/en/3.0/topics/http/sessions/
+
+# The API sessions work with any of the built-in engines that store
+# their sessions on the server:
+# 'django.contrib.sessions.backends.db',
+# 'django.contrib.sessions.backends.cached_db',
+# 'django.contrib.sessions.backends.cache' and
+# 'django.contrib.sessions.backends.file'.
+# 'django.contrib.sessions.backends.signed_cookies' is rejected, as it
+# cannot revoke sessions.
+# With the engines that don't use the database, the user to session
+# index is kept in `SESSION_CACHE_ALIAS`, which should then be a
+# persistent, shared cache.
+SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+
+# Number of seconds a successful session validation is served from the
+# cache. Set to 0 to always validate against the database.
+SESSION_VALIDATION_CACHE_TIMEOUT = 60
+
+# Number of seconds the role of a user is cached. Cached roles are also
+# dropped whenever a `Teacher` or `Student` row changes.
+ROLE_CACHE_TIMEOUT = 24 * 60 * 60
+
+# Routes served by the asynchronous versions of their views, by their
+# namespaced URL name. They only pay off when the application is run by
+# an ASGI server. Supported: 'api:courseDetail', 'api:courseAll',
+# 'api:validate' and 'shortener:shortenAPI'.
+ASYNC_VIEWS = ()
+
+# Pagination settings.
+# Default number of items in a page.
+API_PAGE_SIZE = 50
+# Maximum number of items a client can request in a page.
+API_MAX_PAGE_SIZE = 200
+# Number of replies returned with each comment of a course. The others
+# are loaded separately.
+API_REPLIES_PER_COMMENT = 3
+# Number of seconds the rendered responses of the course detail and the
+# teacher course list are cached. They are also dropped whenever a row
+# they show changes. Set to 0 to turn the cache off.
+API_RESPONSE_CACHE_TIMEOUT = 60 * 60
+# Number of seconds the version stamps of the cached responses are kept,
+# and so the longest time a client can be answered with 304 for a
+# response that changed without the stamp being dropped.
+API_RESPONSE_VERSION_TIMEOUT = 24 * 60 * 60
+
+REST_FRAMEWORK = {
+    # The JSON renderer is timed by `RequestMetricsMiddleware`.
+    'DEFAULT_RENDERER_CLASSES': [
+        'courses.metrics.TimedJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+
+
+# Request metrics
+# Upper bounds in milliseconds of the buckets of the per-route duration
+# histograms.
+REQUEST_METRICS_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+# Requests slower than this many milliseconds, or running at least this
+# many queries, are logged to the 'courses.performance' logger.
+REQUEST_METRICS_SLOW_MS = 500
+REQUEST_METRICS_SLOW_QUERIES = 50
+# Sends the measurements of every request back in a `Server-Timing`
+# header. Turn it off if they should not be visible to the clients.
+REQUEST_METRICS_SERVER_TIMING = True
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'courses.performance': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
@@ -133,3 +290,45 @@ STATIC_URL = '/static/'
 # Media settings
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = 'media/'
+
+# Hands the transfer of course videos over to the front proxy. Set to
+# 'x-accel-redirect' for nginx or 'x-sendfile' for Apache and lighttpd.
+# None serves the files from the application.
+MEDIA_SENDFILE = None
+# The internal location of `MEDIA_ROOT` used with 'x-accel-redirect'.
+MEDIA_SENDFILE_PREFIX = '/protected-media/'
+
+# Course image derivatives, generated on demand at every width and in
+# every format.
+IMAGE_DERIVATIVE_WIDTHS = (160, 320, 640, 1280)
+IMAGE_DERIVATIVE_FORMATS = ('webp', 'jpeg')
+IMAGE_DERIVATIVE_QUALITY = 80
+# Directory the derivatives are cached in, and the size in bytes above
+# which the least recently used ones are removed.
+IMAGE_CACHE_DIR = os.path.join(MEDIA_ROOT, 'cache', 'images')
+IMAGE_CACHE_MAX_SIZE = 512 * 1024 ** 2
+# Number of seconds between two evictions run after a derivative is
+# generated. None leaves the eviction to the `evictimages` command.
+IMAGE_CACHE_EVICTION_INTERVAL = 10 * 60
+
+# HLS conversion settings, used by the `processvideos` command.
+# The `ffmpeg` binary, looked up in the PATH.
+FFMPEG_BINARY = 'ffmpeg'
+# The renditions as (height, video bitrate, audio bitrate).
+VIDEO_HLS_RENDITIONS = (
+    (360, '800k', '96k'),
+    (720, '2800k', '128k'),
+    (1080, '5000k', '192k'),
+)
+# Target duration of a segment in seconds.
+VIDEO_HLS_SEGMENT_DURATION = 6
+# Number of seconds after which a conversion is stopped and fails.
+VIDEO_HLS_TIMEOUT = 2 * 60 * 60
+
+# Video upload settings.
+# Directory the chunks of resumable video uploads are written to. Keep
+# it on the same file system as `MEDIA_ROOT` so that finished uploads
+# are moved instead of copied.
+VIDEO_UPLOAD_TEMP_DIR = os.path.join(MEDIA_ROOT, 'uploads')
+# Maximum size of an uploaded video in bytes.
+VIDEO_UPLOAD_MAX_SIZE = 10 * 1024 ** 3
@@ -18,11 +18,26 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from api.views.media import CourseImageDerivativeView, CourseVideoFileView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api-auth/', include('rest_framework.urls')),
     path('api/', include('api.urls', namespace='api')),
     path('short/', include('shortener.urls', namespace='shortener')),
+    # Course videos are always served by the application so that they
+    # support range requests.
+    path(
+        settings.MEDIA_URL.lstrip('/') + 'course/videos/<path:path>',
+        CourseVideoFileView.as_view(), name='courseVideoFile'
+    ),
+    # Resized versions of the course images, generated on demand.
+    path(
+        settings.MEDIA_URL.lstrip('/')
+        + 'course/image-derivatives/<int:width>/<str:imageFormat>/'
+        '<path:path>',
+        CourseImageDerivativeView.as_view(), name='courseImageDerivative'
+    ),
 ]
 
 # Allow for media files to be served if project is in debug mode.
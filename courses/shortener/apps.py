@@ -3,3 +3,8 @@ from django.apps import AppConfig
 
 class ShortenerConfig(AppConfig):
     name = 'shortener'
+
+    def ready(self):
+        from .persistence import checkSharedCache
+
+        checkSharedCache()
@@ -0,0 +1,289 @@
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, Optional, Union
+
+from django.conf import settings
+from django.core.cache import caches
+
+from courses.metrics import recordCacheLookup
+
+from .models import URLShortener
+from .persistence import pendingURLs
+
+# Prefix of the keys stored in Django's cache framework.
+CACHE_KEY_PREFIX = 'shortener:'
+
+Stats = Dict[str, Union[int, float]]
+
+
+def _hitRatio(hits: int, misses: int) -> float:
+    """Calculates the hit ratio of a cache.
+
+    :returns: The fraction of lookups that were hits, or 0 if there
+        were no lookups.
+    :rtype: float
+    """
+    lookups: int = hits + misses
+
+    return hits / lookups if lookups else 0.0
+
+
+class LRUCache:
+    """A bounded, thread-safe, in-process least recently used cache.
+
+    When the cache is full, the least recently used entry is evicted to
+    make room for the new one.
+    """
+
+    def __init__(self, maxSize: int):
+        """A bounded, thread-safe, in-process least recently used cache.
+
+        :param maxSize: The maximum number of entries held in the cache.
+            A size of 0 disables the cache.
+        """
+        self.maxSize: int = maxSize
+        self._entries: OrderedDict = OrderedDict()
+        self._lock: Lock = Lock()
+
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+
+    def __contains__(self, key: str) -> bool:
+        # Membership tests do not count as hits or misses.
+        with self._lock:
+            return key in self._entries
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            try:
+                value: str = self._entries[key]
+            except KeyError:
+                self.misses += 1
+                return None
+
+            # Mark this entry as the most recently used one.
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+            return value
+
+    def set(self, key: str, value: str):
+        if self.maxSize <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+
+            # Evict the least recently used entries.
+            while len(self._entries) > self.maxSize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Stats:
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'maxSize': self.maxSize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hitRatio': _hitRatio(self.hits, self.misses),
+            }
+
+
+class ShortURLCache:
+    """A read-through cache in front of the `URLShortener` table.
+
+    Lookups go through a bounded in-process LRU cache first, then
+    through Django's cache framework, then through the mappings waiting
+    to be persisted and finally through the database.
+    The mapping between a hash and its URL suffix never changes after
+    it has been created, so entries are never invalidated.
+    """
+
+    def __init__(self):
+        self.local: LRUCache = LRUCache(
+            getattr(settings, 'SHORTENER_LRU_SIZE', 10000)
+        )
+        # The hashes this process knows to be in the database. With
+        # `SHORTENER_LAZY_PERSISTENCE`, the shared cache also holds the
+        # hashes that another process has not flushed yet, so an entry
+        # of `local` is not enough to skip persisting a hash.
+        self.persisted: LRUCache = LRUCache(self.local.maxSize)
+        self.cacheAlias: str = getattr(
+            settings, 'SHORTENER_CACHE_ALIAS', 'default'
+        )
+        self.timeout: Optional[int] = getattr(
+            settings, 'SHORTENER_CACHE_TIMEOUT', None
+        )
+
+        self._lock: Lock = Lock()
+        self.sharedHits: int = 0
+        self.sharedMisses: int = 0
+
+    @property
+    def shared(self):
+        return caches[self.cacheAlias]
+
+    def get(self, shortHash: str) -> Optional[str]:
+        """Finds the URL suffix for the given short hash.
+
+        :param shortHash: The short hash of the URL.
+        :type shortHash: str
+
+        :returns: The URL suffix or None if the hash does not exist.
+        :rtype: str or None
+        """
+        # First tier: the in-process cache.
+        urlSuffix: Optional[str] = self.local.get(shortHash)
+        if urlSuffix is not None:
+            recordCacheLookup(True)
+            return urlSuffix
+
+        # Second tier: the shared cache.
+        urlSuffix = self._countShared(
+            self.shared.get(CACHE_KEY_PREFIX + shortHash)
+        )
+        if urlSuffix is not None:
+            self.local.set(shortHash, urlSuffix)
+            return urlSuffix
+
+        # Mappings that have been handed out but not yet flushed to the
+        # database by this process.
+        urlSuffix = pendingURLs.get(shortHash)
+
+        if urlSuffix is not None:
+            self.local.set(shortHash, urlSuffix)
+            return urlSuffix
+
+        # Finally, the database.
+        urlSuffix = URLShortener.objects.filter(shortHash=shortHash)\
+            .values_list('urlSuffix', flat=True).first()
+
+        if urlSuffix is not None:
+            self.setMany({shortHash: urlSuffix}, persisted=True)
+
+        return urlSuffix
+
+    async def aget(self, shortHash: str) -> Optional[str]:
+        """Asynchronous version of `get`. A hit in the in-process cache
+        never leaves the event loop.
+        """
+        urlSuffix: Optional[str] = self.local.get(shortHash)
+        if urlSuffix is not None:
+            recordCacheLookup(True)
+            return urlSuffix
+
+        urlSuffix = self._countShared(
+            await self.shared.aget(CACHE_KEY_PREFIX + shortHash)
+        )
+        if urlSuffix is None:
+            urlSuffix = pendingURLs.get(shortHash)
+
+        if urlSuffix is not None:
+            self.local.set(shortHash, urlSuffix)
+            return urlSuffix
+
+        urlSuffix = await URLShortener.objects.filter(shortHash=shortHash)\
+            .values_list('urlSuffix', flat=True).afirst()
+
+        if urlSuffix is not None:
+            await self.asetMany({shortHash: urlSuffix}, persisted=True)
+
+        return urlSuffix
+
+    def _countShared(self, urlSuffix: Optional[str]) -> Optional[str]:
+        """Counts a lookup in the shared cache and returns its result."""
+        recordCacheLookup(urlSuffix is not None)
+        with self._lock:
+            if urlSuffix is None:
+                self.sharedMisses += 1
+            else:
+                self.sharedHits += 1
+
+        return urlSuffix
+
+    def setMany(self, mapping: Dict[str, str], persisted: bool = False):
+        """Stores hash to URL suffix mappings in both the tiers.
+
+        :param mapping: A mapping of short hashes to URL suffixes.
+        :type mapping: Dict[str, str]
+        :param persisted: Whether the mappings are known to be in the
+            database.
+        :type persisted: bool
+        """
+        if not mapping:
+            return
+
+        for shortHash, urlSuffix in mapping.items():
+            self.local.set(shortHash, urlSuffix)
+        if persisted:
+            self.markPersisted(mapping)
+
+        self.shared.set_many(
+            {
+                CACHE_KEY_PREFIX + shortHash: urlSuffix
+                for shortHash, urlSuffix in mapping.items()
+            },
+            self.timeout
+        )
+
+    async def asetMany(self, mapping: Dict[str, str],
+                       persisted: bool = False):
+        """Asynchronous version of `setMany`."""
+        if not mapping:
+            return
+
+        for shortHash, urlSuffix in mapping.items():
+            self.local.set(shortHash, urlSuffix)
+        if persisted:
+            self.markPersisted(mapping)
+
+        await self.shared.aset_many(
+            {
+                CACHE_KEY_PREFIX + shortHash: urlSuffix
+                for shortHash, urlSuffix in mapping.items()
+            },
+            self.timeout
+        )
+
+    def markPersisted(self, mapping: Dict[str, str]):
+        """Records that hash to URL suffix mappings are in the database.
+
+        :param mapping: A mapping of short hashes to URL suffixes.
+        :type mapping: Dict[str, str]
+        """
+        for shortHash in mapping:
+            # Only the membership of the hashes is used.
+            self.persisted.set(shortHash, '')
+
+    def clearLocal(self):
+        """Clears the in-process tier and what this process knows to be
+        persisted.
+        """
+        self.local.clear()
+        self.persisted.clear()
+
+    def stats(self) -> Dict[str, Stats]:
+        """Returns the counters of both the tiers so that the cache can
+        be sized.
+        """
+        with self._lock:
+            shared: Stats = {
+                'hits': self.sharedHits,
+                'misses': self.sharedMisses,
+                'hitRatio': _hitRatio(self.sharedHits, self.sharedMisses),
+            }
+
+        return {'local': self.local.stats(), 'shared': shared}
+
+
+# The cache used by the shortener views.
+shortURLCache: ShortURLCache = ShortURLCache()
@@ -3,7 +3,35 @@ from hashlib import sha256
 from django.db import models
 
 
+def generateShortHash(urlSuffix: str, attempt: int = 0) -> str:
+    """Generates the short hash for the given URL suffix.
+
+    The hash is deterministic, so it can be computed without looking at
+    the database.
+
+    :param urlSuffix: The absolute address that has to be shortened.
+    :type urlSuffix: str
+
+    :param attempt: 0 for the usual hash. The next attempts give other
+        hashes, for the rare suffixes whose hash is already used by
+        another suffix.
+    :type attempt: int
+
+    :returns: The first 15 characters of the SHA256 hash of the suffix.
+    :rtype: str
+    """
+    if attempt:
+        urlSuffix = '{}\n{}'.format(urlSuffix, attempt)
+
+    return sha256(urlSuffix.encode()).hexdigest()[:15]
+
+
 class URLShortener(models.Model):
+    # The short hash is derived from the URL suffix, so its unique index
+    # doubles as a hash index of the suffix: both directions are looked
+    # up through it. The suffix stays unique, so that a URL is never
+    # shortened twice, and it is only looked up for the suffixes whose
+    # hash is used by another suffix.
     shortHash = models.CharField(unique=True, max_length=15)
     urlSuffix = models.CharField(unique=True, max_length=1000)
     dateCreated = models.DateTimeField(auto_now_add=True)
@@ -12,7 +40,7 @@ class URLShortener(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.id:
-            self.shortHash = sha256(self.urlSuffix.encode()).hexdigest()[:15]
+            self.shortHash = generateShortHash(self.urlSuffix)
 
         return super().save(*args, **kwargs)
 
@@ -0,0 +1,191 @@
+import atexit
+import logging
+from threading import Event, Lock, Thread
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import close_old_connections
+
+from .models import URLShortener
+
+logger = logging.getLogger(__name__)
+
+
+class PendingURLQueue:
+    """Holds the short URLs that have been handed out but not yet
+    written to the database.
+
+    A daemon worker thread drains the queue in batches with
+    `bulk_create`. Until a mapping has been flushed, it can still be
+    looked up from the queue.
+    """
+
+    def __init__(self, batchSize: int, flushInterval: float):
+        """Holds the short URLs that have been handed out but not yet
+        written to the database.
+
+        :param batchSize: The maximum number of rows written per query.
+            Reaching this many pending rows also wakes up the worker.
+        :param flushInterval: The number of seconds the worker waits
+            between two flushes.
+        """
+        self.batchSize: int = batchSize
+        self.flushInterval: float = flushInterval
+
+        self._pending: Dict[str, str] = dict()
+        self._lock: Lock = Lock()
+        self._wakeUp: Event = Event()
+        self._worker: Optional[Thread] = None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def get(self, shortHash: str) -> Optional[str]:
+        """Returns the URL suffix of a mapping that has not been flushed
+        yet, or None.
+        """
+        with self._lock:
+            return self._pending.get(shortHash)
+
+    def enqueue(self, mapping: Dict[str, str]):
+        """Queues hash to URL suffix mappings for persistence.
+
+        :param mapping: A mapping of short hashes to URL suffixes.
+        :type mapping: Dict[str, str]
+        """
+        if not mapping:
+            return
+
+        with self._lock:
+            self._pending.update(mapping)
+            queued: int = len(self._pending)
+
+        self._startWorker()
+
+        if queued >= self.batchSize:
+            self._wakeUp.set()
+
+    def flush(self) -> int:
+        """Writes all the pending mappings to the database.
+
+        The mappings are only removed from the queue once they have been
+        written, so they can still be looked up while the flush is in
+        progress and are retried if it fails.
+
+        :returns: The number of mappings that were written.
+        :rtype: int
+        """
+        with self._lock:
+            pending: Dict[str, str] = dict(self._pending)
+
+        if not pending:
+            return 0
+
+        rows: List[URLShortener] = [
+            URLShortener(shortHash=shortHash, urlSuffix=urlSuffix)
+            for shortHash, urlSuffix in pending.items()
+        ]
+        # Rows that already exist are skipped. This is safe because the
+        # hash of a URL is deterministic.
+        URLShortener.objects.bulk_create(
+            rows, batch_size=self.batchSize, ignore_conflicts=True
+        )
+        collisions: List[str] = self._reportCollisions(pending)
+
+        # Imported here since the cache module imports this one.
+        from .cache import shortURLCache
+        shortURLCache.markPersisted({
+            shortHash: urlSuffix for shortHash, urlSuffix in pending.items()
+            if shortHash not in collisions
+        })
+
+        with self._lock:
+            for shortHash in pending:
+                self._pending.pop(shortHash, None)
+
+        return len(pending)
+
+    @staticmethod
+    def _reportCollisions(pending: Dict[str, str]) -> List[str]:
+        """Logs the flushed hashes that are used by another URL. The
+        lazy mode hands the hashes out before it can find out, so they
+        cannot be replaced.
+
+        :returns: The hashes that are used by another URL.
+        :rtype: List[str]
+        """
+        collisions: List[str] = [
+            shortHash for shortHash, urlSuffix in URLShortener.objects
+            .filter(shortHash__in=pending)
+            .values_list('shortHash', 'urlSuffix')
+            if pending[shortHash] != urlSuffix
+        ]
+        if collisions:
+            logger.error(
+                'These short hashes are used by other URLs: %s',
+                ', '.join(collisions)
+            )
+
+        return collisions
+
+    def _startWorker(self):
+        if self._worker is not None:
+            return
+
+        with self._lock:
+            if self._worker is None:
+                self._worker = Thread(
+                    target=self._run, name='shortener-flush', daemon=True
+                )
+                self._worker.start()
+                # Write whatever is left when the process exits.
+                atexit.register(self._flushSafely)
+
+    def _run(self):
+        while True:
+            self._wakeUp.wait(self.flushInterval)
+            self._wakeUp.clear()
+            self._flushSafely()
+
+    def _flushSafely(self):
+        # The worker owns its database connection, so make sure that it
+        # is still usable before writing.
+        close_old_connections()
+
+        try:
+            self.flush()
+        except Exception:
+            logger.exception('Could not flush the pending short URLs.')
+        finally:
+            close_old_connections()
+
+
+def checkSharedCache():
+    """Raises `ImproperlyConfigured` if `SHORTENER_LAZY_PERSISTENCE` is
+    enabled without a cache shared by all the processes.
+
+    The pending short URLs are only queued in the process that handed
+    them out. Until they are flushed, the other processes can only find
+    them in the shared cache.
+    """
+    if not getattr(settings, 'SHORTENER_LAZY_PERSISTENCE', False):
+        return
+
+    alias: str = getattr(settings, 'SHORTENER_CACHE_ALIAS', 'default')
+    if isinstance(caches[alias], (LocMemCache, DummyCache)):
+        raise ImproperlyConfigured(
+            'SHORTENER_LAZY_PERSISTENCE requires SHORTENER_CACHE_ALIAS to '
+            'be a cache shared by all the processes.'
+        )
+
+
+# The queue used when `SHORTENER_LAZY_PERSISTENCE` is enabled.
+pendingURLs: PendingURLQueue = PendingURLQueue(
+    getattr(settings, 'SHORTENER_FLUSH_BATCH_SIZE', 500),
+    getattr(settings, 'SHORTENER_FLUSH_INTERVAL', 1.0)
+)
@@ -1,3 +1,178 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from .cache import CACHE_KEY_PREFIX, LRUCache, shortURLCache
+from .models import URLShortener, generateShortHash
+from .persistence import PendingURLQueue, pendingURLs
+from .views import ashortenURLs, shortenURLs
+
+
+def clearCaches():
+    """Clears the shared cache and the in-process cache of the short
+    URLs.
+    """
+    cache.clear()
+    shortURLCache.clearLocal()
+
+
+class ShortenerTestCase(TestCase):
+    def setUp(self):
+        clearCaches()
+        self.addCleanup(clearCaches)
+
+    def assertRedirects(self, shortHash: str, urlSuffix: str):
+        response = self.client.get('/short/{}/'.format(shortHash))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response['Location'], urlSuffix)
+
+
+class ShortenURLsTests(ShortenerTestCase):
+    def testShortenURLs(self):
+        shortHashes = shortenURLs(['/media/a.png', '/media/b.png'])
+
+        self.assertEqual(shortHashes, {
+            '/media/a.png': generateShortHash('/media/a.png'),
+            '/media/b.png': generateShortHash('/media/b.png'),
+        })
+        self.assertEqual(URLShortener.objects.count(), 2)
+
+        # The existing rows are found with a single query.
+        with self.assertNumQueries(1):
+            self.assertEqual(shortenURLs(['/media/a.png']), {
+                '/media/a.png': shortHashes['/media/a.png']
+            })
+        self.assertRedirects(shortHashes['/media/b.png'], '/media/b.png')
+
+    def testCollision(self):
+        # Another URL already uses the hash of this one.
+        URLShortener.objects.bulk_create([URLShortener(
+            urlSuffix='/media/other.png',
+            shortHash=generateShortHash('/media/a.png')
+        )])
+
+        for shorten in (shortenURLs, async_to_sync(ashortenURLs)):
+            with self.subTest(shorten=shorten):
+                shortHash: str = shorten(['/media/a.png'])['/media/a.png']
+
+                self.assertEqual(
+                    shortHash, generateShortHash('/media/a.png', 1)
+                )
+                self.assertRedirects(shortHash, '/media/a.png')
+                clearCaches()
+
+        self.assertRedirects(
+            generateShortHash('/media/a.png'), '/media/other.png'
+        )
+        self.assertEqual(URLShortener.objects.count(), 2)
+
+
+class LRUCacheTests(TestCase):
+    def testEviction(self):
+        lru: LRUCache = LRUCache(2)
+        lru.set('a', '/a')
+        lru.set('b', '/b')
+
+        # Reading 'a' makes 'b' the least recently used entry.
+        self.assertEqual(lru.get('a'), '/a')
+        lru.set('c', '/c')
+
+        self.assertIsNone(lru.get('b'))
+        self.assertEqual(lru.get('c'), '/c')
+        self.assertEqual(lru.stats(), {
+            'size': 2, 'maxSize': 2, 'hits': 2, 'misses': 1,
+            'evictions': 1, 'hitRatio': 2 / 3,
+        })
+
+    def testDisabled(self):
+        lru: LRUCache = LRUCache(0)
+        lru.set('a', '/a')
+
+        self.assertIsNone(lru.get('a'))
+
+
+class ShortURLCacheTests(ShortenerTestCase):
+    def testSharedCacheFillsLocal(self):
+        shortHash: str = generateShortHash('/media/a.png')
+        cache.set(CACHE_KEY_PREFIX + shortHash, '/media/a.png')
+
+        with self.assertNumQueries(0):
+            self.assertEqual(shortURLCache.get(shortHash), '/media/a.png')
+        self.assertEqual(shortURLCache.local.get(shortHash), '/media/a.png')
+        # Another process may not have persisted it yet.
+        self.assertNotIn(shortHash, shortURLCache.persisted)
+
+    def testDatabaseFillsBothTiers(self):
+        shortHash: str = shortenURLs(['/media/a.png'])['/media/a.png']
+        clearCaches()
+
+        with self.assertNumQueries(1):
+            self.assertEqual(shortURLCache.get(shortHash), '/media/a.png')
+        self.assertEqual(
+            cache.get(CACHE_KEY_PREFIX + shortHash), '/media/a.png'
+        )
+        self.assertIn(shortHash, shortURLCache.persisted)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(shortURLCache.get(shortHash), '/media/a.png')
+
+    def testUnknownHash(self):
+        self.assertIsNone(shortURLCache.get('unknown'))
+        self.assertEqual(self.client.get('/short/unknown/').status_code, 404)
+
+
+@override_settings(SHORTENER_LAZY_PERSISTENCE=True)
+class LazyPersistenceTests(ShortenerTestCase):
+    def setUp(self):
+        super().setUp()
+        # The mappings are flushed by the tests rather than by the
+        # worker thread.
+        worker = mock.patch.object(pendingURLs, '_startWorker')
+        worker.start()
+        self.addCleanup(worker.stop)
+        self.addCleanup(pendingURLs.flush)
+
+    def testFlush(self):
+        with self.assertNumQueries(0):
+            shortHash: str = shortenURLs(['/media/a.png'])['/media/a.png']
+        self.assertEqual(len(pendingURLs), 1)
+
+        # The pending mapping can be followed before it is written.
+        cache.clear()
+        self.assertRedirects(shortHash, '/media/a.png')
+
+        self.assertEqual(pendingURLs.flush(), 1)
+        self.assertEqual(len(pendingURLs), 0)
+        self.assertTrue(
+            URLShortener.objects.filter(shortHash=shortHash).exists()
+        )
+
+        # Once written, the URL is not queued again.
+        shortenURLs(['/media/a.png'])
+        self.assertEqual(len(pendingURLs), 0)
+
+    def testHashOfAnotherProcess(self):
+        # Another process handed out the hash, and this process followed
+        # it before the other one flushed it.
+        shortHash: str = generateShortHash('/media/a.png')
+        cache.set(CACHE_KEY_PREFIX + shortHash, '/media/a.png')
+        self.assertRedirects(shortHash, '/media/a.png')
+
+        shortenURLs(['/media/a.png'])
+        self.assertEqual(pendingURLs.get(shortHash), '/media/a.png')
+
+    def testFlushOnExit(self):
+        queue: PendingURLQueue = PendingURLQueue(500, 1.0)
+
+        with mock.patch('shortener.persistence.Thread'), \
+                mock.patch('atexit.register') as register:
+            queue.enqueue({'hash': '/media/a.png'})
+        register.assert_called_once_with(queue._flushSafely)
+
+        queue.flush()
+        self.assertEqual(
+            URLShortener.objects.get(shortHash='hash').urlSuffix,
+            '/media/a.png'
+        )
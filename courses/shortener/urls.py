@@ -1,9 +1,17 @@
+from django.conf import settings
 from django.urls import path
 
-from .views import LengthenURL
+from .views import AsyncLengthenURL, CacheStatsView, LengthenURL
 
 app_name = 'shortener'
 
 urlpatterns = [
-    path('<str:shortHash>/', LengthenURL.as_view(), name='shortenAPI'),
+    path('stats/', CacheStatsView.as_view(), name='cacheStats'),
+    path(
+        '<str:shortHash>/', (
+            AsyncLengthenURL if 'shortener:shortenAPI' in settings.ASYNC_VIEWS
+            else LengthenURL
+        ).as_view(),
+        name='shortenAPI'
+    ),
 ]
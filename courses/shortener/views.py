@@ -1,18 +1,77 @@
-from django.db import IntegrityError
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models.query import QuerySet
+from django.http import Http404, HttpRequest, HttpResponseNotFound
 from django.shortcuts import redirect
+from django.views import View
+from rest_framework.permissions import IsAdminUser
+from rest_framework.renderers import JSONRenderer
 from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.status import HTTP_200_OK
 from rest_framework.views import APIView
 
-from .models import URLShortener
+from .cache import shortURLCache
+from .models import URLShortener, generateShortHash
+from .persistence import pendingURLs
 
 
 class LengthenURL(APIView):
     def get(self, request: Request, shortHash: str):
-        shortener: URLShortener = URLShortener.objects.get(
-            shortHash=shortHash
-        )
+        # Look up the URL through the cache tiers before the database.
+        urlSuffix: Optional[str] = shortURLCache.get(shortHash)
+
+        if urlSuffix is None:
+            raise Http404('No URL was found for this hash.')
+
+        return redirect(_getRedirectTarget(urlSuffix))
+
+
+class AsyncLengthenURL(View):
+    """Asynchronous version of `LengthenURL`. Redirects that hit the
+    in-process cache are answered without leaving the event loop.
+    """
+
+    async def get(self, request: HttpRequest, shortHash: str):
+        urlSuffix: Optional[str] = await shortURLCache.aget(shortHash)
+
+        if urlSuffix is None:
+            # The same response as DRF's for `Http404`.
+            return HttpResponseNotFound(
+                JSONRenderer().render(
+                    {'detail': 'No URL was found for this hash.'}
+                ),
+                content_type='application/json'
+            )
+
+        return redirect(_getRedirectTarget(urlSuffix))
+
+
+def _getRedirectTarget(urlSuffix: str) -> str:
+    """Returns the `Location` of the redirect of a short URL.
+
+    Media URLs used to be shortened with two leading slashes. Browsers
+    read such a `Location` as a protocol-relative URL to another host,
+    so the path is reduced to a single leading slash.
+    """
+    if urlSuffix.startswith('//'):
+        return '/' + urlSuffix.lstrip('/')
+
+    return urlSuffix
+
+
+class CacheStatsView(APIView):
+    """Exposes the counters of the short URL cache so that it can be
+    sized.
+    """
+
+    permission_classes = [IsAdminUser, ]
 
-        return redirect(shortener.urlSuffix)
+    def get(self, request: Request) -> Response:
+        return Response(shortURLCache.stats(), HTTP_200_OK)
 
 
 def shortenURL(urlSuffix: str) -> str:
@@ -27,15 +86,240 @@ def shortenURL(urlSuffix: str) -> str:
         the URL.
     :rtype: str
     """
-    # Create and save this URL.
-    try:
-        shortener = URLShortener.objects.create(urlSuffix=urlSuffix)
-    except IntegrityError:
-        # This URL pattern already has a hash stored.
-        existingURL: URLShortener = URLShortener.objects.get(
-            urlSuffix=urlSuffix
+    return shortenURLs([urlSuffix])[urlSuffix]
+
+
+def shortenURLs(urlSuffixes: Iterable[str]) -> Dict[str, str]:
+    """Shortens a batch of URLs in a constant number of queries. This
+    function does not have any associated URL.
+
+    All the existing hashes are looked up in a single query and the
+    missing ones are inserted with a single `bulk_create`. Rows that
+    were inserted concurrently by another request are ignored, which is
+    safe because the hash of a URL is deterministic. The rare URLs whose
+    hash is already used by another URL get another hash.
+
+    :param urlSuffixes: The absolute addresses that have to be
+        shortened. For example, '/media/courses/images/image.png'.
+    :type urlSuffixes: Iterable[str]
+
+    :return: A mapping of every URL suffix to its short hash.
+    :rtype: Dict[str, str]
+    """
+    # Remove the duplicates while preserving the order of the URLs.
+    suffixes: List[str] = list(dict.fromkeys(urlSuffixes))
+
+    if not suffixes:
+        return dict()
+
+    if getattr(settings, 'SHORTENER_LAZY_PERSISTENCE', False):
+        shortHashes, newURLs = _hashLazily(suffixes)
+        shortURLCache.setMany(newURLs)
+
+        return shortHashes
+
+    # Find all the URLs that have already been shortened. The rows are
+    # looked up by their hash, which is indexed, and the suffix is
+    # compared to rule out a collision.
+    computedHashes: Dict[str, str] = {
+        suffix: generateShortHash(suffix) for suffix in suffixes
+    }
+    rows: List[Tuple[str, str]] = list(_getExistingRows(computedHashes))
+    shortHashes: Dict[str, str] = _matchRows(rows, computedHashes)
+    collisions: List[str] = _getCollisions(rows, computedHashes)
+
+    # Create the rows for the URLs that have not been shortened yet.
+    missing: List[URLShortener] = _getMissingRows(
+        computedHashes, shortHashes, collisions
+    )
+
+    if missing:
+        URLShortener.objects.bulk_create(missing, ignore_conflicts=True)
+
+        for shortener in missing:
+            shortHashes[shortener.urlSuffix] = shortener.shortHash
+
+    if collisions:
+        shortHashes.update(_shortenCollisions(collisions))
+
+    # Warm the lookup cache, since these URLs are about to be handed out
+    # to the clients.
+    shortURLCache.setMany(
+        {shortHash: suffix for suffix, shortHash in shortHashes.items()},
+        persisted=True
+    )
+
+    return shortHashes
+
+
+async def ashortenURLs(urlSuffixes: Iterable[str]) -> Dict[str, str]:
+    """Asynchronous version of `shortenURLs`."""
+    suffixes: List[str] = list(dict.fromkeys(urlSuffixes))
+
+    if not suffixes:
+        return dict()
+
+    if getattr(settings, 'SHORTENER_LAZY_PERSISTENCE', False):
+        shortHashes, newURLs = _hashLazily(suffixes)
+        await shortURLCache.asetMany(newURLs)
+
+        return shortHashes
+
+    computedHashes: Dict[str, str] = {
+        suffix: generateShortHash(suffix) for suffix in suffixes
+    }
+    rows: List[Tuple[str, str]] = [
+        row async for row in _getExistingRows(computedHashes)
+    ]
+    shortHashes = _matchRows(rows, computedHashes)
+    collisions: List[str] = _getCollisions(rows, computedHashes)
+
+    missing: List[URLShortener] = _getMissingRows(
+        computedHashes, shortHashes, collisions
+    )
+
+    if missing:
+        await URLShortener.objects.abulk_create(
+            missing, ignore_conflicts=True
         )
 
-        return existingURL.shortHash
+        for shortener in missing:
+            shortHashes[shortener.urlSuffix] = shortener.shortHash
+
+    if collisions:
+        shortHashes.update(
+            await sync_to_async(_shortenCollisions)(collisions)
+        )
+
+    await shortURLCache.asetMany(
+        {shortHash: suffix for suffix, shortHash in shortHashes.items()},
+        persisted=True
+    )
+
+    return shortHashes
+
+
+def _getExistingRows(computedHashes: Dict[str, str]) -> QuerySet:
+    """Returns the `(shortHash, urlSuffix)` rows of the computed hashes
+    that are already in the database.
+    """
+    return URLShortener.objects.filter(
+        shortHash__in=computedHashes.values()
+    ).values_list('shortHash', 'urlSuffix')
+
+
+def _matchRows(rows: Iterable[Tuple[str, str]],
+               computedHashes: Dict[str, str]) -> Dict[str, str]:
+    """Maps the URL suffixes of the existing rows to their hashes."""
+    return {
+        suffix: shortHash for shortHash, suffix in rows
+        if computedHashes.get(suffix) == shortHash
+    }
+
+
+def _getCollisions(rows: Iterable[Tuple[str, str]],
+                   computedHashes: Dict[str, str]) -> List[str]:
+    """Returns the URL suffixes whose computed hash is used by the row
+    of another suffix.
+    """
+    usedHashes: Set[str] = {
+        shortHash for shortHash, suffix in rows
+        if computedHashes.get(suffix) != shortHash
+    }
+
+    return [
+        suffix for suffix, shortHash in computedHashes.items()
+        if shortHash in usedHashes
+    ]
+
+
+def _getMissingRows(computedHashes: Dict[str, str],
+                    shortHashes: Dict[str, str],
+                    collisions: List[str]) -> List[URLShortener]:
+    """Builds the rows of the URLs that have not been shortened yet,
+    apart from the collisions. `bulk_create` does not call `save`, so
+    the hash is set here.
+    """
+    return [
+        URLShortener(urlSuffix=suffix, shortHash=shortHash)
+        for suffix, shortHash in computedHashes.items()
+        if suffix not in shortHashes and suffix not in collisions
+    ]
+
+
+def _shortenCollisions(suffixes: List[str]) -> Dict[str, str]:
+    """Shortens the URL suffixes whose computed hash is used by another
+    suffix. They are looked up by their suffix, which is unique, and the
+    missing ones are inserted with the first of their next hashes that
+    is free.
+
+    :param suffixes: The URL suffixes whose hash is used.
+    :type suffixes: List[str]
+
+    :return: A mapping of every URL suffix to its short hash.
+    :rtype: Dict[str, str]
+    """
+    shortHashes: Dict[str, str] = dict(
+        URLShortener.objects.filter(urlSuffix__in=suffixes)
+        .values_list('urlSuffix', 'shortHash')
+    )
+
+    for suffix in suffixes:
+        attempt: int = 1
+        while suffix not in shortHashes:
+            shortHash: str = generateShortHash(suffix, attempt)
+            try:
+                with transaction.atomic():
+                    URLShortener.objects.bulk_create([
+                        URLShortener(urlSuffix=suffix, shortHash=shortHash)
+                    ])
+            except IntegrityError:
+                # Either this hash is used too, or another request has
+                # shortened the URL in the meantime.
+                existing: Optional[str] = URLShortener.objects\
+                    .filter(urlSuffix=suffix)\
+                    .values_list('shortHash', flat=True).first()
+                if existing is not None:
+                    shortHashes[suffix] = existing
+                attempt += 1
+            else:
+                shortHashes[suffix] = shortHash
+
+    return shortHashes
+
+
+def _hashLazily(suffixes: List[str]) -> Tuple[Dict[str, str],
+                                              Dict[str, str]]:
+    """Shortens a batch of URLs without touching the database.
+
+    The hashes are computed in memory and the new mappings are queued to
+    be written in the background. Until then, `LengthenURL` finds them
+    in the cache or in the queue. The caller must add the new mappings
+    to the cache.
+
+    :param suffixes: The unique URL suffixes that have to be shortened.
+    :type suffixes: List[str]
+
+    :return: A mapping of every URL suffix to its short hash, and a
+        mapping of the newly queued hashes to their URL suffixes.
+    :rtype: Tuple[Dict[str, str], Dict[str, str]]
+    """
+    shortHashes: Dict[str, str] = {
+        suffix: generateShortHash(suffix) for suffix in suffixes
+    }
+
+    # The hashes that are in the in-process cache may have been read
+    # from the shared cache before another process flushed them, and
+    # that process may never do so. Only the hashes known to be in the
+    # database or queued by this process are not queued again.
+    newURLs: Dict[str, str] = {
+        shortHash: suffix for suffix, shortHash in shortHashes.items()
+        if shortHash not in shortURLCache.persisted
+        and pendingURLs.get(shortHash) is None
+    }
+
+    # Queue the mappings before they are cached so that they are never
+    # visible in the cache without being persisted eventually.
+    pendingURLs.enqueue(newURLs)
 
-    return shortener.shortHash
+    return shortHashes, newURLs